@@ -0,0 +1,9 @@
+"""
+Benchmarks for sweep.
+
+    python -m benchmarks.run        synthetic trees, every scenario, JSON results
+    benchmarks/gui_table.py         GUI table at millions of rows
+    benchmarks/trash.py             moving files to the trash
+"""
+
+__all__ = ['tree', 'scenarios', 'run']
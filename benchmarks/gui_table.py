@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Offscreen benchmark of the GUI file table.
+
+Builds a synthetic result set, hands it over the way sweep does (binary
+results file, memory-mapped by the viewer) and times populating the
+window, sorting by each column, searching and scrolling. Searches are
+typed one keystroke at a time, each applied immediately (bypassing the
+search box's debounce), so every keystroke is timed.
+
+Usage:
+    QT_QPA_PLATFORM=offscreen python benchmarks/gui_table.py --rows 5000000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import Qt
+
+from gui.main_window import FileViewerWindow
+from results import ResultStore, MappedResults, RESULTS_SUFFIX
+
+CATEGORIES = ['archive', 'disk_image', 'video', 'cache', 'log', 'other']
+
+
+def synthetic_results(rows):
+    """ResultStore of rows files spread over rows // 100 directories."""
+    store = ResultStore()
+    for i in range(rows):
+        store.append(
+            f'/data/project{(i // 100) % 997}/dir{i // 100}',
+            f'file_{(i * 7919) % rows}.dat',
+            (i * 2654435761) % (1 << 32),
+            1.7e9 - (i * 40503) % 10 ** 8,
+            CATEGORIES[i % len(CATEGORIES)],
+            4096
+        )
+    return store
+
+
+def timed(label, func):
+    """Run func, drain the Qt event queue and print the elapsed time."""
+    start = time.perf_counter()
+    func()
+    QApplication.processEvents()
+    print(f"  {label:<30} {time.perf_counter() - start:8.3f} s")
+
+
+# Search box input, typed one character at a time
+QUERIES = ['file_123', 'kind:vid', 'path:project12/', 'size>3G', 'file_1 size<1G', 'modified<2019-01-01']
+
+
+def type_query(window, query):
+    """Type query into the search box a keystroke at a time, timing each."""
+    times = []
+    for end in range(1, len(query) + 1):
+        start = time.perf_counter()
+        window.filter_files(query[:end])
+        QApplication.processEvents()
+        times.append((time.perf_counter() - start) * 1000)
+    keystrokes = ' '.join(f'{t:.0f}' for t in times)
+    print(f"  search {query!r:<22} {window.file_table.visible_count():>8} rows; ms per keystroke: {keystrokes}")
+    window.filter_files('')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the GUI file table offscreen')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of result rows')
+    args = parser.parse_args()
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QApplication(sys.argv)
+
+    print(f"Building {args.rows} synthetic rows...")
+    handoff = tempfile.NamedTemporaryFile(suffix=RESULTS_SUFFIX, delete=False)
+    handoff.close()
+    synthetic_results(args.rows).save(handoff.name)
+
+    try:
+        results = MappedResults(handoff.name)
+        window = None
+
+        def populate():
+            nonlocal window
+            window = FileViewerWindow(results)
+            window.show()
+
+        timed('open window', populate)
+        table = window.file_table
+
+        for column, label in enumerate(['name', 'size', 'kind', 'date modified']):
+            timed(f'sort by {label}', lambda: table.sortByColumn(column, Qt.SortOrder.AscendingOrder))
+            timed(f'sort by {label}, descending', lambda: table.sortByColumn(column, Qt.SortOrder.DescendingOrder))
+
+        table.sortByColumn(-1, Qt.SortOrder.AscendingOrder)
+        for query in QUERIES:
+            type_query(window, query)
+        table.sortByColumn(1, Qt.SortOrder.DescendingOrder)
+        print('  sorted by size:')
+        type_query(window, 'file_123')
+        timed('clear search', lambda: window.filter_files(''))
+        timed('scroll to bottom', table.scrollToBottom)
+        timed('scroll to top', table.scrollToTop)
+    finally:
+        os.unlink(handoff.name)
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
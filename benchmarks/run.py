@@ -0,0 +1,180 @@
+"""
+Run the benchmark suite.
+
+Generates a synthetic tree of each requested shape in a temporary
+directory, times every scenario on it and prints the results. With
+--output the results are also written as JSON; passing such a file
+back as --baseline compares the run against it and exits with status 1
+if any scenario got slower by more than --threshold percent.
+
+Usage:
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --baseline baseline.json --threshold 10
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+from dataclasses import asdict
+
+from scanner import scan_filesystem
+
+from .tree import SHAPES, make_tree
+from .scenarios import SCENARIOS, BenchContext
+
+
+# Results format version, bumped when the JSON layout changes
+FORMAT_VERSION = 1
+
+# Slowdowns smaller than this (seconds) are noise, whatever the percentage
+MIN_REGRESSION = 0.005
+
+
+def time_scenario(scenario, context, repeat):
+    """
+    Time a scenario.
+
+    Args:
+        scenario: Scenario
+        context: BenchContext
+        repeat: Number of runs
+
+    Returns: dict with the fastest and median run and every run, in seconds
+    """
+    runs = []
+    for _ in range(repeat):
+        state = scenario.setup(context) if scenario.setup else context
+        gc.collect()
+        start = time.perf_counter()
+        returned = scenario.run(state)
+        runs.append(time.perf_counter() - start)
+        if scenario.teardown:
+            scenario.teardown(state if returned is None else returned)
+    return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline, scenario by scenario.
+
+    The fastest run of each is compared, as the least disturbed by
+    other activity on the machine.
+
+    Args:
+        results: 'results' mapping of a run
+        baseline: 'results' mapping of the baseline run
+        threshold: Allowed slowdown, in percent
+
+    Returns: List of (key, baseline seconds, seconds, change in percent,
+    regressed) for scenarios in both
+    """
+    rows = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]['min']
+        after = result['min']
+        change = (after - before) / before * 100 if before else 0.0
+        regressed = change > threshold and after - before > MIN_REGRESSION
+        rows.append((key, before, after, change, regressed))
+    return rows
+
+
+def _start_gui():
+    """Create the offscreen QApplication; None if PyQt6 is missing."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt6.QtWidgets import QApplication
+    except ImportError:
+        return None
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sweep on synthetic trees')
+    parser.add_argument('--shape', action='append', choices=sorted(SHAPES),
+                        help='Tree shape to benchmark; repeat for several (default: all)')
+    parser.add_argument('--scenario', action='append', choices=[s.name for s in SCENARIOS],
+                        help='Scenario to run; repeat for several (default: all)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Tree size multiplier (default: 1.0)')
+    parser.add_argument('--seed', type=int, default=0, help='Tree generator seed (default: 0)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per scenario (default: 5)')
+    parser.add_argument('--no-gui', action='store_true', help='Skip the GUI scenarios')
+    parser.add_argument('--output', metavar='FILE', help='Write results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='Compare with results written by --output')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Slowdown against --baseline counted as a regression, in percent (default: 10)')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    if any(s.gui for s in scenarios) and not args.no_gui:
+        app = _start_gui()
+        if app is None:
+            print('PyQt6 is not installed; skipping the GUI scenarios', file=sys.stderr)
+    else:
+        app = None
+    if app is None:
+        scenarios = [s for s in scenarios if not s.gui]
+
+    report = {
+        'version': FORMAT_VERSION,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'scale': args.scale,
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'trees': {},
+        'results': {},
+    }
+
+    for shape in args.shape or list(SHAPES):
+        scratch = tempfile.mkdtemp(prefix=f'sweep-bench-{shape}-')
+        try:
+            context = BenchContext(root=os.path.join(scratch, 'tree'), scratch=scratch)
+            stats = make_tree(context.root, shape, args.scale, args.seed)
+            report['trees'][shape] = asdict(stats)
+            print(f"{shape}: {stats.files:,} files in {stats.dirs:,} directories")
+
+            context.store = scan_filesystem(context.config())
+            for scenario in scenarios:
+                key = f'{shape}/{scenario.name}'
+                result = report['results'][key] = time_scenario(scenario, context, args.repeat)
+                print(f"  {scenario.name:<16} {result['min']:8.3f} s  (median {result['median']:.3f} s)")
+        finally:
+            shutil.rmtree(scratch)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        rows = compare(report['results'], baseline, args.threshold)
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:g}%):")
+        for key, before, after, change, regressed in rows:
+            flag = '  REGRESSION' if regressed else ''
+            print(f"  {key:<24} {before:8.3f} s -> {after:8.3f} s  {change:+6.1f}%{flag}")
+        regressions = sum(row[4] for row in rows)
+        if regressions:
+            print(f"{regressions} scenario(s) slower than the baseline", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Timed benchmark scenarios over a synthetic tree.
+
+Each scenario times one operation sweep performs: scanning (also with
+10, 100 and 1,000 exclude patterns), classifying, writing each output
+format, and populating, sorting and searching the GUI table offscreen.
+Setup runs untimed before every run, so runs that would otherwise reuse
+a cache (a sort order, a search index) start cold.
+"""
+
+import os
+from pathlib import Path
+from dataclasses import dataclass, replace
+from typing import Callable, List, Optional
+
+from config import Config
+from categories import detect_category, load_rules
+from output import output_json, output_csv, output_ndjson
+from results import ResultStore
+from scanner import scan_filesystem
+
+
+# Typed into the GUI search box one keystroke at a time
+SEARCH_QUERIES = ['file_12', 'kind:cache', 'path:level_3/', 'size>1M']
+
+# Kinds of exclude pattern, cycled through by exclude_patterns(); none
+# matches a name in the synthetic trees, so every scan sees the same files
+EXCLUDE_KINDS = [
+    'skip_{}',                  # name at any depth
+    '*.ext{}',                  # extension
+    'tmp_{}*',                  # name prefix
+    '**/target_{}/',            # directory at any depth
+    'build_{}/out',             # anchored path
+    'file_[0-9]*.v{}',          # wildcard in the middle
+    '/Volumes/disk_{}',         # absolute path
+]
+
+
+@dataclass
+class BenchContext:
+    """What scenarios share: the tree and its scan results."""
+    root: str                              # root of the synthetic tree
+    scratch: str                           # directory for output files
+    store: Optional[ResultStore] = None    # scan results, every file in the tree
+
+    def config(self):
+        """Config matching every file in the tree."""
+        return Config(
+            path=Path(self.root),
+            min_size=0,
+            older_than=None,
+            category_filter=None,
+            exclude=[],
+            limit=None,
+            quiet=True
+        )
+
+
+@dataclass
+class Scenario:
+    """One timed operation."""
+    name: str
+    run: Callable                          # run(state), the timed part
+    setup: Optional[Callable] = None       # setup(context) -> state; the context if None
+    teardown: Optional[Callable] = None    # teardown(what run returned, or state if None)
+    gui: bool = False                      # needs PyQt6 and a QApplication
+
+
+def _scan(context):
+    scan_filesystem(context.config())
+
+
+def exclude_patterns(count):
+    """count distinct exclude patterns of every kind in EXCLUDE_KINDS."""
+    return [EXCLUDE_KINDS[i % len(EXCLUDE_KINDS)].format(i) for i in range(count)]
+
+
+def _scan_excluding(count):
+    """Scenario run function scanning with count exclude patterns."""
+    patterns = exclude_patterns(count)
+
+    def run(context):
+        scan_filesystem(replace(context.config(), exclude=patterns))
+    return run
+
+
+def _file_paths(context):
+    store = context.store
+    return [store.path(i) for i in range(len(store))]
+
+
+def _detect_category(paths):
+    for path in paths:
+        detect_category(path)
+
+
+def _classify(context):
+    """Classify every file with compiled rules and one context per directory, as a scan does."""
+    rules = load_rules()
+    contexts = {}
+    store = context.store
+    for i in range(len(store)):
+        dirpath = store.dirpath(i)
+        dir_context = contexts.get(dirpath)
+        if dir_context is None:
+            dir_context = contexts[dirpath] = rules.context_for(dirpath)
+        rules.classify(store.name(i), dir_context)
+
+
+def _writer(func, extension):
+    """Scenario run function writing the scan results with an output.py writer."""
+    def run(context):
+        func(context.store, context.config(), os.path.join(context.scratch, 'results' + extension))
+    return run
+
+
+def _process_events():
+    from PyQt6.QtWidgets import QApplication
+    QApplication.processEvents()
+
+
+def _open_window(context):
+    """Hand results over the way sweep does and show the viewer."""
+    from gui.main_window import FileViewerWindow
+    from results import MappedResults, RESULTS_SUFFIX
+
+    handoff = os.path.join(context.scratch, 'handoff' + RESULTS_SUFFIX)
+    context.store.save(handoff)
+    window = FileViewerWindow(MappedResults(handoff))
+    window.show()
+    _process_events()
+    return window
+
+
+def _close_window(window):
+    window.close()
+    window.deleteLater()
+    _process_events()
+
+
+def _sort(window):
+    from PyQt6.QtCore import Qt
+
+    table = window.file_table
+    for column in range(4):
+        for order in (Qt.SortOrder.AscendingOrder, Qt.SortOrder.DescendingOrder):
+            table.sortByColumn(column, order)
+            _process_events()
+
+
+def _search(window):
+    for query in SEARCH_QUERIES:
+        for end in range(1, len(query) + 1):
+            window.filter_files(query[:end])
+            _process_events()
+        window.filter_files('')
+        _process_events()
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario('scan', _scan),
+    Scenario('exclude_10', _scan_excluding(10)),
+    Scenario('exclude_100', _scan_excluding(100)),
+    Scenario('exclude_1000', _scan_excluding(1000)),
+    Scenario('detect_category', _detect_category, setup=_file_paths),
+    Scenario('classify', _classify),
+    Scenario('output_json', _writer(output_json, '.json')),
+    Scenario('output_csv', _writer(output_csv, '.csv')),
+    Scenario('output_ndjson', _writer(output_ndjson, '.ndjson')),
+    Scenario('gui_populate', _open_window, teardown=_close_window, gui=True),
+    Scenario('gui_sort', _sort, setup=_open_window, teardown=_close_window, gui=True),
+    Scenario('gui_search', _search, setup=_open_window, teardown=_close_window, gui=True),
+]
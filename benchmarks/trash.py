@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark moving files to the trash.
+
+Creates --files small files in a scratch directory and trashes them with
+this platform's backend (gui.trash), into a scratch trash on Linux
+(XDG_DATA_HOME is pointed at the scratch directory). For comparison, the
+same number of files is moved by one process per file, which is what
+trashing cost when each file took its own osascript run.
+
+Usage:
+    python benchmarks/trash.py --files 10000
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_files(directory, count):
+    """Create count small files, every tenth sharing a name across subdirectories."""
+    paths = []
+    for i in range(count):
+        subdir = os.path.join(directory, f'dir{i % 10}')
+        os.makedirs(subdir, exist_ok=True)
+        path = os.path.join(subdir, f'cache_{i // 10}.bin')
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark moving files to the trash')
+    parser.add_argument('--files', type=int, default=10000, help='Number of files to trash')
+    parser.add_argument('--baseline-files', type=int, default=1000,
+                        help='Files moved by one process each for the baseline (scaled up to --files)')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='sweep-trash-')
+    try:
+        if sys.platform != 'darwin':
+            os.environ['XDG_DATA_HOME'] = os.path.join(scratch, 'data')
+        from gui.trash import get_backend
+
+        paths = make_files(os.path.join(scratch, 'files'), args.files)
+        backend = get_backend()
+        start = time.perf_counter()
+        result = backend.trash(paths)
+        elapsed = time.perf_counter() - start
+        print(f"{type(backend).__name__}: {result.moved_count} of {args.files} files in {elapsed:.2f} s "
+              f"({args.files / elapsed:,.0f} files/s)")
+
+        paths = make_files(os.path.join(scratch, 'baseline'), args.baseline_files)
+        target = os.path.join(scratch, 'moved')
+        os.makedirs(target)
+        start = time.perf_counter()
+        for number, path in enumerate(paths):
+            subprocess.run(['mv', path, os.path.join(target, str(number))], check=True)
+        elapsed = (time.perf_counter() - start) * args.files / args.baseline_files
+        print(f"one process per file: {elapsed:.2f} s for {args.files} files "
+              f"(measured on {args.baseline_files})")
+    finally:
+        shutil.rmtree(scratch)
+
+
+if __name__ == '__main__':
+    main()
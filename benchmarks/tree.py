@@ -0,0 +1,166 @@
+"""
+Synthetic filesystem trees for benchmarks.
+
+Trees are generated from a seeded random.Random, so the same shape,
+scale and seed always give the same names, sizes and mtimes. File
+sizes are set with truncate, so files are sparse and a tree of many
+gigabytes takes almost no disk space; only the 'tiny' shape writes
+real bytes.
+"""
+
+import os
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+
+# Extensions drawn for file names, weighted toward files no rule matches
+EXTENSIONS = [
+    '.txt', '.py', '.json', '.png', '.jpg', '.c', '.h', '.md', '.dat', '',
+    '.zip', '.tar.gz', '.iso', '.dmg', '.mp4', '.mov', '.log', '.out',
+]
+
+# Cache directory names recognised by the built-in category rules; the
+# hidden ones (.cache, .venv) are left out, as hidden directories are
+# pruned without being entered
+CACHE_NAMES = ['node_modules', '__pycache__', 'venv']
+
+# Files are given mtimes spread over this many days before NOW
+NOW = 1.7e9
+AGE_DAYS = 2000
+
+
+@dataclass
+class TreeStats:
+    """What a generated tree holds."""
+    files: int = 0
+    dirs: int = 0
+    bytes: int = 0
+
+
+class _Builder:
+    """Creates directories and files for one tree, counting them."""
+
+    def __init__(self, root, seed):
+        self.root = root
+        self.random = random.Random(seed)
+        self.stats = TreeStats()
+        self._serial = 0
+
+    def dir(self, *parts):
+        """Create a directory below the root, and its parents, and return its path."""
+        path = self.root
+        for part in parts:
+            path = os.path.join(path, part)
+            if not os.path.isdir(path):
+                os.mkdir(path)
+                self.stats.dirs += 1
+        return path
+
+    def file(self, directory, size=None, extension=None, data=False):
+        """
+        Create a file with a random name, size and mtime.
+
+        Args:
+            directory: Directory to create it in
+            size: File size; random (mostly small, a few large) if None
+            extension: Name extension; random if None
+            data: Write size real bytes instead of truncating to size
+        """
+        rand = self.random
+        if extension is None:
+            extension = rand.choice(EXTENSIONS)
+        if size is None:
+            size = int(rand.paretovariate(1.2) * 2048)
+        self._serial += 1
+        path = os.path.join(directory, f'file_{self._serial}{extension}')
+        with open(path, 'wb') as f:
+            if data:
+                f.write(b'x' * size)
+            elif size:
+                f.truncate(size)
+        mtime = NOW - rand.random() * AGE_DAYS * 86400
+        os.utime(path, (mtime, mtime))
+        self.stats.files += 1
+        self.stats.bytes += size
+
+
+def _wide(builder, scale):
+    """Many directories side by side, each holding many files."""
+    for d in range(max(1, int(200 * scale))):
+        directory = builder.dir(f'dir_{d}')
+        for _ in range(100):
+            builder.file(directory)
+
+
+def _deep(builder, scale):
+    """Long chains of nested directories, a few files at each level."""
+    for chain in range(max(1, int(20 * scale))):
+        parts = [f'chain_{chain}']
+        for level in range(50):
+            parts.append(f'level_{level}')
+            directory = builder.dir(*parts)
+            for _ in range(5):
+                builder.file(directory)
+
+
+def _tiny(builder, scale):
+    """Lots of files of a few bytes each."""
+    for d in range(max(1, int(500 * scale))):
+        directory = builder.dir(f'small_{d}')
+        for _ in range(100):
+            builder.file(directory, size=builder.random.randrange(65), data=True)
+
+
+def _sparse(builder, scale):
+    """A few huge sparse files (disk images and archives)."""
+    directory = builder.dir('images')
+    for _ in range(max(1, int(8 * scale))):
+        size = builder.random.randrange(1, 17) << 30
+        builder.file(directory, size=size, extension=builder.random.choice(['.iso', '.dmg', '.img', '.tar']))
+
+
+def _cache(builder, scale):
+    """Projects full of dependency and bytecode cache directories."""
+    rand = builder.random
+    for project in range(max(1, int(50 * scale))):
+        source = builder.dir(f'project_{project}', 'src')
+        for _ in range(20):
+            builder.file(source, extension='.py')
+        cache = rand.choice(CACHE_NAMES)
+        for package in range(40):
+            for level in range(3):
+                directory = builder.dir(f'project_{project}', cache, *[f'pkg_{package}'] * (level + 1))
+                for _ in range(3):
+                    builder.file(directory)
+
+
+# Shape name -> function filling a builder at a scale
+SHAPES: Dict[str, Callable] = {
+    'wide': _wide,
+    'deep': _deep,
+    'tiny': _tiny,
+    'sparse': _sparse,
+    'cache': _cache,
+}
+
+
+def make_tree(root, shape, scale=1.0, seed=0):
+    """
+    Generate a synthetic tree.
+
+    Args:
+        root: Directory to create the tree in; created if missing
+        shape: Name from SHAPES
+        scale: Multiplier for the number of directories (1.0 is a tree
+            of roughly 5,000-50,000 files, except 'sparse')
+        seed: Random seed
+
+    Returns: TreeStats
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown tree shape {shape!r}; choose from {', '.join(SHAPES)}")
+    os.makedirs(root, exist_ok=True)
+    builder = _Builder(root, seed)
+    SHAPES[shape](builder, scale)
+    return builder.stats
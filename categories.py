@@ -1,5 +1,6 @@
 """File category detection based on extension and path."""
 
+import json
 from pathlib import Path
 
 
@@ -12,31 +13,222 @@ CATEGORIES = {
 
 CACHE_DIRS = {'node_modules', '__pycache__', '.cache', 'venv', '.venv'}
 
+LOG_DIRS = {'logs', 'var', 'tmp'}
+
+# Built-in rules, in the same spec format as the user rules file
+DEFAULT_RULES = {
+    'cache': {'dirs': sorted(CACHE_DIRS)},
+    'archive': {'extensions': sorted(CATEGORIES['archive'])},
+    'disk_image': {'extensions': sorted(CATEGORIES['disk_image'])},
+    'video': {'extensions': sorted(CATEGORIES['video'])},
+    'log': {'extensions': sorted(CATEGORIES['log']), 'within': sorted(LOG_DIRS)},
+}
+
+DEFAULT_RULES_PATH = Path.home() / '.config' / 'sweep' / 'categories.json'
+
+# Categories a rules file can define in all, built-in ones and 'other'
+# included; results store each file's category as a one-byte code
+MAX_CATEGORIES = 256
+
+
+class DirContext:
+    """
+    Category facts about a directory, inherited by its subdirectories.
+
+    Contexts are shared: a subdirectory whose name no rule mentions gets
+    its parent's context object, so most directories cost nothing.
+    """
+
+    __slots__ = ('dir_category', 'within', 'children')
+
+    def __init__(self, dir_category=None, within=frozenset()):
+        self.dir_category = dir_category   # category of an enclosing rule dir
+        self.within = within               # enclosing dir names used by 'within' rules
+        self.children = {}                 # name -> DirContext, for rule names only
+
+
+class CategoryRules:
+    """
+    Category rules compiled into lookup tables.
+
+    Each category spec may give:
+        extensions: suffixes, including multi-part ones like '.tar.gz'
+        dirs: directory names; every file below one belongs to the category
+        within: directory names; extensions only count below one of them
+
+    Directory facts are kept in DirContext objects computed once per
+    directory, so classify() is a few dict lookups per file. Earlier
+    specs win over later ones, and the outermost matching directory
+    rule wins.
+    """
+
+    def __init__(self, specs):
+        """
+        Compile rules.
+
+        Args:
+            specs: Iterable of (category, spec dict) pairs in priority order
+        """
+        self.names = []
+        self._dir_rules = {}
+        self._ext_rules = {}
+        self._within_names = set()
+        self._ext_categories = set()
+        self._max_suffix_parts = 1
+
+        for category, spec in specs:
+            if category not in self.names:
+                self.names.append(category)
+
+            for dirname in spec.get('dirs', ()):
+                self._dir_rules.setdefault(dirname, category)
+
+            within = frozenset(spec.get('within', ())) or None
+            if within:
+                self._within_names.update(within)
+
+            for ext in spec.get('extensions', ()):
+                ext = ext.lower()
+                if not ext.startswith('.'):
+                    ext = '.' + ext
+                self._ext_rules.setdefault(ext, []).append((category, within))
+                self._ext_categories.add(category)
+                self._max_suffix_parts = max(self._max_suffix_parts, ext.count('.'))
+
+        if 'other' not in self.names:
+            self.names.append('other')
+
+        self._context_names = set(self._dir_rules) | self._within_names
+        self.root = DirContext()
+
+    def child_context(self, context, name):
+        """
+        Context of subdirectory name inside a directory with context.
+
+        Returns: DirContext
+        """
+        if name not in self._context_names:
+            return context
+
+        child = context.children.get(name)
+        if child is None:
+            dir_category = context.dir_category or self._dir_rules.get(name)
+            within = context.within
+            if name in self._within_names:
+                within = within | {name}
+            child = context.children[name] = DirContext(dir_category, within)
+        return child
+
+    def context_for(self, dirpath):
+        """
+        Context of an arbitrary directory, from its path components.
+
+        Returns: DirContext
+        """
+        context = self.root
+        for part in Path(dirpath).parts:
+            context = self.child_context(context, part)
+        return context
+
+    def subtree_may_contain(self, context, category):
+        """
+        Return False if no file at or below a directory with context can
+        be in category, so the whole subtree can be skipped.
+        """
+        return context.dir_category is None or context.dir_category == category
+
+    def files_may_match(self, context, category):
+        """
+        Return False if no file directly in a directory with context can
+        be in category, whatever its name.
+        """
+        if context.dir_category is not None:
+            return context.dir_category == category
+        return category in self._ext_categories or category == 'other'
+
+    def classify(self, name, context):
+        """
+        Category of a file called name in a directory with context.
+
+        Returns: str (category name)
+        """
+        if context.dir_category:
+            return context.dir_category
+
+        lower = name.lower()
+        if lower.endswith('.'):
+            return 'other'
+
+        # Suffix candidates, shortest first; a leading dot is not a suffix
+        suffixes = []
+        end = len(lower)
+        for _ in range(self._max_suffix_parts):
+            end = lower.rfind('.', 0, end)
+            if end <= 0:
+                break
+            suffixes.append(lower[end:])
+
+        # Longest suffix wins, so '.tar.gz' beats '.gz'
+        for suffix in reversed(suffixes):
+            for category, within in self._ext_rules.get(suffix, ()):
+                if within is None or within & context.within:
+                    return category
+
+        return 'other'
+
+
+def load_rules(path=None):
+    """
+    Compile the built-in rules plus rules from a user JSON file.
+
+    The file maps category names to specs (see CategoryRules), e.g.
+    {"build": {"dirs": ["target"], "extensions": [".o", ".class"]}}.
+    User rules take precedence; a user spec for a built-in category adds
+    to it. Without a path, DEFAULT_RULES_PATH is used if it exists.
+
+    Returns: CategoryRules
+
+    Raises: ValueError if the file is invalid or defines too many
+    categories (see MAX_CATEGORIES)
+    """
+    if path is None and DEFAULT_RULES_PATH.exists():
+        path = DEFAULT_RULES_PATH
+
+    user_rules = {}
+    if path is not None:
+        with open(path) as f:
+            try:
+                user_rules = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid category rules file {path}: {e}") from e
+        if not isinstance(user_rules, dict) or not all(isinstance(s, dict) for s in user_rules.values()):
+            raise ValueError(f"Invalid category rules file {path}: expected an object of category specs")
+
+    rules = CategoryRules(list(user_rules.items()) + list(DEFAULT_RULES.items()))
+    if len(rules.names) > MAX_CATEGORIES:
+        raise ValueError(
+            f"Invalid category rules file {path}: {len(rules.names)} categories, "
+            f"at most {MAX_CATEGORIES} are supported (built-in ones and 'other' included)"
+        )
+    return rules
+
+
+_default_rules = None
+
 
 def detect_category(filepath):
     """
     Detect file category based on extension and path.
-    
+
+    Computes the directory context from scratch on every call; scans
+    should use CategoryRules.child_context/classify instead.
+
     Returns: str (category name)
     """
-    # Check if in cache directory
-    parts = filepath.parts
-    if any(cache_dir in parts for cache_dir in CACHE_DIRS):
-        return 'cache'
-    
-    # Check extension
-    ext = filepath.suffix.lower()
-    if not ext:
-        return 'other'
-    
-    for category, extensions in CATEGORIES.items():
-        if ext in extensions:
-            # Special case for logs - must be in log directory
-            if category == 'log':
-                if any(log_dir in parts for log_dir in ('logs', 'var', 'tmp')):
-                    return 'log'
-                else:
-                    return 'other'
-            return category
-    
-    return 'other'
\ No newline at end of file
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = CategoryRules(DEFAULT_RULES.items())
+
+    filepath = Path(filepath)
+    context = _default_rules.context_for(filepath)
+    return _default_rules.classify(filepath.name, context)
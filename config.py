@@ -1,6 +1,6 @@
 """Configuration dataclass"""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional, List
 
@@ -12,6 +12,15 @@ class Config:
     min_size: int
     older_than: Optional[int]
     category_filter: Optional[str]
-    exclude: List[Path]
+    exclude: List[str]
     limit: Optional[int]
-    quiet: bool
\ No newline at end of file
+    quiet: bool
+    jobs: int = 1
+    sort_by: str = 'size'
+    category_rules: Optional[Path] = None
+    allocated: bool = False
+    count_links: bool = False
+    where: Optional[str] = None
+    ignore_files: bool = True
+    extra_paths: List[Path] = field(default_factory=list)
+    one_file_system: bool = False
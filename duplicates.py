@@ -0,0 +1,227 @@
+"""Duplicate file detection: size, then inode, then partial hash, then full hash."""
+
+import os
+import hashlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+
+
+# Bytes hashed from each end of a file in the partial-hash stage
+PARTIAL_BYTES = 8 * 1024
+
+# Read buffer for full hashes
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class DuplicateGroup:
+    """Files with identical content."""
+    size: int
+    digest: str
+    paths: List[Path]                  # one path per copy (inode)
+    allocated: int = 0                 # allocated bytes of a copy, the largest of them
+    links: List[Path] = field(default_factory=list)   # further hard links to those copies
+
+    def wasted_bytes(self, allocated=False):
+        """
+        Bytes that deleting all but one copy would free; hard links in
+        links share a copy's data and free nothing.
+
+        Args:
+            allocated: Count allocated instead of apparent bytes
+        """
+        return (self.allocated if allocated else self.size) * (len(self.paths) - 1)
+
+    @property
+    def wasted(self):
+        """Apparent bytes that deleting all but one copy would free."""
+        return self.wasted_bytes()
+
+
+_buffers = threading.local()
+
+
+def _buffer():
+    """Per-thread reusable read buffer."""
+    buf = getattr(_buffers, 'buf', None)
+    if buf is None:
+        buf = _buffers.buf = bytearray(CHUNK_SIZE)
+    return buf
+
+
+def _partial_hash(path, size):
+    """
+    Hash the first and last PARTIAL_BYTES of a file.
+
+    Files no larger than 2 * PARTIAL_BYTES are hashed whole, so for them
+    the partial hash is already final.
+
+    Returns: bytes digest, or None if the file cannot be read
+    """
+    h = hashlib.blake2b()
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            if size <= 2 * PARTIAL_BYTES:
+                h.update(f.read())
+            else:
+                h.update(f.read(PARTIAL_BYTES))
+                f.seek(-PARTIAL_BYTES, os.SEEK_END)
+                h.update(f.read(PARTIAL_BYTES))
+    except OSError:
+        return None
+    return h.digest()
+
+
+def _full_hash(path):
+    """
+    Hash a whole file with large unbuffered reads into a reused buffer.
+
+    Returns: bytes digest, or None if the file cannot be read
+    """
+    h = hashlib.blake2b()
+    buf = _buffer()
+    view = memoryview(buf)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+    except OSError:
+        return None
+    return h.digest()
+
+
+def _inode(path):
+    """(st_dev, st_ino) of a file, or None if it cannot be stat'ed."""
+    try:
+        stat = os.stat(path, follow_symlinks=False)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def _split_links(size_groups, pool):
+    """
+    Keep one path per inode in each size group.
+
+    Hard links to one file share its data, so they are not duplicates
+    of each other; with --count-links the scan reports every link.
+
+    Args:
+        size_groups: List of (key, size, paths)
+
+    Returns: (size groups of 2+ distinct inodes, path -> list of its
+    other links for paths that have some)
+    """
+    jobs = [path for _key, _size, paths in size_groups for path in paths]
+    inodes = dict(zip(jobs, pool.map(_inode, jobs)))
+
+    groups = []
+    links = {}
+    for key, size, paths in size_groups:
+        first = {}
+        for path in paths:
+            inode = inodes[path]
+            if inode is None:
+                continue
+            kept = first.get(inode)
+            if kept is None:
+                first[inode] = path
+            else:
+                links.setdefault(kept, []).append(path)
+        if len(first) > 1:
+            groups.append((key, size, list(first.values())))
+    return groups, links
+
+
+def _regroup(groups, hash_func, pool):
+    """
+    Split each group of paths by hash_func(path, size), in parallel.
+
+    Args:
+        groups: List of (key, size, paths)
+        hash_func: Callable(path, size) -> digest or None
+
+    Returns: List of (digest, size, paths) for digests shared by 2+ files
+    """
+    jobs = [(size, path) for _key, size, paths in groups for path in paths]
+    digests = pool.map(lambda job: hash_func(job[1], job[0]), jobs)
+
+    by_digest = defaultdict(list)
+    for (size, path), digest in zip(jobs, digests):
+        if digest is not None:
+            # Size is part of the key so groups never merge across sizes
+            by_digest[(size, digest)].append(path)
+
+    return [(digest, size, paths) for (size, digest), paths in by_digest.items() if len(paths) > 1]
+
+
+def find_duplicates(results, workers=None, stats=None, allocated=False):
+    """
+    Find groups of identical files among scan results.
+
+    Candidates are narrowed in stages, each touching fewer files: files
+    with a unique size are dropped without any IO; hard links among the
+    rest are set aside, as deleting them would free nothing; the rest are
+    compared by a hash of their first and last PARTIAL_BYTES; only files
+    still colliding (and larger than 2 * PARTIAL_BYTES) are hashed in
+    full. Hashing runs on a thread pool since hashlib and file reads
+    release the GIL.
+
+    Args:
+        results: Iterable of FileEntry-like rows
+        workers: Hashing threads (default: CPU count)
+        stats: Optional dict; receives 'partial_hashed' and 'full_hashed'
+            file counts
+        allocated: Rank groups by allocated instead of apparent bytes
+            wasted
+
+    Returns: List[DuplicateGroup], most wasted bytes first
+    """
+    by_size = defaultdict(list)
+    allocated_of = {}
+    for row in results:
+        # Empty files are all identical and waste nothing
+        if row.size > 0:
+            path = str(row.path)
+            by_size[row.size].append(path)
+            allocated_of[path] = row.allocated
+
+    size_groups = [(size, size, paths) for size, paths in by_size.items() if len(paths) > 1]
+
+    def make_group(digest, size, paths):
+        paths = sorted(paths)
+        return DuplicateGroup(
+            size, digest.hex(), [Path(p) for p in paths],
+            allocated=max(allocated_of[p] for p in paths),
+            links=[Path(link) for p in paths for link in sorted(links.get(p, ()))]
+        )
+
+    groups = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+        size_groups, links = _split_links(size_groups, pool)
+        partial = _regroup(size_groups, _partial_hash, pool)
+
+        needs_full = []
+        for digest, size, paths in partial:
+            if size <= 2 * PARTIAL_BYTES:
+                groups.append(make_group(digest, size, paths))
+            else:
+                needs_full.append((digest, size, paths))
+
+        full = _regroup(needs_full, lambda path, _size: _full_hash(path), pool)
+        for digest, size, paths in full:
+            groups.append(make_group(digest, size, paths))
+
+    if stats is not None:
+        stats['partial_hashed'] = sum(len(paths) for _, _, paths in size_groups)
+        stats['full_hashed'] = sum(len(paths) for _, _, paths in needs_full)
+
+    groups.sort(key=lambda group: (-group.wasted_bytes(allocated), group.paths[0]))
+    return groups
@@ -0,0 +1,379 @@
+"""
+Gitignore-style exclude patterns, from --exclude and .sweepignore files.
+
+Patterns follow .gitignore syntax:
+
+    node_modules        a file or directory with this name, at any depth
+    *.photoslibrary     shell-style wildcards *, ? and [abc] within a name
+    **/target           ** matches any number of directories, even none
+    build/cache         a pattern containing / is anchored: it matches
+                        below the directory of its .sweepignore, or
+                        below the scan root for --exclude
+    /System             in --exclude, a pattern starting with / is an
+                        absolute path; in a .sweepignore it is anchored
+    logs/               a trailing / matches directories only
+    !keep.log           re-include what an earlier pattern excluded
+    # comment           blank lines and comments are skipped
+
+When several patterns match, the last one wins. Patterns of a
+.sweepignore come after those of --exclude and of the .sweepignore files
+above it. An excluded directory is not descended into, so nothing below
+it can be re-included.
+
+Each source of patterns is compiled into a trie of path components. The
+exclude state of a directory is the tuple of trie nodes its path has
+reached, and an entry is matched by stepping that state over its name:
+literal names are a dict lookup and wildcards are looked up by their
+literal prefix or suffix, so the cost per entry does not grow with the
+number of patterns. States usually empty out a few levels below where
+their patterns apply, and entries of a directory with an empty state are
+not checked at all.
+"""
+
+import os
+import re
+import fnmatch
+import itertools
+from collections import Counter
+
+
+# Per-directory pattern file, read while scanning
+IGNORE_FILE = '.sweepignore'
+
+_MAGIC = re.compile(r'[*?[]')
+_LITERAL_SUFFIX = re.compile(r'[^*?[\]]*\Z')
+
+
+class _Node:
+    """A position in a pattern trie: the components matched so far."""
+
+    __slots__ = ('recursive', 'star', 'names', 'globs', 'match', 'file_match', 'live',
+                 'prefixes', 'prefix_lengths', 'prefix_heads',
+                 'suffixes', 'suffix_lengths', 'suffix_tails', 'wild')
+
+    def __init__(self, recursive=False):
+        self.recursive = recursive   # a ** node, which any component leads back to
+        self.star = None             # ** child, reached together with this node
+        self.names = {}              # literal component -> child
+        self.globs = {}              # wildcard component -> child
+        self.match = None            # (priority, negated) of the last pattern ending here
+        self.file_match = None       # the same, of patterns that also match files
+        # Set by _freeze: wildcard children as (matcher or None, child)
+        # tuples keyed by literal prefix or suffix, or in wild when the
+        # wildcard has neither. Heads and tails are the keys cut to the
+        # shortest length, to rule out most names with one lookup.
+        self.live = False            # any component can lead on from here
+        self.prefixes = {}
+        self.prefix_lengths = ()
+        self.prefix_heads = frozenset()
+        self.suffixes = {}
+        self.suffix_lengths = ()
+        self.suffix_tails = frozenset()
+        self.wild = ()
+
+
+def _parse_pattern(line):
+    """
+    Split one pattern line.
+
+    Returns: (components, negated, dir_only), or None for blank lines
+    and comments; unanchored patterns start with a ** component
+    """
+    pattern = line.strip()
+    if not pattern or pattern.startswith('#'):
+        return None
+    negated = pattern.startswith('!')
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith('\\'):
+        # \# and \! stand for a literal # or !
+        pattern = pattern[1:]
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    components = [component for component in pattern.split('/') if component]
+    if not components:
+        return None
+    if '/' not in pattern:
+        components.insert(0, '**')
+    return components, negated, dir_only
+
+
+def _insert(root, components, priority, negated, dir_only):
+    """Add one pattern to a trie."""
+    node = root
+    for component in components:
+        if component == '**':
+            if not node.recursive:
+                if node.star is None:
+                    node.star = _Node(recursive=True)
+                node = node.star
+            continue
+        table = node.globs if _MAGIC.search(component) else node.names
+        child = table.get(component)
+        if child is None:
+            child = table[component] = _Node()
+        node = child
+    # Patterns are inserted in order, so this is the last one ending here
+    node.match = (priority, negated)
+    if not dir_only:
+        node.file_match = (priority, negated)
+
+
+def _freeze(node):
+    """Build the wildcard lookup tables of a finished trie."""
+    literals = {}
+    for glob in node.globs:
+        prefix = glob[:_MAGIC.search(glob).start()]
+        suffix = _LITERAL_SUFFIX.search(glob).group()
+        literals[glob] = prefix, suffix
+    prefix_counts = Counter(prefix for prefix, _suffix in literals.values())
+    suffix_counts = Counter(suffix for _prefix, suffix in literals.values())
+
+    prefixes = {}
+    suffixes = {}
+    wild = []
+    for glob, child in node.globs.items():
+        prefix, suffix = literals[glob]
+        # Key each wildcard by whichever of its literal ends fewer
+        # wildcards share, so no lookup returns a long list to test
+        use_prefix = prefix and (not suffix or (prefix_counts[prefix], -len(prefix))
+                                 < (suffix_counts[suffix], -len(suffix)))
+        if use_prefix:
+            exact = glob == prefix + '*'
+            table, key = prefixes, prefix
+        elif suffix:
+            exact = glob == '*' + suffix
+            table, key = suffixes, suffix
+        else:
+            exact = glob == '*'
+            table, key = None, None
+        item = (None if exact else re.compile(fnmatch.translate(glob)).match, child)
+        if table is None:
+            wild.append(item)
+        else:
+            table[key] = table.get(key, ()) + (item,)
+
+    node.prefixes = prefixes
+    node.prefix_lengths = tuple(sorted(set(map(len, prefixes))))
+    if prefixes:
+        node.prefix_heads = frozenset(key[:node.prefix_lengths[0]] for key in prefixes)
+    node.suffixes = suffixes
+    node.suffix_lengths = tuple(sorted(set(map(len, suffixes))))
+    if suffixes:
+        node.suffix_tails = frozenset(key[-node.suffix_lengths[0]:] for key in suffixes)
+    node.wild = tuple(wild)
+    node.live = bool(node.recursive or node.names or node.globs)
+
+    for child in node.names.values():
+        _freeze(child)
+    for child in node.globs.values():
+        _freeze(child)
+    if node.star is not None:
+        _freeze(node.star)
+
+
+def _reach(nodes, name):
+    """Nodes reached from nodes over a path component called name."""
+    reached = []
+    size = len(name)
+    for node in nodes:
+        if node.recursive:
+            reached.append(node)
+        child = node.names.get(name)
+        if child is not None:
+            reached.append(child)
+        if node.prefix_lengths and name[:node.prefix_lengths[0]] in node.prefix_heads:
+            prefixes = node.prefixes
+            for length in node.prefix_lengths:
+                if length > size:
+                    break
+                items = prefixes.get(name[:length])
+                if items is not None:
+                    for matcher, child in items:
+                        if matcher is None or matcher(name):
+                            reached.append(child)
+        if node.suffix_lengths and name[-node.suffix_lengths[0]:] in node.suffix_tails:
+            suffixes = node.suffixes
+            for length in node.suffix_lengths:
+                if length > size:
+                    break
+                items = suffixes.get(name[-length:])
+                if items is not None:
+                    for matcher, child in items:
+                        if matcher is None or matcher(name):
+                            reached.append(child)
+        for matcher, child in node.wild:
+            if matcher is None or matcher(name):
+                reached.append(child)
+    return reached
+
+
+def _excluded(rules):
+    """Return True if the last of the (priority, negated) rules or None excludes."""
+    best = None
+    for rule in rules:
+        if rule is not None and (best is None or rule[0] > best[0]):
+            best = rule
+    return best is not None and not best[1]
+
+
+def _live(reached):
+    """
+    State of a directory from the nodes its name reached, with the **
+    nodes they lead to. Those are added only here: foo/** matches what
+    is below foo, not foo itself.
+    """
+    nodes = []
+    for node in reached:
+        if node.live:
+            nodes.append(node)
+        if node.star is not None:
+            nodes.append(node.star)
+    return tuple(dict.fromkeys(nodes))
+
+
+class ExcludeMatcher:
+    """
+    The exclude patterns of one scan and the .sweepignore files found by it.
+
+    The scanner asks for the state of each directory it lists, and
+    passes it back to decide on every entry; states of kept
+    subdirectories are held until they are listed in turn, so each
+    directory inherits its parent's state whatever order the walk takes.
+    """
+
+    def __init__(self, patterns, roots, ignore_files=True):
+        """
+        Args:
+            patterns: Pattern strings, e.g. from --exclude
+            roots: Scan roots; anchored relative patterns match below
+                each of them
+            ignore_files: Read .sweepignore files in scanned directories
+        """
+        self.roots = list(roots)
+        self.ignore_files = ignore_files
+        # Set once any pattern can match files rather than directories only
+        self.files = False
+        self._priority = itertools.count()
+        self._pending = {}   # directory path -> state, until it is listed
+        # When set to a dict, the scanner records in it the state of every
+        # directory it lists, its own .sweepignore included (the watcher
+        # judges later events in a directory by it)
+        self.listed = None
+
+        absolute = []
+        relative = []
+        for pattern in patterns:
+            (absolute if pattern.strip().lstrip('!').startswith('/') else relative).append(pattern)
+        # Tries do not depend on where they apply, so each is compiled
+        # once and shared by every root
+        self._absolute = self._compile(absolute)
+        self._relative = self._compile(relative)
+
+    def _root_state(self, root):
+        """State of a scan root."""
+        state = self._absolute
+        for part in os.path.abspath(root).split(os.sep):
+            if not state:
+                break
+            if part:
+                state = _live(_reach(state, part))
+        return state + self._relative
+
+    def _compile(self, lines):
+        """State of the directory that pattern lines are relative to."""
+        root = _Node()
+        for line in lines:
+            parsed = _parse_pattern(line)
+            if parsed is None:
+                continue
+            components, negated, dir_only = parsed
+            _insert(root, components, next(self._priority), negated, dir_only)
+            if not dir_only:
+                self.files = True
+        _freeze(root)
+        return _live([root])
+
+    def read_ignore_file(self, state, dirpath):
+        """
+        Add the patterns of dirpath's .sweepignore to its state.
+
+        Returns: new state; state itself if the file cannot be read
+        """
+        try:
+            with open(os.path.join(dirpath, IGNORE_FILE), encoding='utf-8', errors='replace') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return state
+        return state + self._compile(lines)
+
+    def listed_state(self, dirpath):
+        """
+        State of a directory with its own .sweepignore read, as recorded
+        in listed when the directory was scanned, or else computed (and
+        recorded if listed is set).
+        """
+        listed = self.listed
+        state = listed.get(dirpath) if listed is not None else None
+        if state is None:
+            state = self.state_for(dirpath)
+            if self.ignore_files and os.path.isfile(os.path.join(dirpath, IGNORE_FILE)):
+                state = self.read_ignore_file(state, dirpath)
+            if listed is not None:
+                listed[dirpath] = state
+        return state
+
+    def pop_state(self, dirpath):
+        """
+        State of a directory about to be listed, before its own
+        .sweepignore is read; the one recorded when its parent was
+        listed, or else computed from its path.
+        """
+        state = self._pending.pop(dirpath, None)
+        return self.state_for(dirpath) if state is None else state
+
+    def state_for(self, dirpath):
+        """
+        State of an arbitrary directory at or below a root, from its
+        path components and the .sweepignore files above it.
+        """
+        root = next((root for root in self.roots if dirpath.startswith(os.path.join(root, ''))), None)
+        if root is None:
+            return self._root_state(dirpath)
+        state = self._root_state(root)
+        current = root
+        for part in os.path.relpath(dirpath, root).split(os.sep):
+            if self.ignore_files and os.path.isfile(os.path.join(current, IGNORE_FILE)):
+                state = self.read_ignore_file(state, current)
+            state = _live(_reach(state, part))
+            current = os.path.join(current, part)
+        return state
+
+    def enter_dir(self, state, name, path):
+        """
+        Decide on subdirectory name of a directory with state, and
+        record its state for when it is listed.
+
+        Returns: True unless the subdirectory is excluded
+        """
+        if state:
+            reached = _reach(state, name)
+            if reached and _excluded([node.match for node in reached]):
+                return False
+            state = _live(reached)
+        self._pending[path] = state
+        return True
+
+    def discard(self, path):
+        """
+        Forget the state recorded by enter_dir for a subdirectory that
+        will not be listed after all.
+        """
+        self._pending.pop(path, None)
+
+    def file_excluded(self, state, name):
+        """Return True if file name in a directory with state is excluded."""
+        if not state or not self.files:
+            return False
+        reached = _reach(state, name)
+        return bool(reached) and _excluded([node.file_match for node in reached])
@@ -7,78 +7,111 @@ import os
 import atexit
 from pathlib import Path
 from datetime import datetime
-from dataclasses import dataclass
 
 from PyQt6.QtWidgets import QApplication
 
 from gui.main_window import FileViewerWindow
-
-
-@dataclass
-class FileEntry:
-    """Represents a file entry (matches scanner.FileEntry structure)."""
-    path: Path
-    size: int
-    modified: datetime
-    category: str
+from results import ResultStore, MappedResults, is_results_file
 
 
 def load_file_data(input_source):
     """
     Load file data from various input sources.
 
+    A binary results file from sweep (ResultStore.save) is mapped rather
+    than parsed, so loading it takes the same time for any number of
+    files. JSON input may be a list of file objects or a document written
+    by `sweep --json`.
+
     Args:
-        input_source: Can be a JSON file path, list of file paths, or stdin
+        input_source: Path of a binary results file or a JSON file
 
     Returns:
-        List of FileEntry objects
+        MappedResults, or a ResultStore for JSON input
     """
-    file_entries = []
+    if is_results_file(input_source):
+        return MappedResults(input_source)
+
+    results = ResultStore()
 
     # If input is a JSON file
     if isinstance(input_source, str) and input_source.endswith('.json'):
         with open(input_source, 'r') as f:
             data = json.load(f)
 
+        if isinstance(data, dict):
+            data = data.get('files', [])
+
         for item in data:
-            file_entries.append(FileEntry(
-                path=Path(item['path']),
-                size=item['size'],
-                modified=datetime.fromisoformat(item['modified']),
-                category=item.get('category', 'Unknown')
-            ))
+            path = Path(item['path'])
+            results.append(
+                str(path.parent),
+                path.name,
+                item['size'],
+                datetime.fromisoformat(item['modified']).timestamp(),
+                item.get('category', 'Unknown'),
+                item.get('allocated', item['size'])
+            )
+
+    return results
+
+
+def open_viewer(results, live=None):
+    """
+    Show the viewer window, creating the QApplication if needed.
+
+    The caller runs the event loop with app.exec(). sweep --in-process
+    calls this on its ResultStore directly, so results are not written
+    out or read back.
 
-    return file_entries
+    Args:
+        results: ResultStore or MappedResults
+        live: Optional binary stream from a running scan (see
+            FileViewerWindow)
+
+    Returns: (QApplication, FileViewerWindow)
+    """
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.setApplicationName('Sweep File Viewer')
+    window = FileViewerWindow(results, live=live)
+    window.show()
+    return app, window
 
 
 def main():
     """Main entry point for the GUI application."""
-    if len(sys.argv) < 2:
-        print("Usage: file_viewer.py <json_file>")
+    args = sys.argv[1:]
+    # sweep hands results over in a temporary file, which the viewer
+    # deletes on exit; files opened any other way are left alone
+    delete_after = '--delete-after' in args
+    if delete_after:
+        args.remove('--delete-after')
+
+    if not args:
+        print("Usage: file_viewer.py [--delete-after] <results_file>")
+        print("       file_viewer.py --stream  (results from a running scan on stdin)")
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    input_file = args[0]
+
+    if input_file == '--stream':
+        # Open empty and fill in as `sweep --live` sends results
+        app, _window = open_viewer(ResultStore(), live=sys.stdin.buffer)
+        sys.exit(app.exec())
 
     # Load file data
     try:
-        file_entries = load_file_data(input_file)
+        results = load_file_data(input_file)
     except Exception as e:
         print(f"Error loading file data: {e}")
         sys.exit(1)
 
     # Register cleanup for temp file
-    if input_file.endswith('.json'):
+    if delete_after:
         atexit.register(lambda: os.path.exists(input_file) and os.unlink(input_file))
 
-    # Create and run Qt application
-    app = QApplication(sys.argv)
-    app.setApplicationName('Sweep File Viewer')
-
-    # Create and show main window
-    window = FileViewerWindow(file_entries)
-    window.show()
-
-    # Start event loop
+    # Create and show main window, then run the event loop
+    app, _window = open_viewer(results)
     sys.exit(app.exec())
 
 
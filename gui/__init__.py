@@ -2,4 +2,4 @@
 GUI package for Sweep file viewer.
 """
 
-__all__ = ['main_window', 'file_table', 'file_model', 'native_ops']
+__all__ = ['main_window', 'file_table', 'file_model', 'native_ops', 'search', 'live_feed', 'trash']
@@ -1,20 +1,16 @@
 """Data model and formatting utilities for file entries."""
 
-from dataclasses import dataclass
+import os
+from array import array
+from collections import deque
+from functools import lru_cache
+from itertools import chain, compress, repeat
 from pathlib import Path
 from datetime import datetime
 
+from PyQt6.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex
 
-@dataclass
-class FileTableRow:
-    """Represents a row in the file table with formatted display values."""
-    path: Path
-    name: str
-    size: str          # Formatted: "1.2 MB"
-    size_bytes: int    # For sorting
-    kind: str
-    modified: str      # Formatted: "Jan 1, 2024"
-    modified_ts: float # For sorting
+from .search import SearchIndex, parse_query
 
 
 def format_size(bytes_size: int) -> str:
@@ -50,6 +46,29 @@ def format_date(dt: datetime) -> str:
     return dt.strftime("%b %d, %Y, %I:%M %p")
 
 
+@lru_cache(maxsize=256)
+def kind_title(category: str) -> str:
+    """Category name as shown in the Kind column, e.g. "Disk_Image"."""
+    return category.title()
+
+
+@lru_cache(maxsize=4096)
+def _minute_text(minute: int) -> str:
+    """format_date of the start of a minute, in minutes since the epoch."""
+    return format_date(datetime.fromtimestamp(minute * 60))
+
+
+def date_text(mtime: float) -> str:
+    """
+    format_date of an epoch timestamp.
+
+    Dates are shown to the minute, and files from one extraction or
+    build share minutes, so strings are cached per minute rather than
+    formatted per cell.
+    """
+    return _minute_text(int(mtime // 60))
+
+
 def get_file_kind(path: Path) -> str:
     """
     Get file kind/type from extension or category.
@@ -97,22 +116,393 @@ def get_file_kind(path: Path) -> str:
     return 'File'
 
 
-def create_table_row(file_entry) -> FileTableRow:
+# Column order of the file table
+COLUMNS = ['Name', 'Size', 'Kind', 'Date Modified']
+NAME_COLUMN, SIZE_COLUMN, KIND_COLUMN, DATE_COLUMN = range(len(COLUMNS))
+
+
+class FileTableModel(QAbstractTableModel):
     """
-    Convert a FileEntry to a FileTableRow with formatted display values.
+    Table model reading straight from a results store's columns.
 
-    Args:
-        file_entry: FileEntry object from scanner
+    Nothing is built per row up front: data() formats the few cells the
+    view asks for, so the model costs the same to create for any number
+    of files. Sort keys are taken from whole columns when first needed.
+    """
 
-    Returns:
-        FileTableRow with formatted data
+    def __init__(self, results, parent=None):
+        """
+        Initialize the model.
+
+        Args:
+            results: ResultStore or MappedResults
+            parent: Parent QObject
+        """
+        super().__init__(parent)
+        self.results = results
+        self._search_index = None
+        self._row_of = None        # path -> latest row, built by rows_of()
+        self._rows_mapped = 0      # rows added to _row_of so far
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.results)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        column = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == NAME_COLUMN:
+                return self.results.name(row)
+            if column == SIZE_COLUMN:
+                return format_size(self.results.sizes[row])
+            if column == KIND_COLUMN:
+                return kind_title(self.results.category(row))
+            return date_text(self.results.mtimes[row])
+
+        if role == Qt.ItemDataRole.TextAlignmentRole and column == SIZE_COLUMN:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+
+        return None
+
+    def path(self, row):
+        """Full Path of row."""
+        return self.results.path(row)
+
+    def append_matches(self, matches):
+        """
+        Add rows to the end of the results, e.g. from a live scan.
+
+        Args:
+            matches: List of (dirpath, name, size, mtime, category,
+                allocated) tuples; results must be a ResultStore
+        """
+        if not matches:
+            return
+        first = len(self.results)
+        self.beginInsertRows(QModelIndex(), first, first + len(matches) - 1)
+        self.results.extend(matches)
+        self.endInsertRows()
+
+    def rows_of(self, paths):
+        """
+        Latest rows holding paths, for those that have one.
+
+        The path -> row map is built on first use and extended with rows
+        appended since, so only watched trees pay for it.
+
+        Args:
+            paths: Path strings
+
+        Returns: List of rows
+        """
+        if self._row_of is None:
+            self._row_of = {}
+        start = self._rows_mapped
+        if start < len(self.results):
+            dirs = self.results.dirpaths()
+            join = os.path.join
+            self._row_of.update(
+                (join(dirs[code], name), row)
+                for row, code, name in zip(
+                    range(start, len(self.results)), self.results.dir_codes[start:], self.results.names(start)
+                )
+            )
+            self._rows_mapped = len(self.results)
+        row_of = self._row_of
+        return [row_of[path] for path in paths if path in row_of]
+
+    def search_index(self):
+        """SearchIndex of the results, built on first use and kept up to date with appended rows."""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.results)
+        elif len(self._search_index) < len(self.results):
+            self._search_index.update()
+        return self._search_index
+
+    def sort_keys(self, column):
+        """
+        One sort key per row for column.
+
+        Returns: Sequence indexable by row
+        """
+        if column == NAME_COLUMN:
+            return self.search_index().names
+        if column == SIZE_COLUMN:
+            return self.results.sizes.tolist()
+        if column == KIND_COLUMN:
+            # Rank category codes by displayed name; a bytes object
+            # indexes to ints without building a list
+            categories = self.results.category_names()
+            ranks = sorted(range(len(categories)), key=lambda code: kind_title(categories[code]))
+            table = bytearray(256)
+            for rank, code in enumerate(ranks):
+                table[code] = rank
+            return bytes(self.results.category_codes).translate(table)
+        return self.results.mtimes.tolist()
+
+
+class FileSortFilterProxy(QAbstractProxyModel):
     """
-    return FileTableRow(
-        path=file_entry.path,
-        name=file_entry.path.name,
-        size=format_size(file_entry.size),
-        size_bytes=file_entry.size,
-        kind=file_entry.category.title() if hasattr(file_entry, 'category') else get_file_kind(file_entry.path),
-        modified=format_date(file_entry.modified),
-        modified_ts=file_entry.modified.timestamp()
-    )
+    Sorting and filtering proxy over a FileTableModel.
+
+    QSortFilterProxyModel compares rows through data() calls, which is
+    far too slow from Python at millions of rows. This proxy keeps the
+    visible source rows in an array('I') instead: sorting is one
+    key-based sorted() over a whole column, cached per column, with
+    descending order read off the ascending one in reverse. Filtering
+    asks the model's SearchIndex for the matching rows and puts them in
+    sort order by rank. Rows removed with remove_rows() stay hidden
+    through later sorts and filters.
+
+    Rows appended to the source model (a live scan) are sorted into the
+    current order and tested against the current search as they arrive.
+    """
+
+    def __init__(self, parent=None):
+        """Initialize the proxy."""
+        super().__init__(parent)
+        self._sorted = None           # source rows in sort order, unfiltered; a range in result order
+        self._rows = array('I')       # visible source rows, in display order
+        self._positions = None        # source row -> visible position, built on demand
+        self._sort_cache = {}
+        self._rank_cache = {}
+        self._sort_key = None
+        self._terms = []
+        self._matches = None          # (terms, source rows) of the current search
+        self._removed = set()
+
+    def setSourceModel(self, model):
+        self.beginResetModel()
+        if self.sourceModel() is not None:
+            self.sourceModel().rowsInserted.disconnect(self._insert_source_rows)
+        super().setSourceModel(model)
+        model.rowsInserted.connect(self._insert_source_rows)
+        self._sort_cache = {}
+        self._rank_cache = {}
+        self._sort_key = None
+        self._terms = []
+        self._matches = None
+        self._removed = set()
+        # A range, not an array, so opening costs nothing per row
+        self._sorted = range(model.rowCount())
+        self._rows = self._sorted
+        self._positions = None
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not 0 <= row < len(self._rows) or not 0 <= column < len(COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()], proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if isinstance(self._rows, range):
+            # Unsorted and unfiltered: rows are where they are in the source
+            position = source_index.row()
+            return self.createIndex(position, source_index.column()) if position < len(self._rows) else QModelIndex()
+        if self._positions is None:
+            self._positions = {row: position for position, row in enumerate(self._rows)}
+        position = self._positions.get(source_index.row())
+        if position is None:
+            return QModelIndex()
+        return self.createIndex(position, source_index.column())
+
+    def source_row(self, row):
+        """Source row shown at visible row."""
+        return self._rows[row]
+
+    @property
+    def total_count(self):
+        """Number of rows not removed, whether or not the filter shows them."""
+        return len(self._sorted) - len(self._removed)
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        key = (column, order)
+        if key == self._sort_key or self.sourceModel() is None:
+            return
+
+        self.layoutAboutToBeChanged.emit()
+        if column < 0:
+            # No sort column: result order
+            rows = range(self.sourceModel().rowCount())
+        else:
+            rows = self._sort_cache.get(column)
+            if rows is None:
+                keys = self.sourceModel().sort_keys(column)
+                rows = self._sort_cache[column] = array('I', sorted(range(len(keys)), key=keys.__getitem__))
+            if order == Qt.SortOrder.DescendingOrder:
+                rows = rows[::-1]
+        self._sort_key = key
+        self._sorted = rows
+        self._apply_filter()
+        self.layoutChanged.emit()
+
+    def set_filter_text(self, text):
+        """
+        Show only rows matching a search query (see search.parse_query).
+
+        A query extending the previous one only re-tests the rows that
+        matched before.
+        """
+        terms = parse_query(text)
+        if terms == self._terms or self.sourceModel() is None:
+            return
+
+        self.beginResetModel()
+        if terms:
+            rows = self.sourceModel().search_index().search(terms, self._matches)
+            self._matches = (terms, rows)
+        else:
+            self._matches = None
+        self._terms = terms
+        self._apply_filter()
+        self.endResetModel()
+
+    def _insert_source_rows(self, _parent, first, last):
+        """Show rows appended to the source model that pass the search."""
+        new = range(first, last + 1)
+        added = new
+        if self._matches is not None:
+            terms, rows = self._matches
+            added = self.sourceModel().search_index().filter(terms, new)
+            self._matches = (terms, rows + added)
+
+        column, order = self._sort_key if self._sort_key else (-1, None)
+        if column < 0:
+            # Result order: new rows go at the bottom
+            if added:
+                end = len(self._rows)
+                self.beginInsertRows(QModelIndex(), end, end + len(added) - 1)
+            self._sorted = range(last + 1)
+            self._apply_filter()
+            if added:
+                self.endInsertRows()
+            return
+
+        # The cached order is a run timsort merges with the sorted new
+        # rows in one pass; other columns are sorted again when picked
+        self.layoutAboutToBeChanged.emit()
+        keys = self.sourceModel().sort_keys(column)
+        ascending = array('I', sorted(chain(self._sort_cache[column], new), key=keys.__getitem__))
+        self._sort_cache = {column: ascending}
+        self._rank_cache = {}
+        self._sorted = ascending[::-1] if order == Qt.SortOrder.DescendingOrder else ascending
+        self._apply_filter()
+        self.layoutChanged.emit()
+
+    def _apply_filter(self):
+        """Rebuild the visible rows from the sorted rows and the search matches."""
+        removed = self._removed
+        if self._matches is None:
+            rows = self._sorted
+        else:
+            rows = self._in_sort_order(self._matches[1])
+
+        if removed:
+            rows = array('I', [row for row in rows if row not in removed])
+        self._rows = rows
+        self._positions = None
+
+    def _in_sort_order(self, rows):
+        """Put ascending source rows into the current sort order."""
+        column, order = self._sort_key if self._sort_key else (-1, None)
+        if column < 0:
+            return rows
+
+        if len(rows) == len(self._sorted):
+            return self._sorted
+        if len(rows) * 8 > len(self._sorted):
+            # Many matches: filtering the sorted rows beats sorting the matches
+            matched = bytearray(len(self._sorted))
+            deque(map(matched.__setitem__, rows, repeat(1)), maxlen=0)
+            return array('I', compress(self._sorted, map(matched.__getitem__, self._sorted)))
+
+        ranks = self._rank_cache.get(column)
+        if ranks is None:
+            ranks = self._rank_cache[column] = array('I', [0]) * len(self._sorted)
+            for rank, row in enumerate(self._sort_cache[column]):
+                ranks[row] = rank
+        return array('I', sorted(rows, key=ranks.__getitem__, reverse=order == Qt.SortOrder.DescendingOrder))
+
+    def hide_source_rows(self, rows):
+        """
+        Remove source rows wherever they are shown, e.g. of files that
+        changed or disappeared on disk; rows already removed are skipped.
+
+        Args:
+            rows: Source row numbers
+        """
+        rows = set(rows) - self._removed
+        if not rows:
+            return
+        if isinstance(self._rows, range):
+            visible = [row for row in rows if row < len(self._rows)]
+        else:
+            if self._positions is None:
+                self._positions = {row: position for position, row in enumerate(self._rows)}
+            visible = [self._positions[row] for row in rows if row in self._positions]
+        # Rows hidden by the search stay out of later searches and sorts too
+        self._removed.update(rows)
+        self.remove_rows(visible)
+
+    def remove_rows(self, rows):
+        """
+        Remove visible rows, e.g. after their files were trashed.
+
+        Args:
+            rows: Visible row numbers
+        """
+        rows = sorted(set(rows), reverse=True)
+        if not rows:
+            return
+        if self._rows is self._sorted:
+            self._rows = array('I', self._rows)
+
+        # Remove contiguous runs from the bottom up so row numbers stay valid
+        runs = []
+        end = start = rows[0]
+        for row in rows[1:]:
+            if row != start - 1:
+                runs.append((start, end))
+                end = row
+            start = row
+        runs.append((start, end))
+
+        for start, end in runs:
+            self.beginRemoveRows(QModelIndex(), start, end)
+            self._removed.update(self._rows[start:end + 1])
+            del self._rows[start:end + 1]
+            self._positions = None
+            self.endRemoveRows()
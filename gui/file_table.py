@@ -1,62 +1,50 @@
 """Custom table widget for displaying files."""
 
-from PyQt6.QtWidgets import QTableWidget, QTableWidgetItem, QAbstractItemView, QMenu
+import os
+
+from PyQt6.QtWidgets import QTableView, QAbstractItemView, QHeaderView, QMenu
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QAction
 
-from .file_model import FileTableRow, create_table_row
-from .native_ops import open_file, show_in_finder, copy_path_to_clipboard
-
-
-class SortableTableItem(QTableWidgetItem):
-    """Custom table item that supports proper sorting of numeric values."""
-
-    def __init__(self, text, sort_value=None):
-        """
-        Initialize sortable item.
-
-        Args:
-            text: Display text
-            sort_value: Value to use for sorting (if different from text)
-        """
-        super().__init__(text)
-        if sort_value is not None:
-            self.setData(Qt.ItemDataRole.UserRole, sort_value)
-
-    def __lt__(self, other):
-        """Compare items for sorting."""
-        self_data = self.data(Qt.ItemDataRole.UserRole)
-        other_data = other.data(Qt.ItemDataRole.UserRole)
-
-        if self_data is not None and other_data is not None:
-            return self_data < other_data
+from .file_model import FileTableModel, FileSortFilterProxy
+from .native_ops import open_file, show_in_finder, copy_path_to_clipboard, move_to_trash
 
-        return super().__lt__(other)
 
+class FileTableView(QTableView):
+    """
+    Table view for displaying file information.
 
-class FileTableWidget(QTableWidget):
-    """Custom table widget for displaying file information."""
+    Rows come from a FileTableModel behind a FileSortFilterProxy, so only
+    the visible cells are ever formatted.
+    """
 
     def __init__(self, parent=None):
-        """Initialize the file table widget."""
+        """Initialize the file table view."""
         super().__init__(parent)
+        self.source_model = None
+        self.proxy = FileSortFilterProxy(self)
         self.setup_table()
 
     def setup_table(self):
         """Configure table appearance and behavior."""
-        # Set columns
-        self.setColumnCount(4)
-        self.setHorizontalHeaderLabels(['Name', 'Size', 'Kind', 'Date Modified'])
+        self.setModel(self.proxy)
 
-        # Enable sorting
+        # Sorting is done by the proxy on header clicks; start unsorted
+        header = self.horizontalHeader()
+        header.setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        header.setSortIndicatorShown(False)
+        header.sortIndicatorChanged.connect(self._show_sort_indicator)
         self.setSortingEnabled(True)
 
         # Set selection behavior
         self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
 
+        # Fixed row heights let the view skip measuring rows
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.verticalHeader().hide()
+
         # Set column widths
-        header = self.horizontalHeader()
         header.setStretchLastSection(True)
         self.setColumnWidth(0, 300)  # Name
         self.setColumnWidth(1, 100)  # Size
@@ -68,49 +56,69 @@ class FileTableWidget(QTableWidget):
         # Alternating row colors for better readability
         self.setAlternatingRowColors(True)
 
-    def populate_files(self, file_entries):
+    def populate_files(self, results):
         """
-        Populate table with file entries.
+        Show a result set.
+
+        Rows start in result order (largest first for --limit scans);
+        clicking a header sorts. An initial sort by name would decode
+        every filename before the first paint.
 
         Args:
-            file_entries: List of FileEntry objects
+            results: ResultStore or MappedResults
         """
-        self.setRowCount(0)  # Clear existing rows
-        self.setSortingEnabled(False)  # Disable sorting while populating
+        self.source_model = FileTableModel(results, self)
+        self.proxy.setSourceModel(self.source_model)
 
-        for entry in file_entries:
-            row_data = create_table_row(entry)
-            self.add_row(row_data)
+    def append_matches(self, matches):
+        """
+        Add files from a live scan; they are sorted and filtered like the rest.
 
-        self.setSortingEnabled(True)  # Re-enable sorting
-        self.sortItems(0, Qt.SortOrder.AscendingOrder)  # Sort by name initially
+        Args:
+            matches: List of match tuples (see ResultStore.append)
+        """
+        self.source_model.append_matches(matches)
 
-    def add_row(self, row_data: FileTableRow):
+    def replace_files(self, matches, removed):
         """
-        Add a single row to the table.
+        Apply changes on disk: rows of removed paths and the earlier rows
+        of matches' paths are removed, and matches are added as new rows.
 
         Args:
-            row_data: FileTableRow object
+            matches: List of match tuples of new or changed files
+            removed: List of path strings
         """
-        row = self.rowCount()
-        self.insertRow(row)
+        paths = [os.path.join(match[0], match[1]) for match in matches]
+        self.proxy.hide_source_rows(self.source_model.rows_of(paths + list(removed)))
+        self.source_model.append_matches(matches)
+
+    def _show_sort_indicator(self, column, _order):
+        """Show the sort arrow once the user has picked a column."""
+        self.horizontalHeader().setSortIndicatorShown(column >= 0)
 
-        # Name column
-        name_item = SortableTableItem(row_data.name)
-        name_item.setData(Qt.ItemDataRole.UserRole + 1, str(row_data.path))  # Store full path
-        self.setItem(row, 0, name_item)
+    def set_filter_text(self, text):
+        """Show only files whose name contains text."""
+        self.proxy.set_filter_text(text)
 
-        # Size column (with numeric value for sorting)
-        size_item = SortableTableItem(row_data.size, row_data.size_bytes)
-        self.setItem(row, 1, size_item)
+    def visible_count(self):
+        """Number of rows passing the filter."""
+        return self.proxy.rowCount()
 
-        # Kind column
-        kind_item = SortableTableItem(row_data.kind)
-        self.setItem(row, 2, kind_item)
+    def total_count(self):
+        """Number of files not removed from the table."""
+        return self.proxy.total_count
+
+    def selected_rows(self):
+        """
+        Get visible row numbers of the selection.
 
-        # Date Modified column (with timestamp for sorting)
-        date_item = SortableTableItem(row_data.modified, row_data.modified_ts)
-        self.setItem(row, 3, date_item)
+        Returns:
+            List of row numbers
+        """
+        rows = []
+        for selection_range in self.selectionModel().selection():
+            rows.extend(range(selection_range.top(), selection_range.bottom() + 1))
+        return rows
 
     def get_selected_files(self):
         """
@@ -119,30 +127,35 @@ class FileTableWidget(QTableWidget):
         Returns:
             List of Path objects for selected files
         """
-        from pathlib import Path
+        return [
+            self.source_model.path(self.proxy.source_row(row))
+            for row in sorted(set(self.selected_rows()))
+        ]
 
-        selected_rows = set(item.row() for item in self.selectedItems())
-        file_paths = []
-
-        for row in selected_rows:
-            name_item = self.item(row, 0)
-            if name_item:
-                path_str = name_item.data(Qt.ItemDataRole.UserRole + 1)
-                if path_str:
-                    file_paths.append(Path(path_str))
+    def trash_selected(self):
+        """
+        Move the selected files to the trash and remove the rows of the
+        files that were moved; rows of files that could not be moved stay.
 
-        return file_paths
+        Returns:
+            TrashResult, or None if nothing is selected
+        """
+        rows = sorted(set(self.selected_rows()))
+        if not rows:
+            return None
+        paths = [self.source_model.path(self.proxy.source_row(row)) for row in rows]
+        result = move_to_trash(paths)
+        self.remove_rows([row for row, moved in zip(rows, result.moved) if moved])
+        return result
 
     def remove_rows(self, row_indices):
         """
         Remove rows from the table.
 
         Args:
-            row_indices: List of row indices to remove
+            row_indices: List of visible row numbers to remove
         """
-        # Remove in reverse order to avoid index shifting issues
-        for row in sorted(row_indices, reverse=True):
-            self.removeRow(row)
+        self.proxy.remove_rows(row_indices)
 
     def mouseDoubleClickEvent(self, event):
         """Handle double-click to open file."""
@@ -206,16 +219,4 @@ class FileTableWidget(QTableWidget):
 
     def _move_to_trash(self):
         """Move selected files to trash."""
-        from .native_ops import move_to_trash
-
-        selected_files = self.get_selected_files()
-        if not selected_files:
-            return
-
-        # Get row indices to remove
-        selected_rows = set(item.row() for item in self.selectedItems())
-
-        # Move to trash
-        if move_to_trash(selected_files):
-            # Remove from table if successful
-            self.remove_rows(selected_rows)
+        self.trash_selected()
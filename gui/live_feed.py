@@ -0,0 +1,112 @@
+"""Feed results from a running scan into the viewer."""
+
+import time
+import queue
+import threading
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from live import read_frames, ROWS, END, CHANGES
+
+
+# Shortest time between two table updates
+UPDATE_INTERVAL_MS = 250
+
+# Share of the time table updates may take; once an update gets slow
+# (merging new rows into a sorted view of millions), the next one waits
+# longer so the window stays responsive, up to MAX_UPDATE_INTERVAL_MS
+UPDATE_SHARE = 0.25
+MAX_UPDATE_INTERVAL_MS = 2000
+
+
+class LiveFeed(QObject):
+    """
+    Read batches from a LiveWriter stream and hand them to the window.
+
+    The stream is read and decoded on a background thread. The event
+    loop collects whatever has arrived on a timer and emits it as one
+    batch, so the table is updated a few times a second however fast
+    the scan goes. Under sweep --watch the stream carries on after the
+    scan with batches of files changed on disk, emitted in order.
+    """
+
+    rows_received = pyqtSignal(list)
+    progress = pyqtSignal(int)
+    finished = pyqtSignal()
+    changes_received = pyqtSignal(list, list)   # (match tuples, removed paths)
+
+    def __init__(self, stream, parent=None):
+        """
+        Initialize the feed.
+
+        Args:
+            stream: Binary stream written by live.LiveWriter
+            parent: Parent QObject
+        """
+        super().__init__(parent)
+        self._batches = queue.SimpleQueue()
+        self._reader = threading.Thread(target=self._read, args=(stream,), daemon=True)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._deliver)
+        self.directories = 0
+        self.scanning = True
+
+    def start(self):
+        """Start reading."""
+        self._reader.start()
+        self._timer.start(UPDATE_INTERVAL_MS)
+
+    def _read(self, stream):
+        """Reader thread: queue each (kind, data) frame, then None at the end."""
+        try:
+            for frame in read_frames(stream):
+                self._batches.put(frame)
+        except (OSError, ValueError, EOFError):
+            # Broken stream; treat it as the end of the scan
+            pass
+        finally:
+            self._batches.put(None)
+
+    def _deliver(self):
+        """Emit everything that has arrived since the last call."""
+        started = time.perf_counter()
+        matches = []
+        closed = False
+        while True:
+            try:
+                frame = self._batches.get_nowait()
+            except queue.Empty:
+                break
+            if frame is None:
+                closed = True
+                break
+            kind, data = frame
+            if kind == ROWS:
+                self.directories, rows = data
+                matches += rows
+                continue
+            # Rows found so far go first, so changes apply to them
+            if matches:
+                self.rows_received.emit(matches)
+                matches = []
+            if kind == END:
+                self.progress.emit(self.directories)
+                self.scanning = False
+                self.finished.emit()
+            elif kind == CHANGES:
+                self.changes_received.emit(*data)
+
+        if matches:
+            self.rows_received.emit(matches)
+        if self.scanning:
+            self.progress.emit(self.directories)
+            if closed:
+                # Stream ended without the end of the scan (sweep stopped)
+                self.scanning = False
+                self.finished.emit()
+        if closed:
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._timer.start(min(max(UPDATE_INTERVAL_MS, int(elapsed_ms / UPDATE_SHARE)), MAX_UPDATE_INTERVAL_MS))
@@ -1,35 +1,60 @@
 """Main window for the file viewer application."""
 
+from datetime import datetime
+
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLineEdit, QPushButton, QLabel, QMessageBox
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction, QKeySequence
 
-from .file_table import FileTableWidget
-from .native_ops import move_to_trash
+from .file_table import FileTableView
+from .file_model import format_size
+from .live_feed import LiveFeed
+
+
+# Wait this long after the last keystroke before searching
+SEARCH_DELAY_MS = 150
+
+# Files listed when some could not be moved to the trash
+TRASH_ERRORS_SHOWN = 10
 
 
 class FileViewerWindow(QMainWindow):
     """Main window for viewing and managing files."""
 
-    def __init__(self, file_entries, parent=None):
+    def __init__(self, results, live=None, parent=None):
         """
         Initialize the file viewer window.
 
         Args:
-            file_entries: List of FileEntry objects to display
+            results: ResultStore or MappedResults to display
+            live: Optional binary stream from a running scan
+                (live.LiveWriter); its files are added to results, which
+                must then be a ResultStore, as they arrive, and under
+                sweep --watch changes on disk are applied after the scan
             parent: Parent widget
         """
         super().__init__(parent)
-        self.file_entries = file_entries
+        self.results = results
+        self.live_feed = None
+        self.last_change = None    # time of the last change applied, as text
+        self.found_bytes = results.total_size() if live is not None else 0
         self.setup_ui()
         self.setup_shortcuts()
 
         # Populate table with files
-        if file_entries:
-            self.file_table.populate_files(file_entries)
+        self.file_table.populate_files(results)
+
+        if live is not None:
+            self.live_feed = LiveFeed(live, self)
+            self.live_feed.rows_received.connect(self.add_files)
+            self.live_feed.progress.connect(lambda _directories: self.show_counts())
+            self.live_feed.finished.connect(self.scan_finished)
+            self.live_feed.changes_received.connect(self.apply_changes)
+            self.live_feed.start()
+            self.show_counts()
 
     def setup_ui(self):
         """Set up the user interface."""
@@ -47,14 +72,22 @@ class FileViewerWindow(QMainWindow):
         search_layout = QHBoxLayout()
         search_label = QLabel('Search:')
         self.search_box = QLineEdit()
-        self.search_box.setPlaceholderText('Filter files by name...')
-        self.search_box.textChanged.connect(self.filter_files)
+        self.search_box.setPlaceholderText('Filter by name, or path:text kind:video size>1G modified<2024-01-01')
+        self.search_box.setClearButtonEnabled(True)
+
+        # Search once typing pauses rather than on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_box.textChanged.connect(self.search_timer.start)
+        self.search_box.returnPressed.connect(self.run_search)
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.search_box)
         main_layout.addLayout(search_layout)
 
         # File table
-        self.file_table = FileTableWidget()
+        self.file_table = FileTableView()
         main_layout.addWidget(self.file_table)
 
         # Bottom button bar
@@ -68,7 +101,7 @@ class FileViewerWindow(QMainWindow):
         main_layout.addLayout(button_layout)
 
         # Status bar to show file count
-        self.statusBar().showMessage(f'{len(self.file_entries)} files found')
+        self.statusBar().showMessage(f'{len(self.results)} files found')
 
     def setup_shortcuts(self):
         """Set up keyboard shortcuts."""
@@ -95,35 +128,66 @@ class FileViewerWindow(QMainWindow):
         self.search_box.setFocus()
         self.search_box.selectAll()
 
+    def run_search(self):
+        """Apply the search box text now instead of after the delay."""
+        self.search_timer.stop()
+        self.filter_files(self.search_box.text())
+
     def filter_files(self, search_text):
         """
         Filter table rows based on search text.
 
         Args:
-            search_text: Text to search for in file names
+            search_text: Search query (see gui.search.parse_query)
         """
-        search_text = search_text.lower()
-
-        for row in range(self.file_table.rowCount()):
-            item = self.file_table.item(row, 0)  # Name column
-            if item:
-                file_name = item.text().lower()
-                # Show row if search text is in file name, hide otherwise
-                self.file_table.setRowHidden(row, search_text not in file_name)
-
-        # Update status bar with visible count
-        visible_count = sum(
-            1 for row in range(self.file_table.rowCount())
-            if not self.file_table.isRowHidden(row)
-        )
-        total_count = self.file_table.rowCount()
+        self.file_table.set_filter_text(search_text)
 
-        if search_text:
-            self.statusBar().showMessage(
-                f'{visible_count} of {total_count} files shown'
-            )
+        self.show_counts()
+
+    def add_files(self, matches):
+        """
+        Add files found by a live scan.
+
+        Args:
+            matches: List of match tuples
+        """
+        self.file_table.append_matches(matches)
+        self.found_bytes += sum(match[2] for match in matches)
+
+    def scan_finished(self):
+        """Stop showing scan progress once a live scan is done."""
+        self.show_counts()
+
+    def apply_changes(self, matches, removed):
+        """
+        Apply files changed on disk, as seen by sweep --watch.
+
+        Args:
+            matches: Match tuples of new or changed files
+            removed: Paths of files that no longer match
+        """
+        self.file_table.replace_files(matches, removed)
+        self.last_change = datetime.now().strftime('%H:%M:%S')
+        self.show_counts()
+
+    def show_counts(self):
+        """Show file counts, and scan progress while a live scan runs, in the status bar."""
+        visible_count = self.file_table.visible_count()
+        total_count = self.file_table.total_count()
+
+        if self.search_box.text():
+            message = f'{visible_count} of {total_count} files shown'
         else:
-            self.statusBar().showMessage(f'{total_count} files found')
+            message = f'{total_count} files found'
+
+        if self.live_feed is not None and self.live_feed.scanning:
+            message = (
+                f'Scanning... {message} ({format_size(self.found_bytes)}) '
+                f'in {self.live_feed.directories} directories'
+            )
+        elif self.last_change is not None:
+            message += f' (watching for changes, last at {self.last_change})'
+        self.statusBar().showMessage(message)
 
     def move_selected_to_trash(self):
         """Move selected files to trash."""
@@ -153,22 +217,21 @@ class FileViewerWindow(QMainWindow):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
-            # Get row indices before moving
-            selected_rows = set(item.row() for item in self.file_table.selectedItems())
-
-            # Move to trash
-            if move_to_trash(selected_files):
-                # Remove from table
-                self.file_table.remove_rows(selected_rows)
-
-                # Update status bar
-                remaining = self.file_table.rowCount()
-                self.statusBar().showMessage(
-                    f'{remaining} files remaining ({file_count} moved to trash)'
-                )
-            else:
+            # Only the rows of files actually moved are removed
+            result = self.file_table.trash_selected()
+
+            # Update status bar
+            remaining = self.file_table.total_count()
+            self.statusBar().showMessage(
+                f'{remaining} files remaining ({result.moved_count} moved to trash)'
+            )
+
+            if result.errors:
+                details = '\n'.join(result.errors[:TRASH_ERRORS_SHOWN])
+                if len(result.errors) > TRASH_ERRORS_SHOWN:
+                    details += f'\n... and {len(result.errors) - TRASH_ERRORS_SHOWN} more'
                 QMessageBox.warning(
                     self,
                     'Error',
-                    'Failed to move files to trash. Please check permissions.'
+                    f'{len(result.errors)} of {file_count} files could not be moved to trash:\n\n{details}'
                 )
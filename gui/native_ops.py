@@ -4,37 +4,24 @@ import subprocess
 from pathlib import Path
 from typing import List
 
+from .trash import TrashResult, get_backend
 
-def move_to_trash(file_paths: List[Path]) -> bool:
+
+def move_to_trash(file_paths: List[Path]) -> TrashResult:
     """
-    Move files to trash using macOS Finder.
+    Move files to the trash, in bulk, with the platform's backend (see
+    gui.trash).
 
     Args:
         file_paths: List of file paths to move to trash
 
     Returns:
-        True if successful, False otherwise
+        TrashResult saying which files were moved
     """
-    if not file_paths:
-        return False
-
-    try:
-        for file_path in file_paths:
-            # Use osascript to tell Finder to delete the file (moves to trash)
-            script = f'tell application "Finder" to delete POSIX file "{file_path}"'
-            result = subprocess.run(
-                ['osascript', '-e', script],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error moving files to trash: {e.stderr}")
-        return False
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return False
+    result = get_backend().trash(file_paths)
+    for error in result.errors:
+        print(f"Error moving file to trash: {error}")
+    return result
 
 
 def open_file(file_path: Path) -> bool:
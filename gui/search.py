@@ -0,0 +1,387 @@
+"""Search queries over the rows of a result set."""
+
+import os
+import shlex
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from collections import Counter, deque
+from itertools import accumulate, compress, repeat
+from dataclasses import dataclass
+
+from utils import parse_size
+
+
+# Once a name search has matched this fraction of the rows, testing every
+# row directly is cheaper than mapping index hits back to rows
+DENSE_FRACTION = 0.05
+
+COMPARISONS = ('>=', '<=', '>', '<', '=')
+
+FIELD_ALIASES = {
+    'name': 'name',
+    'path': 'path',
+    'kind': 'kind',
+    'category': 'kind',
+    'size': 'size',
+    'modified': 'modified',
+    'date': 'modified',
+}
+
+
+@dataclass(frozen=True)
+class TextTerm:
+    """Case-insensitive substring of the file name or full path."""
+    field: str
+    text: str
+
+    def narrows(self, other):
+        """Return True if every row matching self also matches other."""
+        return isinstance(other, TextTerm) and other.field == self.field and other.text in self.text
+
+
+@dataclass(frozen=True)
+class KindTerm:
+    """Category name starting with a prefix."""
+    prefix: str
+
+    def narrows(self, other):
+        """Return True if every row matching self also matches other."""
+        return isinstance(other, KindTerm) and self.prefix.startswith(other.prefix)
+
+
+@dataclass(frozen=True)
+class CompareTerm:
+    """Size (bytes) or modification time (epoch seconds) compared to a value."""
+    field: str
+    op: str
+    value: float
+
+    def narrows(self, other):
+        """Return True if every row matching self also matches other."""
+        if not isinstance(other, CompareTerm) or other.field != self.field or other.op != self.op:
+            return False
+        if self.op in ('>', '>='):
+            return self.value >= other.value
+        if self.op in ('<', '<='):
+            return self.value <= other.value
+        return self.value == other.value
+
+
+def _parse_value(field, text):
+    """Parse the value of a size or modified comparison."""
+    if field == 'size':
+        return parse_size(text)
+    return datetime.fromisoformat(text).timestamp()
+
+
+def parse_query(query):
+    """
+    Parse search box text into terms that must all match.
+
+    Words match file names. Other forms:
+        path:text            full path contains text
+        kind:video           category starts with text (also category:)
+        size>100M            size compared with >, >=, <, <= or =
+        modified<2024-01-01  modification date (also date:), ISO format
+    Quote words containing spaces. Incomplete or invalid comparisons,
+    such as "size>" while typing, are ignored.
+
+    Returns: List of terms
+    """
+    try:
+        words = shlex.split(query)
+    except ValueError:
+        # Unbalanced quote while typing
+        words = query.split()
+
+    terms = []
+    for word in words:
+        field, sep, text = word.partition(':')
+        field = FIELD_ALIASES.get(field.lower()) if sep else None
+        if field in ('name', 'path'):
+            if text:
+                terms.append(TextTerm(field, text.lower()))
+            continue
+        if field == 'kind':
+            terms.append(KindTerm(text.lower()))
+            continue
+
+        for op in COMPARISONS:
+            name, found, value = word.partition(op)
+            field = FIELD_ALIASES.get(name.lower())
+            if found and field in ('size', 'modified'):
+                try:
+                    terms.append(CompareTerm(field, op, _parse_value(field, value)))
+                except (ValueError, IndexError):
+                    pass
+                break
+        else:
+            terms.append(TextTerm('name', word.lower()))
+
+    return terms
+
+
+def refines(terms, previous):
+    """
+    Return True if terms can only match a subset of the rows matching
+    previous, e.g. "report" after "rep", or "big size>1G" after "big".
+    """
+    if len(terms) < len(previous):
+        return False
+    return all(term.narrows(old) for term, old in zip(terms, previous))
+
+
+class SearchIndex:
+    """
+    Lower-cased lookup tables for searching a result set, built once
+    and extended by update() when the set grows.
+
+    File names are also joined into one newline-separated string, so a
+    name search is a series of str.find calls running in C, with a
+    bisect per hit to recover its row.
+    """
+
+    def __init__(self, results):
+        """
+        Build the index.
+
+        Args:
+            results: ResultStore or MappedResults
+        """
+        self.results = results
+        self.names = []
+        self.dirs = []
+        self._blob = ''
+        # Offset of each name in the blob, plus the end
+        self._starts = array('Q', [0])
+        self.update()
+
+    def update(self):
+        """Index the rows added to the results since the last update."""
+        start = len(self.names)
+        names = [name.lower() for name in self.results.names(start)]
+        dirpaths = self.results.dirpaths()
+        self.names.extend(names)
+        self.dirs.extend(dirpath.lower() for dirpath in dirpaths[len(self.dirs):])
+        self.categories = self.results.category_names()
+
+        if names:
+            self._blob += '\n'.join(names) + '\n'
+            end = self._starts[-1]
+            self._starts.extend(end + offset for offset in accumulate(len(name) + 1 for name in names))
+        # Rows grouped by directory code, built by the next path search
+        self._by_dir = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, terms, previous=None):
+        """
+        Find the rows matching all terms.
+
+        Args:
+            terms: From parse_query
+            previous: Optional (terms, rows) of an earlier search; when
+                terms refine it, only its rows are tested
+
+        Returns: array('I') of matching rows, ascending
+        """
+        if previous is not None and refines(terms, previous[0]):
+            rows = previous[1]
+            pending = terms
+        else:
+            # Name terms first: they are the ones the blob can answer
+            pending = sorted(terms, key=lambda term: not (isinstance(term, TextTerm) and term.field == 'name'))
+            if not pending:
+                return array('I', range(len(self)))
+            rows = self._all_rows(pending[0])
+            pending = pending[1:]
+
+        return self.filter(pending, rows)
+
+    def filter(self, terms, rows):
+        """
+        Subset of rows matching all terms.
+
+        Args:
+            terms: From parse_query
+            rows: Ascending row numbers
+
+        Returns: array('I') of matching rows, ascending
+        """
+        for term in terms:
+            rows = array('I', self._keep(term, rows))
+        return rows if isinstance(rows, array) else array('I', rows)
+
+    def _all_rows(self, term):
+        """Rows matching term, testing every row."""
+        if isinstance(term, TextTerm):
+            if term.field == 'name':
+                return self._find_names(term.text)
+            return self._find_paths(term.text)
+
+        if isinstance(term, KindTerm):
+            selected = self._kind_codes(term.prefix)
+            return array('I', compress(range(len(self)), map(selected.__getitem__, self.results.category_codes)))
+
+        column = self.results.sizes if term.field == 'size' else self.results.mtimes
+        return array('I', compress(range(len(self)), map(self._comparison(term), column)))
+
+    def _keep(self, term, rows):
+        """Subset of rows matching term."""
+        if isinstance(term, TextTerm):
+            text = term.text
+            names = self.names
+            if term.field == 'name':
+                return [row for row in rows if text in names[row]]
+            return self._keep_paths(text, rows)
+
+        if isinstance(term, KindTerm):
+            selected = self._kind_codes(term.prefix)
+            codes = self.results.category_codes
+            return [row for row in rows if selected[codes[row]]]
+
+        column = self.results.sizes if term.field == 'size' else self.results.mtimes
+        matches = self._comparison(term)
+        return [row for row in rows if matches(column[row])]
+
+    def _find_names(self, text):
+        """
+        Rows whose name contains text, via the joined name blob.
+
+        Falls back to a pass over every name once hits get dense, where
+        the per-hit bisect would cost more than the pass.
+        """
+        if '\n' in text:
+            return array('I')
+
+        blob = self._blob
+        find = blob.find
+        starts = self._starts
+        limit = len(self) * DENSE_FRACTION
+
+        rows = array('I')
+        position = find(text)
+        while position != -1:
+            row = bisect_right(starts, position) - 1
+            rows.append(row)
+            if len(rows) > limit:
+                names = self.names
+                return array('I', [row for row, name in enumerate(names) if text in name])
+            # Continue after this name so each row is reported once
+            position = find(text, starts[row + 1])
+        return rows
+
+    def _path_parts(self, text):
+        """
+        Split a path search into per-directory tests.
+
+        A file's path is its directory, a separator and its name, and
+        names hold no separator. So text is in the path if it is in the
+        directory, or in the name, or - when text has a separator -
+        spans the last separator, which must then be the one before
+        the name.
+
+        Returns: (in_dir, at_boundary, tail) - bytes indexed by directory
+        code flagging directories containing text, and directories
+        ending in the part of text before its last separator; tail is
+        the part after it, or None if text has no separator
+        """
+        in_dir = bytes(text in dirpath for dirpath in self.dirs)
+        if os.sep not in text:
+            return in_dir, None, None
+        head, _, tail = text.rpartition(os.sep)
+        at_boundary = bytes(dirpath.endswith(head) for dirpath in self.dirs)
+        return in_dir, at_boundary, tail
+
+    def _find_paths(self, text):
+        """Rows whose full path contains text."""
+        return array('I', self._keep_paths(text, range(len(self))))
+
+    def _keep_paths(self, text, rows):
+        """
+        Subset of rows whose full path contains text.
+
+        When few rows are in matching directories they are read from
+        the rows grouped by directory and looked up in rows; otherwise
+        each row's directory is tested through a per-directory table.
+        """
+        in_dir, at_boundary, tail = self._path_parts(text)
+        codes = self.results.dir_codes
+        count = len(self)
+        names = self.names
+
+        if len(rows) * 8 < count:
+            # Few rows: testing each beats any whole-column pass
+            if tail is None:
+                return [row for row in rows if in_dir[codes[row]] or text in names[row]]
+            return [
+                row for row in rows
+                if in_dir[codes[row]] or (at_boundary[codes[row]] and names[row].startswith(tail))
+            ]
+
+        if tail is None:
+            extra = self._find_names(text)
+        else:
+            candidates = self._rows_in_dirs(at_boundary)
+            if candidates is None:
+                candidates = compress(range(count), map(at_boundary.__getitem__, codes))
+            extra = [row for row in candidates if names[row].startswith(tail)]
+
+        hits = self._rows_in_dirs(in_dir)
+        if hits is not None and (len(hits) + len(extra)) * 8 < len(rows):
+            kept = []
+            end = len(rows)
+            for row in sorted(set(hits).union(extra)):
+                position = bisect_left(rows, row)
+                if position < end and rows[position] == row:
+                    kept.append(row)
+            return kept
+
+        matched = bytearray(map(in_dir.__getitem__, codes))
+        deque(map(matched.__setitem__, extra, repeat(1)), maxlen=0)
+        if len(rows) == count:
+            # rows are ascending and distinct, so this is every row
+            return compress(range(count), matched)
+        return compress(rows, map(matched.__getitem__, rows))
+
+    def _rows_in_dirs(self, flags):
+        """
+        Rows in the directories flagged in flags, a bytes indexed by
+        directory code, in no particular order; None if they are more
+        than an eighth of all rows.
+        """
+        if self._by_dir is None:
+            codes = self.results.dir_codes
+            sizes = Counter(codes)
+            starts = array('Q', [0])
+            starts.extend(accumulate(sizes[code] for code in range(len(self.dirs))))
+            self._by_dir = array('I', sorted(range(len(self)), key=codes.__getitem__)), starts
+
+        grouped, starts = self._by_dir
+        limit = len(self) // 8
+        rows = []
+        for code in compress(range(len(flags)), flags):
+            rows.extend(grouped[starts[code]:starts[code + 1]])
+            if len(rows) > limit:
+                return None
+        return rows
+
+    def _kind_codes(self, prefix):
+        """bytes indexed by category code: 1 where the category matches prefix."""
+        return bytes(category.lower().startswith(prefix) for category in self.categories)
+
+    @staticmethod
+    def _comparison(term):
+        """Predicate for one column value of a CompareTerm."""
+        value = term.value
+        if term.op == '>':
+            return value.__lt__
+        if term.op == '>=':
+            return value.__le__
+        if term.op == '<':
+            return value.__gt__
+        if term.op == '<=':
+            return value.__ge__
+        return value.__eq__
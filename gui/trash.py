@@ -0,0 +1,270 @@
+"""Move files to the desktop trash, in bulk, reporting each file."""
+
+import os
+import sys
+import stat
+import subprocess
+from datetime import datetime
+from functools import lru_cache
+from typing import List
+from urllib.parse import quote
+from dataclasses import dataclass, field
+
+
+# Paths passed to one osascript run, keeping its argument list well
+# under the system limit
+FINDER_BATCH = 1000
+
+# Deletes the files named by its arguments in one Finder request, or one
+# at a time if that fails, so a bad file does not stop the others
+FINDER_SCRIPT = '''
+on run argv
+    set targets to {}
+    repeat with target in argv
+        try
+            set end of targets to (POSIX file (contents of target)) as alias
+        end try
+    end repeat
+    try
+        tell application "Finder" to delete targets
+    on error
+        repeat with target in targets
+            try
+                tell application "Finder" to delete target
+            end try
+        end repeat
+    end try
+end run
+'''
+
+
+@dataclass
+class TrashResult:
+    """Outcome of moving files to the trash."""
+    moved: List[bool] = field(default_factory=list)    # per file, in the order given
+    errors: List[str] = field(default_factory=list)    # one message per file not moved
+
+    @property
+    def moved_count(self):
+        """Number of files moved."""
+        return sum(self.moved)
+
+
+class FreedesktopTrash:
+    """
+    Trash as specified by freedesktop.org (Linux and other Unix desktops).
+
+    A file is renamed into the files/ directory of a trash on its own
+    filesystem, after a .trashinfo record with its original path is
+    created in info/. Nothing is copied, so each file costs a few
+    syscalls. Files on the home filesystem go to the home trash; others
+    go to $topdir/.Trash/$uid or $topdir/.Trash-$uid of their mount.
+    """
+
+    def __init__(self):
+        """Initialize the backend."""
+        data_home = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+        self.home_trash = os.path.join(data_home, 'Trash')
+        self._trashes = {}          # st_dev -> (trash dir, topdir or None), or an error message
+        self._next_suffix = {}      # (trash dir, name) -> next number to try
+
+    def trash(self, file_paths):
+        """
+        Move files to the trash.
+
+        Args:
+            file_paths: List of file paths
+
+        Returns: TrashResult
+        """
+        result = TrashResult()
+        deleted_at = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+
+        for file_path in file_paths:
+            path = os.path.abspath(file_path)
+            try:
+                self._trash_one(path, deleted_at)
+            except OSError as e:
+                result.moved.append(False)
+                result.errors.append(f"{path}: {e.strerror or e}")
+            else:
+                result.moved.append(True)
+        return result
+
+    def _trash_one(self, path, deleted_at):
+        """Move one file into the trash of its filesystem."""
+        device = os.lstat(path).st_dev
+        trash = self._trashes.get(device)
+        if trash is None:
+            try:
+                trash = self._trashes[device] = self._find_trash(path, device)
+            except OSError as e:
+                trash = self._trashes[device] = f"no usable trash directory ({e.strerror or e})"
+        if isinstance(trash, str):
+            raise OSError(0, trash)
+
+        trash_dir, topdir = trash
+        original = path if topdir is None else os.path.relpath(path, topdir)
+        info = (
+            f"[Trash Info]\nPath={quote(os.fsencode(original), safe='/')}\n"
+            f"DeletionDate={deleted_at}\n"
+        ).encode('utf-8')
+
+        name, info_path = self._reserve(trash_dir, os.path.basename(path), info)
+        try:
+            os.rename(path, os.path.join(trash_dir, 'files', name))
+        except OSError:
+            os.unlink(info_path)
+            raise
+
+    def _reserve(self, trash_dir, name, info):
+        """
+        Claim a name in a trash by creating its .trashinfo exclusively,
+        and write info to it.
+
+        Returns: (name, info file path)
+        """
+        stem, suffix = os.path.splitext(name)
+        key = (trash_dir, name)
+        number = self._next_suffix.get(key, 1)
+        while True:
+            candidate = name if number == 1 else f"{stem}.{number}{suffix}"
+            info_path = os.path.join(trash_dir, 'info', candidate + '.trashinfo')
+            number += 1
+            try:
+                fd = os.open(info_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                continue
+            try:
+                # A file left in files/ without its record must not be replaced
+                if os.path.lexists(os.path.join(trash_dir, 'files', candidate)):
+                    os.unlink(info_path)
+                    continue
+                os.write(fd, info)
+            except OSError:
+                os.unlink(info_path)
+                raise
+            finally:
+                os.close(fd)
+            self._next_suffix[key] = number
+            return candidate, info_path
+
+    def _find_trash(self, path, device):
+        """
+        Pick the trash for files on a device, creating it if needed.
+
+        Returns: (trash dir, topdir) - topdir is None for the home trash,
+        whose records hold absolute paths
+        """
+        os.makedirs(os.path.dirname(self.home_trash), exist_ok=True)
+        try:
+            home_device = os.stat(os.path.dirname(self.home_trash)).st_dev
+        except OSError:
+            home_device = None
+        if device == home_device:
+            self._prepare(self.home_trash)
+            return self.home_trash, None
+
+        topdir = _mount_point(path, device)
+        uid = os.getuid()
+
+        # An admin-created $topdir/.Trash must be a sticky, real directory
+        shared = os.path.join(topdir, '.Trash')
+        try:
+            shared_stat = os.lstat(shared)
+        except OSError:
+            shared_stat = None
+        if (shared_stat is not None and stat.S_ISDIR(shared_stat.st_mode)
+                and shared_stat.st_mode & stat.S_ISVTX):
+            trash_dir = os.path.join(shared, str(uid))
+            try:
+                self._prepare(trash_dir)
+                return trash_dir, topdir
+            except OSError:
+                pass
+
+        trash_dir = os.path.join(topdir, f'.Trash-{uid}')
+        self._prepare(trash_dir)
+        trash_stat = os.lstat(trash_dir)
+        if not stat.S_ISDIR(trash_stat.st_mode) or trash_stat.st_uid != uid:
+            raise OSError(0, f"{trash_dir} is not a directory owned by this user")
+        return trash_dir, topdir
+
+    @staticmethod
+    def _prepare(trash_dir):
+        """Create a trash directory and its files/ and info/ subdirectories."""
+        for subdir in ('files', 'info'):
+            os.makedirs(os.path.join(trash_dir, subdir), mode=0o700, exist_ok=True)
+
+
+def _mount_point(path, device):
+    """Topmost ancestor directory of path on the same device."""
+    current = os.path.dirname(path)
+    while True:
+        parent = os.path.dirname(current)
+        if parent == current or os.lstat(parent).st_dev != device:
+            return current
+        current = parent
+
+
+class FinderTrash:
+    """
+    Trash through Finder (macOS), so files can be put back from the Trash.
+
+    Files are passed to one osascript run per FINDER_BATCH paths instead
+    of one run each. A file counts as moved once it is gone from its
+    original path.
+    """
+
+    def trash(self, file_paths):
+        """
+        Move files to the trash.
+
+        Args:
+            file_paths: List of file paths
+
+        Returns: TrashResult
+        """
+        result = TrashResult()
+        paths = [os.path.abspath(file_path) for file_path in file_paths]
+
+        for start in range(0, len(paths), FINDER_BATCH):
+            batch = paths[start:start + FINDER_BATCH]
+            try:
+                completed = subprocess.run(
+                    ['osascript', '-', *batch],
+                    input=FINDER_SCRIPT,
+                    capture_output=True,
+                    text=True
+                )
+                error = completed.stderr.strip() or 'Finder did not move the file'
+            except OSError as e:
+                error = f"could not run osascript ({e})"
+
+            for path in batch:
+                moved = not os.path.lexists(path)
+                result.moved.append(moved)
+                if not moved:
+                    result.errors.append(f"{path}: {error}")
+        return result
+
+
+class UnavailableTrash:
+    """Stand-in where no trash is known; moves nothing."""
+
+    def trash(self, file_paths):
+        """Report every file as not moved."""
+        return TrashResult(
+            moved=[False] * len(file_paths),
+            errors=[f"{file_path}: no trash on this platform" for file_path in file_paths]
+        )
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """Trash backend for this platform, created once."""
+    if sys.platform == 'darwin':
+        return FinderTrash()
+    if os.name == 'posix':
+        return FreedesktopTrash()
+    return UnavailableTrash()
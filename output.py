@@ -1,21 +1,50 @@
 """Output formatting for scan results."""
 
+import os
+import sys
 import json
 import csv
+import time
 from datetime import datetime
+from operator import attrgetter
 from collections import defaultdict
 
 from utils import format_size
+from results import ResultStore
 
 
-def output_summary(results, config):
-    """Output summary to stdout."""
+# Maximum time buffered rows may wait before a streaming writer flushes
+FLUSH_INTERVAL = 0.1
+
+# Buffer size for output files
+WRITE_BUFFER = 1024 * 1024
+
+_encode = json.JSONEncoder().encode
+
+
+def output_summary(results, config, devices=None):
+    """
+    Output summary to stdout.
+
+    Args:
+        results: Scan results
+        config: Config
+        devices: Optional st_dev -> scanner.DeviceTotal of the scan; listed
+            when the scan covered more than one device
+    """
     if config.quiet:
         return
     
     total_size = sum(f.size for f in results)
+    total_allocated = sum(f.allocated for f in results)
+    
+    print(
+        f"Found {len(results)} files matching criteria "
+        f"({format_size(total_size)} total, {format_size(total_allocated)} on disk)"
+    )
     
-    print(f"Found {len(results)} files matching criteria ({format_size(total_size)} total)")
+    # Categories are ranked and totalled by the size the scan measured
+    size_of = attrgetter('allocated' if config.allocated else 'size')
     
     if results:
         print("\nBy category:")
@@ -28,73 +57,355 @@ def output_summary(results, config):
         # Sort by total size descending
         sorted_categories = sorted(
             by_category.items(),
-            key=lambda x: sum(f.size for f in x[1]),
+            key=lambda x: sum(size_of(f) for f in x[1]),
             reverse=True
         )
         
         for category, files in sorted_categories:
-            cat_size = sum(f.size for f in files)
+            cat_size = sum(size_of(f) for f in files)
             print(f"  {category}: {len(files)} files ({format_size(cat_size)})")
 
+    if devices and len(devices) > 1:
+        print("\nBy device:")
+        for total in sorted(devices.values(), key=attrgetter('path')):
+            rate = f", {total.directories / total.seconds:,.0f} directories/s" if total.seconds > 0 else ''
+            print(f"  {total.path} ({_device_name(total.device)}): {total.directories:,} directories, "
+                  f"{total.files:,} files ({format_size(total.size)}) in {total.seconds:.2f} s{rate}")
+
+
+def _device_name(device):
+    """major:minor of an st_dev."""
+    if device is None:
+        return 'unknown device'
+    return f"device {os.major(device)}:{os.minor(device)}"
+
+
+def _rows(results):
+    """
+    Yield (path, size, modified, category, allocated) per result, with
+    path and modified as strings.
+
+    A ResultStore is read column by column, so no Path or ResultRow is
+    built per file.
+    """
+    if isinstance(results, ResultStore):
+        join = os.path.join
+        fromtimestamp = datetime.fromtimestamp
+        for dirpath, name, size, mtime, category, allocated in results.matches():
+            yield join(dirpath, name), size, fromtimestamp(mtime).isoformat(), category, allocated
+    else:
+        for file_entry in results:
+            yield (
+                str(file_entry.path), file_entry.size, file_entry.modified.isoformat(),
+                file_entry.category, file_entry.allocated
+            )
+
+
+def _file_json(path, size, modified, category, allocated):
+    """
+    Encode one row from _rows as a compact JSON object.
+
+    Only path and category need escaping; the other fields are numbers
+    or ISO timestamps, so this is several times faster than json.dumps
+    on a dict.
+    """
+    return (
+        f'{{"path": {_encode(path)}, "size": {size}, "modified": "{modified}", '
+        f'"category": {_encode(category)}, "allocated": {allocated}}}'
+    )
+
 
 def output_json(results, config, filepath=None):
-    """Output results as JSON."""
-    data = {
-        "scan_date": datetime.now().isoformat(),
-        "criteria": {
-            "min_size": config.min_size,
-            "older_than_days": config.older_than,
-            "category": config.category_filter
-        },
-        "summary": {
-            "total_files": len(results),
-            "total_size": sum(f.size for f in results),
-            "tagged": len(results) if not config.no_tag else 0
-        },
-        "files": [
-            {
-                "path": str(f.path),
-                "size": f.size,
-                "modified": f.modified.isoformat(),
-                "category": f.category
-            }
-            for f in results
-        ]
-    }
-    
+    """
+    Output results as a JSON document.
+
+    results may be any iterable of FileEntry, including the generator
+    from scanner.iter_scan. The document is written as it goes: the
+    header first, then one file object per line, then the summary,
+    which is totalled along the way. Memory does not grow with the
+    number of files.
+    """
     if filepath:
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
-        if not config.quiet:
-            print(f"JSON output written to {filepath}")
+        f = open(filepath, 'w', buffering=WRITE_BUFFER)
+    elif config.quiet:
+        f = open(os.devnull, 'w')
     else:
-        print(json.dumps(data, indent=2))
+        f = sys.stdout
+
+    criteria = json.dumps({
+        "min_size": config.min_size,
+        "older_than_days": config.older_than,
+        "category": config.category_filter
+    })
+    f.write(f'{{\n  "scan_date": "{datetime.now().isoformat()}",\n  "criteria": {criteria},\n  "files": [')
+
+    total_files = 0
+    total_size = 0
+    total_allocated = 0
+    separator = '\n    '
+    for row in _flushing(f, _rows(results)):
+        f.write(separator)
+        f.write(_file_json(*row))
+        separator = ',\n    '
+        total_files += 1
+        total_size += row[1]
+        total_allocated += row[4]
+
+    summary = json.dumps({
+        "total_files": total_files,
+        "total_size": total_size,
+        "total_allocated": total_allocated
+    })
+    f.write(f'\n  ],\n  "summary": {summary}\n}}\n' if total_files else f'],\n  "summary": {summary}\n}}\n')
+
+    if f is sys.stdout:
+        f.flush()
+    else:
+        f.close()
+        if filepath and not config.quiet:
+            print(f"JSON output written to {filepath}")
+
+
+def _flushing(f, entries):
+    """
+    Yield entries, flushing f once a previous entry has been written and
+    FLUSH_INTERVAL has passed since the last flush.
+
+    The first row is flushed immediately so downstream tools see output
+    as soon as the scan finds something; after that writes stay buffered.
+    """
+    last_flush = float('-inf')
+    for entry in entries:
+        yield entry
+        now = time.monotonic()
+        if now - last_flush >= FLUSH_INTERVAL:
+            f.flush()
+            last_flush = now
 
 
 def output_csv(results, config, filepath=None):
-    """Output results as CSV."""
-    import sys
-    from io import StringIO
-    
-    output = StringIO() if not filepath else None
-    
+    """
+    Output results as CSV.
+
+    results may be any iterable of FileEntry, including the generator
+    from scanner.iter_scan; rows are written as they arrive.
+    """
     if filepath:
-        f = open(filepath, 'w', newline='')
+        f = open(filepath, 'w', newline='', buffering=WRITE_BUFFER)
+    elif config.quiet:
+        f = open(os.devnull, 'w', newline='')
     else:
-        f = sys.stdout if not config.quiet else StringIO()
-    
+        f = sys.stdout
+
     writer = csv.writer(f)
-    writer.writerow(['path', 'size', 'modified', 'category'])
-    
-    for file_entry in results:
-        writer.writerow([
-            str(file_entry.path),
-            file_entry.size,
-            file_entry.modified.isoformat(),
-            file_entry.category
-        ])
-    
+    writer.writerow(['path', 'size', 'modified', 'category', 'allocated'])
+
+    for row in _flushing(f, _rows(results)):
+        writer.writerow(row)
+
+    if f is sys.stdout:
+        f.flush()
+    else:
+        f.close()
+        if filepath and not config.quiet:
+            print(f"CSV output written to {filepath}")
+
+
+def output_ndjson(results, config, filepath=None):
+    """
+    Output results as newline-delimited JSON, one file per line.
+
+    results may be any iterable of FileEntry, including the generator
+    from scanner.iter_scan; records are written as they arrive.
+    """
+    if filepath:
+        f = open(filepath, 'w', buffering=WRITE_BUFFER)
+    elif config.quiet:
+        f = open(os.devnull, 'w')
+    else:
+        f = sys.stdout
+
+    for row in _flushing(f, _rows(results)):
+        f.write(_file_json(*row))
+        f.write('\n')
+
+    if f is sys.stdout:
+        f.flush()
+    else:
+        f.close()
+        if filepath and not config.quiet:
+            print(f"NDJSON output written to {filepath}")
+
+
+def output_changes(updated, removed, config, ndjson=False):
+    """
+    Output one batch of watch-mode changes to stdout.
+
+    Args:
+        updated: FileEntry objects that now match (new or changed)
+        removed: Paths that no longer match or no longer exist
+        config: Config
+        ndjson: Write NDJSON events instead of +/- lines
+    """
+    if config.quiet:
+        return
+
+    for file_entry in updated:
+        if ndjson:
+            print(json.dumps({
+                "event": "update",
+                "path": str(file_entry.path),
+                "size": file_entry.size,
+                "modified": file_entry.modified.isoformat(),
+                "category": file_entry.category,
+                "allocated": file_entry.allocated
+            }))
+        else:
+            print(f"+ {file_entry.path} ({format_size(file_entry.size)}, {file_entry.category})")
+
+    for path in removed:
+        if ndjson:
+            print(json.dumps({"event": "remove", "path": path}))
+        else:
+            print(f"- {path}")
+
+    sys.stdout.flush()
+
+
+def _directory_record(total):
+    """JSON-compatible dict for a DirTotal."""
+    return {
+        "path": str(total.path),
+        "size": total.size,
+        "files": total.files,
+        "depth": total.depth
+    }
+
+
+def output_directories(totals, config, fmt='summary', filepath=None):
+    """
+    Output --by-directory totals.
+
+    Args:
+        totals: List of DirTotal objects, heaviest first
+        config: Config
+        fmt: 'summary', 'json', 'csv' or 'ndjson'
+        filepath: Write to this file instead of stdout
+    """
+    if fmt == 'summary':
+        if config.quiet:
+            return
+        print(f"Largest {len(totals)} directories:")
+        for total in totals:
+            print(f"  {format_size(total.size):>10}  {total.files:>8} files  {total.path}")
+        return
+
+    if filepath:
+        f = open(filepath, 'w', newline='')
+    elif config.quiet:
+        f = open(os.devnull, 'w', newline='')
+    else:
+        f = sys.stdout
+
+    if fmt == 'json':
+        json.dump({
+            "scan_date": datetime.now().isoformat(),
+            "criteria": {
+                "min_size": config.min_size,
+                "older_than_days": config.older_than,
+                "category": config.category_filter
+            },
+            "directories": [_directory_record(total) for total in totals]
+        }, f, indent=2)
+        f.write('\n')
+    elif fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(['path', 'size', 'files', 'depth'])
+        for total in totals:
+            writer.writerow([str(total.path), total.size, total.files, total.depth])
+    else:
+        for total in totals:
+            f.write(json.dumps(_directory_record(total)))
+            f.write('\n')
+
+    if f is sys.stdout:
+        f.flush()
+    else:
+        f.close()
+        if filepath and not config.quiet:
+            print(f"{fmt.upper()} output written to {filepath}")
+
+
+def output_duplicates(groups, config, fmt='summary', filepath=None):
+    """
+    Output --duplicates groups.
+
+    Args:
+        groups: List of DuplicateGroup objects, most wasted first
+        config: Config
+        fmt: 'summary', 'json', 'csv' or 'ndjson'
+        filepath: Write to this file instead of stdout
+    """
+    # Wasted bytes are allocated bytes with --allocated, like every total
+    total_wasted = sum(group.wasted_bytes(config.allocated) for group in groups)
+
+    if fmt == 'summary':
+        if config.quiet:
+            return
+        print(f"Found {len(groups)} groups of duplicate files ({format_size(total_wasted)} reclaimable)")
+        for group in groups:
+            size = group.allocated if config.allocated else group.size
+            wasted = group.wasted_bytes(config.allocated)
+            print(f"\n  {len(group.paths)} x {format_size(size)} ({format_size(wasted)} wasted)")
+            for path in group.paths:
+                print(f"    {path}")
+            for path in group.links:
+                print(f"    {path} (hard link, frees nothing)")
+        return
+
     if filepath:
+        f = open(filepath, 'w', newline='')
+    elif config.quiet:
+        f = open(os.devnull, 'w', newline='')
+    else:
+        f = sys.stdout
+
+    def record(group):
+        return {
+            "size": group.size,
+            "hash": group.digest,
+            "allocated": group.allocated,
+            "wasted": group.wasted_bytes(config.allocated),
+            "paths": [str(path) for path in group.paths],
+            "links": [str(path) for path in group.links]
+        }
+
+    if fmt == 'json':
+        json.dump({
+            "scan_date": datetime.now().isoformat(),
+            "summary": {
+                "groups": len(groups),
+                "wasted": total_wasted
+            },
+            "groups": [record(group) for group in groups]
+        }, f, indent=2)
+        f.write('\n')
+    elif fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(['group', 'hash', 'size', 'path', 'hard_link'])
+        for number, group in enumerate(groups, 1):
+            for path in group.paths:
+                writer.writerow([number, group.digest, group.size, str(path), 0])
+            for path in group.links:
+                writer.writerow([number, group.digest, group.size, str(path), 1])
+    else:
+        for group in groups:
+            f.write(json.dumps(record(group)))
+            f.write('\n')
+
+    if f is sys.stdout:
+        f.flush()
+    else:
         f.close()
-        if not config.quiet:
-            print(f"CSV output written to {filepath}")
\ No newline at end of file
+        if filepath and not config.quiet:
+            print(f"{fmt.upper()} output written to {filepath}")
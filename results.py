@@ -0,0 +1,460 @@
+"""Compact columnar container for scan results."""
+
+import os
+import sys
+import mmap
+import struct
+from array import array
+from itertools import accumulate, islice
+from pathlib import Path
+from datetime import datetime
+
+
+# Binary results file (ResultStore.save / MappedResults): a header, then
+# one section per column. Columns are written in native byte order and
+# sizes, since the file only passes between processes on one machine.
+MAGIC = b'SWEEPRS1'
+RESULTS_SUFFIX = '.sweep'
+
+# (name, array typecode or None for raw bytes), in file order
+SECTIONS = (
+    ('sizes', 'q'),
+    ('mtimes', 'd'),
+    ('allocated', 'q'),
+    ('dir_codes', 'I'),
+    ('category_codes', 'B'),
+    ('name_ends', 'Q'),
+    ('names', None),
+    ('dir_ends', 'Q'),
+    ('dirs', None),
+    ('categories', None),
+)
+
+# Magic, row count, then (offset, length) per section
+HEADER = struct.Struct('=8sQ' + 'QQ' * len(SECTIONS))
+
+# Sections start on 8-byte boundaries
+ALIGNMENT = 8
+
+# Rows converted to columns at a time by ResultStore.extend
+EXTEND_CHUNK = 4096
+
+# How os.fsencode encodes file names
+FS_ENCODING = sys.getfilesystemencoding()
+FS_ERRORS = sys.getfilesystemencodeerrors()
+
+
+def _decode_names(blob, ends):
+    """
+    Decode every string of a blob of concatenated encoded names.
+
+    An ASCII blob is decoded in one call and sliced, since its byte
+    offsets are also character offsets; otherwise each name is decoded
+    separately.
+
+    Returns: List[str]
+    """
+    data = bytes(blob)
+    starts = [0]
+    starts += ends[:-1] if len(ends) else []
+    if data.isascii():
+        text = data.decode('ascii')
+        return [text[start:end] for start, end in zip(starts, ends)]
+    return [os.fsdecode(data[start:end]) for start, end in zip(starts, ends)]
+
+
+class ResultRow:
+    """
+    Lazy view of one row of a ResultStore or MappedResults.
+
+    Has the same attributes as scanner.FileEntry (path, size, modified,
+    category, allocated); path and modified are built on access, not
+    stored.
+    """
+
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def path(self):
+        return self._store.path(self._index)
+
+    @property
+    def name(self):
+        return self._store.name(self._index)
+
+    @property
+    def size(self):
+        return self._store.sizes[self._index]
+
+    @property
+    def mtime(self):
+        return self._store.mtimes[self._index]
+
+    @property
+    def modified(self):
+        return datetime.fromtimestamp(self._store.mtimes[self._index])
+
+    @property
+    def category(self):
+        return self._store.category(self._index)
+
+    @property
+    def allocated(self):
+        return self._store.allocated[self._index]
+
+    def __repr__(self):
+        return (
+            f"ResultRow(path={self.path!r}, size={self.size!r}, "
+            f"modified={self.modified!r}, category={self.category!r})"
+        )
+
+
+class ResultStore:
+    """
+    Scan results stored column by column.
+
+    Instead of a FileEntry, Path, datetime and category string per file,
+    each row costs an index into an interned parent-directory table, the
+    filename's bytes in a shared blob, 8-byte apparent and allocated sizes,
+    an 8-byte mtime and a 1-byte category code. Rows are read back through ResultRow views,
+    so code written against FileEntry (output.py, the GUI) works as is.
+    """
+
+    def __init__(self):
+        """Create an empty store."""
+        self._dirs = []
+        self._dir_codes = {}
+        self._last_dir = None
+        self._last_dir_code = 0
+
+        self._categories = []
+        self._category_codes = {}
+
+        self.dir_codes = array('I')
+        self._names = bytearray()
+        self._name_ends = array('Q')
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.category_codes = array('B')
+        self.allocated = array('q')
+
+    def append(self, dirpath, name, size, mtime, category, allocated):
+        """
+        Add one row.
+
+        Args:
+            dirpath: Parent directory path string
+            name: Filename
+            size: Size in bytes
+            mtime: Modification time in epoch seconds
+            category: Category name
+            allocated: Bytes allocated on disk
+        """
+        # Files arrive grouped by directory, so the last code usually hits
+        if dirpath != self._last_dir:
+            code = self._dir_codes.get(dirpath)
+            if code is None:
+                code = self._dir_codes[dirpath] = len(self._dirs)
+                self._dirs.append(dirpath)
+            self._last_dir = dirpath
+            self._last_dir_code = code
+        self.dir_codes.append(self._last_dir_code)
+
+        category_code = self._category_codes.get(category)
+        if category_code is None:
+            category_code = self._add_category(category)
+        self.category_codes.append(category_code)
+
+        self._names += os.fsencode(name)
+        self._name_ends.append(len(self._names))
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.allocated.append(allocated)
+
+    def _add_category(self, category):
+        """
+        Assign the next category code.
+
+        Returns: the code
+
+        Raises: ValueError past 256 categories, the most a one-byte code
+        can tell apart
+        """
+        code = len(self._categories)
+        if code > 0xFF:
+            raise ValueError(f"too many categories to store (at most 256), adding {category!r}")
+        self._category_codes[category] = code
+        self._categories.append(category)
+        return code
+
+    def extend(self, matches):
+        """
+        Append (dirpath, name, size, mtime, category, allocated) tuples.
+
+        matches are taken in chunks that are split into columns and
+        appended a column at a time, which is several times faster than
+        append() per row. Only one chunk of matches is held at a time,
+        so a scan generator can be passed.
+        """
+        matches = iter(matches)
+        while True:
+            chunk = list(islice(matches, EXTEND_CHUNK))
+            if not chunk:
+                return
+            self._extend_columns(*zip(*chunk))
+
+    def _extend_columns(self, dirpaths, names, sizes, mtimes, categories, allocated):
+        """Append rows given as one sequence per field."""
+        dir_codes = self._dir_codes
+        for dirpath in dict.fromkeys(dirpaths):
+            if dirpath not in dir_codes:
+                dir_codes[dirpath] = len(self._dirs)
+                self._dirs.append(dirpath)
+        self.dir_codes.fromlist(list(map(dir_codes.__getitem__, dirpaths)))
+        self._last_dir = dirpaths[-1]
+        self._last_dir_code = dir_codes[self._last_dir]
+
+        category_codes = self._category_codes
+        for category in dict.fromkeys(categories):
+            if category not in category_codes:
+                self._add_category(category)
+        self.category_codes.fromlist(list(map(category_codes.__getitem__, categories)))
+
+        # Encode the names in one call; each name's byte length is its
+        # character length unless the chunk has non-ASCII names
+        blob = ''.join(names).encode(FS_ENCODING, FS_ERRORS)
+        lengths = list(map(len, names))
+        if len(blob) != sum(lengths):
+            lengths = [len(name.encode(FS_ENCODING, FS_ERRORS)) for name in names]
+        ends = accumulate(lengths, initial=len(self._names))
+        next(ends)
+        self._names += blob
+        self._name_ends.extend(ends)
+
+        # fromlist converts about twice as fast as extend from a tuple
+        self.sizes.fromlist(list(sizes))
+        self.mtimes.fromlist(list(mtimes))
+        self.allocated.fromlist(list(allocated))
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __bool__(self):
+        return len(self.sizes) > 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('result index out of range')
+        return ResultRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield ResultRow(self, index)
+
+    def dirpath(self, index):
+        """Parent directory of row index."""
+        return self._dirs[self.dir_codes[index]]
+
+    def name(self, index):
+        """Filename of row index."""
+        start = self._name_ends[index - 1] if index else 0
+        return os.fsdecode(bytes(self._names[start:self._name_ends[index]]))
+
+    def path(self, index):
+        """Full Path of row index."""
+        return Path(self.dirpath(index), self.name(index))
+
+    def category(self, index):
+        """Category name of row index."""
+        return self._categories[self.category_codes[index]]
+
+    def names(self, start=0):
+        """Filenames of the rows from start on, in row order."""
+        if not start:
+            return _decode_names(self._names, self._name_ends)
+        offset = self._name_ends[start - 1]
+        return _decode_names(self._names[offset:], [end - offset for end in self._name_ends[start:]])
+
+    def category_names(self):
+        """Category names, indexed by category code."""
+        return list(self._categories)
+
+    def dirpaths(self):
+        """Parent directory paths, indexed by directory code."""
+        return list(self._dirs)
+
+    def match(self, index):
+        """Row index as a (dirpath, name, size, mtime, category, allocated) tuple."""
+        return (
+            self.dirpath(index), self.name(index),
+            self.sizes[index], self.mtimes[index], self.category(index), self.allocated[index]
+        )
+
+    def matches(self):
+        """Iterate all rows as match tuples (see match)."""
+        for index in range(len(self)):
+            yield self.match(index)
+
+    def total_size(self):
+        """Sum of all sizes."""
+        return sum(self.sizes)
+
+    def total_allocated(self):
+        """Sum of all allocated sizes."""
+        return sum(self.allocated)
+
+    def save(self, path):
+        """
+        Write the store to a binary results file that MappedResults can
+        map without parsing.
+
+        Args:
+            path: Destination file path
+        """
+        dir_ends = array('Q')
+        dir_blob = bytearray()
+        for dirpath in self._dirs:
+            dir_blob += os.fsencode(dirpath)
+            dir_ends.append(len(dir_blob))
+
+        columns = {
+            'sizes': self.sizes,
+            'mtimes': self.mtimes,
+            'allocated': self.allocated,
+            'dir_codes': self.dir_codes,
+            'category_codes': self.category_codes,
+            'name_ends': self._name_ends,
+            'names': self._names,
+            'dir_ends': dir_ends,
+            'dirs': dir_blob,
+            'categories': '\n'.join(self._categories).encode('utf-8'),
+        }
+
+        with open(path, 'wb') as f:
+            f.write(bytes(HEADER.size))
+            layout = []
+            for name, _typecode in SECTIONS:
+                padding = -f.tell() % ALIGNMENT
+                f.write(bytes(padding))
+                offset = f.tell()
+                f.write(columns[name])
+                layout += [offset, f.tell() - offset]
+
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, len(self), *layout))
+
+
+def is_results_file(path):
+    """Return True if path starts with the binary results file magic."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class MappedResults:
+    """
+    Read-only ResultStore view of a binary results file.
+
+    The file is memory-mapped and each column is a memoryview cast to
+    its type, so opening costs the same for ten rows or ten million;
+    paths and categories are decoded only for rows that are read.
+    """
+
+    def __init__(self, path):
+        """
+        Map a file written by ResultStore.save.
+
+        Args:
+            path: Results file path
+
+        Raises: ValueError if the file is not a results file
+        """
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{path} is not a sweep results file")
+        magic, self._rows, *layout = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a sweep results file")
+
+        view = memoryview(self._mmap)
+        columns = {}
+        for (name, typecode), offset, length in zip(SECTIONS, layout[::2], layout[1::2]):
+            section = view[offset:offset + length]
+            columns[name] = section.cast(typecode) if typecode else section
+
+        self.sizes = columns['sizes']
+        self.mtimes = columns['mtimes']
+        self.allocated = columns['allocated']
+        self.dir_codes = columns['dir_codes']
+        self.category_codes = columns['category_codes']
+        self._name_ends = columns['name_ends']
+        self._names = columns['names']
+        self._dir_ends = columns['dir_ends']
+        self._dir_blob = columns['dirs']
+        self._categories = bytes(columns['categories']).decode('utf-8').split('\n')
+
+    def __len__(self):
+        return self._rows
+
+    def __bool__(self):
+        return self._rows > 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('result index out of range')
+        return ResultRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield ResultRow(self, index)
+
+    def dirpath(self, index):
+        """Parent directory of row index."""
+        code = self.dir_codes[index]
+        start = self._dir_ends[code - 1] if code else 0
+        return os.fsdecode(bytes(self._dir_blob[start:self._dir_ends[code]]))
+
+    def name(self, index):
+        """Filename of row index."""
+        start = self._name_ends[index - 1] if index else 0
+        return os.fsdecode(bytes(self._names[start:self._name_ends[index]]))
+
+    def path(self, index):
+        """Full Path of row index."""
+        return Path(self.dirpath(index), self.name(index))
+
+    def category(self, index):
+        """Category name of row index."""
+        return self._categories[self.category_codes[index]]
+
+    def names(self, start=0):
+        """Filenames of the rows from start on, in row order."""
+        if not start:
+            return _decode_names(self._names, self._name_ends)
+        offset = self._name_ends[start - 1]
+        return _decode_names(self._names[offset:], [end - offset for end in self._name_ends[start:]])
+
+    def category_names(self):
+        """Category names, indexed by category code."""
+        return list(self._categories)
+
+    def dirpaths(self):
+        """Parent directory paths, indexed by directory code."""
+        return _decode_names(self._dir_blob, self._dir_ends)
+
+    def total_size(self):
+        """Sum of all sizes."""
+        return sum(self.sizes)
+
+    def total_allocated(self):
+        """Sum of all allocated sizes."""
+        return sum(self.allocated)
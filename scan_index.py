@@ -0,0 +1,210 @@
+"""Persistent index of directory listings for incremental rescans."""
+
+import os
+import time
+import threading
+from pathlib import Path
+
+
+DEFAULT_INDEX_PATH = Path.home() / '.cache' / 'sweep' / 'index.sqlite'
+
+# Directories modified this recently may still change within the same
+# mtime tick, so their listings are stored but never trusted
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+# SQLite integers are signed 64-bit, so inode numbers (unsigned) above
+# INODE_MAX are stored wrapped to negative values
+INODE_MAX = (1 << 63) - 1
+INODE_MASK = (1 << 64) - 1
+
+# Bumped whenever SCHEMA changes; older indexes are rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    id INTEGER PRIMARY KEY,
+    path BLOB NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subdirs (
+    dir_id INTEGER NOT NULL REFERENCES dirs(id) ON DELETE CASCADE,
+    name BLOB NOT NULL,
+    PRIMARY KEY (dir_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    dir_id INTEGER NOT NULL REFERENCES dirs(id) ON DELETE CASCADE,
+    name BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    allocated INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    nlink INTEGER NOT NULL,
+    PRIMARY KEY (dir_id, name)
+) WITHOUT ROWID;
+"""
+
+
+class ScanIndex:
+    """
+    SQLite store of per-directory listings keyed by directory mtime.
+
+    A directory's mtime changes whenever an entry is added, removed or
+    renamed in it, so an unchanged mtime means the stored listing of
+    subdirectories and files is still complete. Sizes and mtimes of
+    files rewritten in place are not caught this way; rebuild the index
+    when those matter.
+
+    Paths and names are stored as filesystem bytes so undecodable names
+    round-trip. Safe to share between scanner threads.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, rebuild=False):
+        """
+        Open (creating if needed) the index at path.
+
+        Args:
+            path: Location of the SQLite file
+            rebuild: Discard all stored listings first
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        # Imported here so sweep can read DEFAULT_INDEX_PATH without it
+        import sqlite3
+
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('PRAGMA foreign_keys=ON')
+
+        if rebuild or self._db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self._db.executescript(
+                'DROP TABLE IF EXISTS files;'
+                'DROP TABLE IF EXISTS subdirs;'
+                'DROP TABLE IF EXISTS dirs;'
+            )
+        self._db.executescript(SCHEMA)
+        self._db.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+
+    def lookup(self, root, mtime_ns, min_size=0, cutoff=None, allocated=False):
+        """
+        Return the stored listing of root if it is still current.
+
+        Size and age filters are applied in SQL so rows that cannot
+        match never reach Python.
+
+        Args:
+            root: Directory path
+            mtime_ns: Current st_mtime_ns of the directory
+            min_size: Only return files of at least this many bytes
+            cutoff: Only return files with mtime at or before this epoch time
+            allocated: Apply min_size to allocated instead of apparent size
+
+        Returns:
+            (subdir_names, files) where files is a list of
+            (name, size, mtime, allocated, inode, nlink) tuples, or None
+            on a miss
+        """
+        key = os.fsencode(os.path.abspath(root))
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT id, mtime_ns FROM dirs WHERE path = ?', (key,)
+            ).fetchone()
+
+            if row is None or row[1] != mtime_ns:
+                self.misses += 1
+                return None
+
+            dir_id = row[0]
+            subdirs = [
+                os.fsdecode(name) for (name,) in self._db.execute(
+                    'SELECT name FROM subdirs WHERE dir_id = ?', (dir_id,)
+                )
+            ]
+
+            query = (
+                'SELECT name, size, mtime, allocated, inode, nlink FROM files WHERE dir_id = ? AND '
+                + ('allocated' if allocated else 'size') + ' >= ?'
+            )
+            params = [dir_id, min_size]
+            if cutoff is not None:
+                query += ' AND mtime <= ?'
+                params.append(cutoff)
+            files = [
+                (os.fsdecode(name), size, mtime, on_disk, inode & INODE_MASK, nlink)
+                for name, size, mtime, on_disk, inode, nlink in self._db.execute(query, params)
+            ]
+
+            self.hits += 1
+            return subdirs, files
+
+    def store(self, root, mtime_ns, subdirs, files):
+        """
+        Record the full listing of root.
+
+        Args:
+            root: Directory path
+            mtime_ns: st_mtime_ns of the directory taken before listing it
+            subdirs: Names of all subdirectories, unfiltered
+            files: (name, size, mtime, allocated, inode, nlink) tuples for
+                all regular files, unfiltered
+        """
+        key = os.fsencode(os.path.abspath(root))
+        if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+            mtime_ns = -1
+
+        with self._lock:
+            row = self._db.execute('SELECT id FROM dirs WHERE path = ?', (key,)).fetchone()
+
+            if row is None:
+                dir_id = self._db.execute(
+                    'INSERT INTO dirs (path, mtime_ns) VALUES (?, ?)', (key, mtime_ns)
+                ).lastrowid
+            else:
+                dir_id = row[0]
+                self._forget_removed_subdirs(key, dir_id, subdirs)
+                self._db.execute('DELETE FROM subdirs WHERE dir_id = ?', (dir_id,))
+                self._db.execute('DELETE FROM files WHERE dir_id = ?', (dir_id,))
+                self._db.execute('UPDATE dirs SET mtime_ns = ? WHERE id = ?', (mtime_ns, dir_id))
+
+            self._db.executemany(
+                'INSERT INTO subdirs (dir_id, name) VALUES (?, ?)',
+                [(dir_id, os.fsencode(name)) for name in subdirs]
+            )
+            self._db.executemany(
+                'INSERT INTO files (dir_id, name, size, mtime, allocated, inode, nlink) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (
+                        dir_id, os.fsencode(name), size, mtime, on_disk,
+                        inode if inode <= INODE_MAX else inode - (1 << 64), nlink
+                    )
+                    for name, size, mtime, on_disk, inode, nlink in files
+                ]
+            )
+
+    def _forget_removed_subdirs(self, key, dir_id, subdirs):
+        """Drop stored trees under subdirectories that no longer exist."""
+        current = set(os.fsencode(name) for name in subdirs)
+        sep = os.fsencode(os.sep)
+
+        for (name,) in self._db.execute('SELECT name FROM subdirs WHERE dir_id = ?', (dir_id,)).fetchall():
+            if name in current:
+                continue
+            path = os.path.join(key, name)
+            # Everything strictly between "path/" and "path0" lies under path
+            self._db.execute(
+                'DELETE FROM dirs WHERE path = ? OR (path > ? AND path < ?)',
+                (path, path + sep, path + bytes([sep[0] + 1]))
+            )
+
+    def close(self):
+        """Commit pending listings and close the database."""
+        with self._lock:
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,178 @@
+"""Timings and counters of a sweep run, for --stats."""
+
+import sys
+import time
+import heapq
+import threading
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+# Directories listed in the report, slowest first
+SLOWEST_SHOWN = 10
+
+
+class ScanStats:
+    """
+    Per-phase wall times and scan counters.
+
+    The scanner only records into a ScanStats when one is passed in,
+    once per directory, so a run without --stats does no timing. Work
+    done per directory (listing, stat, classification) is summed over
+    all scan threads, so with --jobs it can exceed the wall time of the
+    scan.
+    """
+
+    def __init__(self):
+        """Initialize empty stats; the run is timed from here."""
+        self.started = time.perf_counter()
+        self.phases = {}            # phase name -> seconds, in the order run
+        self.directories = 0
+        self.entries = 0            # directory entries listed
+        self.stat_calls = 0
+        self.list_errors = 0        # directories that could not be listed
+        self.stat_errors = 0        # files that could not be stat'ed
+        self.list_time = 0.0        # listing directories (and index lookups)
+        self.file_time = 0.0        # stat, filtering and classifying files
+        self._slowest = []          # heap of (seconds, path, entries)
+        self._classify_clocks = []  # per-thread [calls, seconds]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the body of a with statement as a phase of the run."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def directory(self, path, list_seconds, file_seconds, entries, stat_calls, stat_errors):
+        """
+        Record one scanned directory; safe to call from scan threads.
+
+        Args:
+            path: Directory path
+            list_seconds: Time spent listing it
+            file_seconds: Time spent on its files after listing
+            entries: Number of entries listed
+            stat_calls: Number of stat calls made
+            stat_errors: Number of those that failed
+        """
+        item = (list_seconds + file_seconds, path, entries)
+        with self._lock:
+            self.directories += 1
+            self.entries += entries
+            self.stat_calls += stat_calls
+            self.stat_errors += stat_errors
+            self.list_time += list_seconds
+            self.file_time += file_seconds
+            if len(self._slowest) < SLOWEST_SHOWN:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def list_error(self, seconds):
+        """Record a directory that could not be listed."""
+        with self._lock:
+            self.directories += 1
+            self.list_errors += 1
+            self.list_time += seconds
+
+    def classify_clock(self):
+        """[calls, seconds] of classification on the calling thread."""
+        clock = getattr(self._local, 'clock', None)
+        if clock is None:
+            clock = self._local.clock = [0, 0.0]
+            with self._lock:
+                self._classify_clocks.append(clock)
+        return clock
+
+    def report(self, matches=None, file=sys.stderr):
+        """
+        Print the stats.
+
+        Args:
+            matches: Number of files reported, if known
+            file: Stream to print to
+        """
+        total = time.perf_counter() - self.started
+        scan_time = sum(seconds for name, seconds in self.phases.items() if name.startswith('scan'))
+        classify_calls = sum(clock[0] for clock in self._classify_clocks)
+        classify_time = sum(clock[1] for clock in self._classify_clocks)
+
+        def rate(count):
+            return f" ({count / scan_time:,.0f}/s)" if scan_time else ''
+
+        lines = ['Stats:']
+        for name, seconds in self.phases.items():
+            lines.append(f"  {name:<20} {seconds:9.3f} s")
+        lines.append(f"  {'total':<20} {total:9.3f} s")
+        lines.append(f"  {'directories':<20} {self.directories:9,}{rate(self.directories)}")
+        lines.append(f"  {'entries':<20} {self.entries:9,}{rate(self.entries)}")
+        if matches is not None:
+            lines.append(f"  {'files matched':<20} {matches:9,}")
+        lines.append(f"  {'stat calls':<20} {self.stat_calls:9,}")
+        lines.append(
+            f"  {'errors':<20} {self.list_errors + self.stat_errors:9,} "
+            f"({self.list_errors:,} listing, {self.stat_errors:,} stat)"
+        )
+        lines.append(f"  {'listing':<20} {self.list_time:9.3f} s")
+        lines.append(f"  {'stat and filter':<20} {self.file_time - classify_time:9.3f} s")
+        lines.append(f"  {'classify':<20} {classify_time:9.3f} s ({classify_calls:,} files)")
+        rss = peak_rss()
+        if rss is not None:
+            lines.append(f"  {'peak RSS':<20} {rss / (1 << 20):9.1f} MB")
+        if self._slowest:
+            lines.append('  slowest directories:')
+            for seconds, path, entries in sorted(self._slowest, reverse=True):
+                lines.append(f"    {seconds:8.3f} s  {path} ({entries:,} entries)")
+        print('\n'.join(lines), file=file)
+
+
+class TimedRules:
+    """
+    categories.CategoryRules that times classify() into a ScanStats.
+
+    Everything else is passed through to the wrapped rules.
+    """
+
+    def __init__(self, rules, stats):
+        """
+        Args:
+            rules: CategoryRules to wrap
+            stats: ScanStats to record into
+        """
+        self._rules = rules
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._rules, name)
+
+    def classify(self, name, context):
+        clock = self._stats.classify_clock()
+        start = time.perf_counter()
+        category = self._rules.classify(name, context)
+        clock[1] += time.perf_counter() - start
+        clock[0] += 1
+        return category
+
+
+def phase(stats, name):
+    """stats.phase(name), or a no-op context when stats is None."""
+    return nullcontext() if stats is None else stats.phase(name)
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None if unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
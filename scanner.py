@@ -1,11 +1,21 @@
 """Filesystem scanning and filtering."""
 
 import os
+import re
+import sys
+import time
+import heapq
+import queue
+import threading
 from pathlib import Path
 from datetime import datetime
 from dataclasses import dataclass
 
-from categories import detect_category
+from categories import load_rules
+from excludes import ExcludeMatcher, IGNORE_FILE
+from results import ResultStore
+from scan_stats import TimedRules
+from where import compile_where
 
 
 @dataclass
@@ -15,56 +25,942 @@ class FileEntry:
     size: int
     modified: datetime
     category: str
+    allocated: int
 
 
-def scan_filesystem(config):
-    """
-    Scan filesystem and return list of matching files.
-    
-    Returns: List[FileEntry]
-    """
-    results = []
-    exclude_dirs = set(str(p) for p in config.exclude)
-    
-    for root, dirs, files in os.walk(config.path, topdown=True):
-        # Remove excluded directories from traversal
-        dirs[:] = [d for d in dirs if os.path.join(root, d) not in exclude_dirs]
-        
-        # Skip hidden directories
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
-        
-        for filename in files:
-            filepath = Path(root) / filename
-            
-            try:
-                stat = filepath.stat()
-                
-                # Early filtering - size
-                if stat.st_size < config.min_size:
+@dataclass
+class DeviceTotal:
+    """
+    Directories and matching files a scan found on one device, and the
+    span of time it spent on them; size is allocated bytes when the scan
+    measures allocated size.
+    """
+    device: int
+    path: str                # first directory scanned on it: a root or mount point
+    directories: int = 0
+    files: int = 0
+    size: int = 0
+    started: float = 0.0     # time.perf_counter() at its first directory...
+    finished: float = 0.0    # ...and at the end of its last
+
+    @property
+    def seconds(self):
+        """Wall time from the first directory to the end of the last."""
+        return self.finished - self.started
+
+
+@dataclass
+class DirTotal:
+    """
+    Cumulative size and file count of a directory subtree; size is
+    allocated bytes when the scan measures allocated size.
+    """
+    path: Path
+    size: int
+    files: int
+    depth: int
+
+
+# Octal escapes of space, tab, newline and backslash in /proc/self/mountinfo
+_MOUNT_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+
+def _age_cutoff(older_than):
+    """
+    Convert an --older-than day count to an mtime cutoff.
+
+    Returns: float (epoch seconds) or None when no age filter is set
+    """
+    if not older_than:
+        return None
+    return time.time() - older_than * 86400
+
+
+def _allocated_size(stat):
+    """Bytes a file occupies on disk, from st_blocks where available."""
+    blocks = getattr(stat, 'st_blocks', None)
+    return stat.st_size if blocks is None else blocks * 512
+
+
+class _ScanFilters:
+    """Per-scan filter values, precomputed once from Config."""
+
+    def __init__(self, config, stats=None, devices=None):
+        self.roots = _scan_roots(config)
+        # --exclude patterns and .sweepignore files
+        self.excludes = ExcludeMatcher([str(p) for p in config.exclude], self.roots, config.ignore_files)
+        # Do not descend into directories on another device than their parent
+        self.one_file_system = config.one_file_system
+        # Directories that can be on another device than their parent, as
+        # paths below the roots; None when the mount table is unavailable
+        self.mount_points = _mount_points(self.roots)
+        self.min_size = config.min_size
+        self.cutoff = _age_cutoff(config.older_than)
+        self.category_filter = config.category_filter
+        self.rules = load_rules(config.category_rules)
+        # Compiled --where expression, or None; relative times count
+        # back from the start of the scan
+        self.where = compile_where(config.where) if config.where else None
+        # scan_stats.ScanStats to record into, or None
+        self.stats = stats
+        if stats is not None:
+            self.rules = TimedRules(self.rules, stats)
+        # Measure (filter, rank, total) files by allocated instead of apparent size
+        self.allocated = config.allocated
+        # Packed (st_dev, st_ino) -> links not yet seen, for multiply-linked
+        # files only; None when every link is counted
+        self.links_pending = None if config.count_links else {}
+        self.links_lock = threading.Lock()
+        # st_dev -> DeviceTotal to fill in as directories are scanned, or None
+        self.devices = devices
+        self.devices_lock = threading.Lock()
+        # Without a mount table, lstat every subdirectory when devices
+        # matter; otherwise subdirectories are taken to be on their
+        # parent's device
+        self.stat_subdirs = self.mount_points is None and (self.one_file_system or devices is not None)
+
+
+def _scan_roots(config):
+    """
+    Paths to scan: config.path and config.extra_paths, leaving out any
+    inside another (or repeated), so no file is scanned twice.
+
+    Returns: list of str
+    """
+    roots = []
+    for path in [config.path, *config.extra_paths]:
+        root = str(path)
+        absolute = os.path.join(os.path.abspath(root), '')
+        if any(absolute.startswith(os.path.join(os.path.abspath(other), '')) for other in roots):
+            continue
+        roots = [other for other in roots if not os.path.join(os.path.abspath(other), '').startswith(absolute)]
+        roots.append(root)
+    return roots
+
+
+def _mount_table():
+    """
+    Mount points of the system, from /proc/self/mountinfo on Linux or
+    the output of mount(8) on macOS and the BSDs.
+
+    Returns: set of absolute paths, or None where the mount table is
+    unavailable
+    """
+    try:
+        with open('/proc/self/mountinfo', encoding='utf-8', errors='surrogateescape') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        pass
+    else:
+        # Field 5 is the mount point
+        return set(
+            _MOUNT_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), line.split(' ')[4])
+            for line in lines if line.count(' ') >= 4
+        )
+
+    if sys.platform != 'darwin' and 'bsd' not in sys.platform:
+        return None
+    import subprocess
+
+    try:
+        output = subprocess.run(
+            ['/sbin/mount'], capture_output=True, text=True, errors='surrogateescape', timeout=10
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    # "<device> on <mount point> (<type>, <options>)"
+    return set(
+        line.partition(' on ')[2].rpartition(' (')[0]
+        for line in output.splitlines() if ' on ' in line
+    ) or None
+
+
+def _mount_points(roots):
+    """
+    Mount points below the scan roots, spelled as paths under the roots
+    as given, so they compare equal to DirEntry.path whether or not a
+    root is relative or reached through a symlink.
+
+    Returns: set of paths, or None where the mount table is unavailable
+    """
+    table = _mount_table()
+    if table is None:
+        return None
+    points = set()
+    for root in roots:
+        prefix = os.path.join(os.path.realpath(root), '')
+        for point in table:
+            if point.startswith(prefix):
+                points.add(os.path.join(root, point[len(prefix):]))
+    return points
+
+
+def _subdir_device(path, device, filters):
+    """
+    st_dev of subdirectory path of a directory on device, lstat'ing it
+    only if it can be on another device.
+
+    Returns: (st_dev, stat calls made)
+
+    Raises: OSError if the lstat fails
+    """
+    if filters.stat_subdirs or (filters.mount_points is not None and path in filters.mount_points):
+        return os.lstat(path).st_dev, 1
+    return device, 0
+
+
+def _record_device(filters, device, path, started, matches):
+    """Add one scanned directory to the DeviceTotal of its device."""
+    size = 0
+    size_field = 5 if filters.allocated else 2
+    for match in matches:
+        size += match[size_field]
+    finished = time.perf_counter()
+    with filters.devices_lock:
+        total = filters.devices.get(device)
+        if total is None:
+            total = filters.devices[device] = DeviceTotal(device, path, started=started)
+        total.directories += 1
+        total.files += len(matches)
+        total.size += size
+        if started < total.started:
+            total.started = started
+        if finished > total.finished:
+            total.finished = finished
+
+
+def _keep_dir(name, path, state, filters):
+    """
+    Return True unless the directory is hidden or excluded, given the
+    exclude state of its parent; a kept directory's own state is
+    recorded for when it is listed.
+    """
+    return not name.startswith('.') and filters.excludes.enter_dir(state, name, path)
+
+
+def _first_link(filters, dev, ino, nlink):
+    """
+    Return True the first time a file with several hard links is seen.
+
+    Only files with st_nlink > 1 are tracked, and an inode is forgotten
+    once all its links have been seen, so memory stays proportional to
+    the hard-linked files whose other links are still to come.
+    """
+    key = (dev << 64) | ino
+    pending = filters.links_pending
+    with filters.links_lock:
+        remaining = pending.get(key)
+        if remaining is None:
+            pending[key] = nlink - 1
+            return True
+        if remaining <= 1:
+            del pending[key]
+        else:
+            pending[key] = remaining - 1
+        return False
+
+
+def _match_file(root, name, size, mtime, allocated, context, filters, category=None):
+    """
+    Apply the Config filters to one file in directory root, whose
+    categories.DirContext is context. Pass category if the file was
+    already classified and checked against the category filter.
+
+    Returns: (dirpath, name, size, mtime, category, allocated) match
+    tuple, or None if the file is filtered out
+    """
+    # Early filtering - size
+    if (allocated if filters.allocated else size) < filters.min_size:
+        return None
+
+    # Early filtering - age
+    if filters.cutoff is not None and mtime > filters.cutoff:
+        return None
+
+    if category is None:
+        # Category detection
+        category = filters.rules.classify(name, context)
+
+        # Category filter
+        if filters.category_filter and category != filters.category_filter:
+            return None
+
+    where = filters.where
+    if where is not None and not where.match(root, name, size, mtime, allocated, category):
+        return None
+
+    return (root, name, size, mtime, category, allocated)
+
+
+def _to_entry(match):
+    """Build a FileEntry from a match tuple."""
+    root, name, size, mtime, category, allocated = match
+    return FileEntry(
+        path=Path(root, name),
+        size=size,
+        modified=datetime.fromtimestamp(mtime),
+        category=category,
+        allocated=allocated
+    )
+
+
+def _scan_directory(root, context, filters, index=None, device=None):
+    """
+    List a single directory and filter its files. device is root's
+    st_dev, if known.
+
+    Returns: (subdirs, matches) - (path, DirContext, st_dev) triples for
+    the subdirectories to descend into, in listing order, and match
+    tuples for files passing the filters
+    """
+    subdirs = []
+    matches = []
+    excludes = filters.excludes
+    state = excludes.pop_state(root)
+
+    # Category pushdown: skip subtrees whose directory rules already rule
+    # out the requested category (e.g. node_modules for --category video)
+    category_filter = filters.category_filter
+    if category_filter and not filters.rules.subtree_may_contain(context, category_filter):
+        return subdirs, matches
+
+    if index is not None:
+        return _scan_indexed_directory(root, context, filters, index, state, device)
+
+    stats = filters.stats
+    if stats is not None:
+        started = time.perf_counter()
+
+    try:
+        with os.scandir(root) as it:
+            entries = list(it)
+    except OSError:
+        # Skip directories we can't list
+        if stats is not None:
+            stats.list_error(time.perf_counter() - started)
+        return subdirs, matches
+
+    if stats is not None:
+        listed = time.perf_counter()
+    stat_calls = 0
+    stat_errors = 0
+
+    if excludes.ignore_files and any(entry.name == IGNORE_FILE for entry in entries):
+        state = excludes.read_ignore_file(state, root)
+    if excludes.listed is not None:
+        excludes.listed[root] = state
+    check_excludes = bool(state) and excludes.files
+    one_file_system = filters.one_file_system and device is not None
+
+    # ...and skip every file of a directory where no name could match
+    # (e.g. outside any cache directory for --category cache)
+    check_files = not category_filter or filters.rules.files_may_match(context, category_filter)
+
+    # --where clauses on the name and category alone, tested before stat
+    check_names = filters.where.names if filters.where is not None else None
+
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if not _keep_dir(entry.name, entry.path, state, filters):
                     continue
-                
-                # Early filtering - age
-                if config.older_than:
-                    age_days = (datetime.now() - datetime.fromtimestamp(stat.st_mtime)).days
-                    if age_days < config.older_than:
-                        continue
-                
-                # Category detection
-                category = detect_category(filepath)
-                
-                # Category filter
-                if config.category_filter and category != config.category_filter:
+                try:
+                    subdir_device, calls = _subdir_device(entry.path, device, filters)
+                except OSError:
+                    stat_calls += 1
+                    stat_errors += 1
+                    excludes.discard(entry.path)
+                    continue
+                stat_calls += calls
+                if one_file_system and subdir_device != device:
+                    excludes.discard(entry.path)
                     continue
-                
-                results.append(FileEntry(
-                    path=filepath,
-                    size=stat.st_size,
-                    modified=datetime.fromtimestamp(stat.st_mtime),
-                    category=category
-                ))
-                
-            except (PermissionError, OSError):
-                # Skip files we can't access
+                subdirs.append((entry.path, filters.rules.child_context(context, entry.name), subdir_device))
+                continue
+
+            if not check_files or not entry.is_file(follow_symlinks=False):
+                continue
+        except OSError:
+            continue
+
+        if check_excludes and excludes.file_excluded(state, entry.name):
+            continue
+
+        # With a category filter, classify by name first so files that
+        # cannot match are never stat'ed
+        category = None
+        if category_filter:
+            category = filters.rules.classify(entry.name, context)
+            if category != category_filter:
+                continue
+
+        if check_names is not None:
+            if category is None and filters.where.names_use_category:
+                category = filters.rules.classify(entry.name, context)
+            if not check_names(root, entry.name, category):
                 continue
-    
-    return results
\ No newline at end of file
+
+        stat_calls += 1
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except OSError:
+            # Skip files we can't access
+            stat_errors += 1
+            continue
+
+        match = _match_file(
+            root, entry.name, stat.st_size, stat.st_mtime, _allocated_size(stat), context, filters, category
+        )
+        if match is None:
+            continue
+
+        # Count a hard-linked file at its first matching link only
+        if (stat.st_nlink > 1 and filters.links_pending is not None
+                and not _first_link(filters, stat.st_dev, stat.st_ino, stat.st_nlink)):
+            continue
+
+        matches.append(match)
+
+    if stats is not None:
+        stats.directory(
+            root, listed - started, time.perf_counter() - listed, len(entries), stat_calls, stat_errors
+        )
+    return subdirs, matches
+
+
+def _scan_indexed_directory(root, context, filters, index, state, device):
+    """
+    Like _scan_directory, but answer from the index while root's mtime
+    is unchanged and record a fresh full listing when it is not. state
+    is root's exclude state.
+
+    Subdirectories from the index are checked for another device the
+    same way as by _scan_directory, so both give the same results.
+    """
+    stats = filters.stats
+    if stats is not None:
+        started = time.perf_counter()
+    stat_calls = 1
+    stat_errors = 0
+
+    try:
+        root_stat = os.stat(root)
+    except OSError:
+        if stats is not None:
+            stats.list_error(time.perf_counter() - started)
+        return [], []
+    mtime_ns = root_stat.st_mtime_ns
+
+    listing = index.lookup(root, mtime_ns, filters.min_size, filters.cutoff, filters.allocated)
+
+    if listing is None:
+        dirnames = []
+        files = []
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirnames.append(entry.name)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat_calls += 1
+                            stat = entry.stat(follow_symlinks=False)
+                            files.append((
+                                entry.name, stat.st_size, stat.st_mtime, _allocated_size(stat),
+                                stat.st_ino, stat.st_nlink
+                            ))
+                    except OSError:
+                        stat_errors += 1
+                        continue
+        except OSError:
+            if stats is not None:
+                stats.list_error(time.perf_counter() - started)
+            return [], []
+
+        # Store everything so later queries with other filters can reuse it
+        index.store(root, mtime_ns, dirnames, files)
+        listing = dirnames, files
+
+    if stats is not None:
+        listed = time.perf_counter()
+    dirnames, files = listing
+    excludes = filters.excludes
+    if excludes.ignore_files and any(file[0] == IGNORE_FILE for file in files):
+        state = excludes.read_ignore_file(state, root)
+    if excludes.listed is not None:
+        excludes.listed[root] = state
+    check_excludes = bool(state) and excludes.files
+
+    one_file_system = filters.one_file_system and device is not None
+    subdirs = []
+    for name in dirnames:
+        path = os.path.join(root, name)
+        if not _keep_dir(name, path, state, filters):
+            continue
+        try:
+            subdir_device, calls = _subdir_device(path, root_stat.st_dev, filters)
+        except OSError:
+            stat_calls += 1
+            stat_errors += 1
+            excludes.discard(path)
+            continue
+        stat_calls += calls
+        if one_file_system and subdir_device != device:
+            excludes.discard(path)
+            continue
+        subdirs.append((path, filters.rules.child_context(context, name), subdir_device))
+
+    matches = []
+    for name, size, mtime, allocated, ino, nlink in files:
+        if check_excludes and excludes.file_excluded(state, name):
+            continue
+        match = _match_file(root, name, size, mtime, allocated, context, filters)
+        if match is None:
+            continue
+        # Files live on their directory's device
+        if (nlink > 1 and filters.links_pending is not None
+                and not _first_link(filters, root_stat.st_dev, ino, nlink)):
+            continue
+        matches.append(match)
+
+    if stats is not None:
+        stats.directory(
+            root, listed - started, time.perf_counter() - listed, len(dirnames) + len(files),
+            stat_calls, stat_errors
+        )
+    return subdirs, matches
+
+
+# Scanned directories handed back per scan thread before workers wait
+RESULTS_PER_THREAD = 4
+
+
+def _root_device(root):
+    """st_dev of a scan root, or None if it cannot be stat'ed."""
+    try:
+        return os.stat(root).st_dev
+    except OSError:
+        return None
+
+
+def _scan_timed(path, context, device, filters, index):
+    """_scan_directory, adding the directory to its DeviceTotal if filters.devices is set."""
+    if filters.devices is None:
+        return _scan_directory(path, context, filters, index, device)
+    started = time.perf_counter()
+    subdirs, matches = _scan_directory(path, context, filters, index, device)
+    _record_device(filters, device, path, started, matches)
+    return subdirs, matches
+
+
+class _DevicePools:
+    """
+    A pool of worker threads per device, sharing one result queue.
+
+    Each directory is queued to the pool of the device it is on, and a
+    pool is started the first time a device is seen, so a slow disk or
+    network mount only holds up its own threads. os.scandir and stat
+    release the GIL, so workers overlap syscall latency. Per-directory
+    records are handed back through a bounded queue, so a slow consumer
+    throttles the workers instead of letting results pile up. A
+    directory always comes before its subdirectories.
+    """
+
+    _idle = object()
+
+    def __init__(self, filters, jobs, index=None):
+        """
+        Args:
+            filters: _ScanFilters of the scan
+            jobs: Threads per device
+            index: Optional scan_index.ScanIndex
+        """
+        self.filters = filters
+        self.jobs = jobs
+        self.index = index
+        self.found = queue.Queue(maxsize=jobs * RESULTS_PER_THREAD)
+        self.stop = threading.Event()
+        self._work = {}          # st_dev -> queue of (path, DirContext)
+        self._outstanding = 0    # directories queued and not yet done
+        self._lock = threading.Lock()
+
+    def submit(self, path, context, device):
+        """Queue a directory to the pool of its device."""
+        with self._lock:
+            self._outstanding += 1
+            work = self._work.get(device)
+            if work is None:
+                work = self._work[device] = queue.Queue()
+                for _ in range(self.jobs):
+                    threading.Thread(target=self._worker, args=(work, device), daemon=True).start()
+        work.put((path, context))
+
+    def _worker(self, work, device):
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            try:
+                if self.stop.is_set():
+                    continue
+                path, context = item
+                subdirs, matches = _scan_timed(path, context, device, self.filters, self.index)
+                # Hand back this directory before any child can be scanned
+                self.found.put((path, subdirs, matches))
+                # Queue children before counting this directory done, so
+                # the count cannot reach zero while the tree is unfinished
+                for subdir in subdirs:
+                    self.submit(*subdir)
+            finally:
+                with self._lock:
+                    self._outstanding -= 1
+                    idle = not self._outstanding
+                if idle:
+                    # Wake a consumer waiting in drain()
+                    self.found.put(self._idle)
+
+    def ready(self):
+        """
+        Yield the records already found, without waiting.
+
+        Yields: (dirpath, subdirs, matches) per directory
+        """
+        if not self._work:
+            # No pool started, so nothing can have been found
+            return
+        while True:
+            try:
+                record = self.found.get_nowait()
+            except queue.Empty:
+                return
+            if record is not self._idle:
+                yield record
+
+    def drain(self):
+        """
+        Yield records until every queued directory is done.
+
+        Yields: (dirpath, subdirs, matches) per directory
+        """
+        while True:
+            with self._lock:
+                idle = not self._outstanding
+            if idle:
+                # Every record was put before the count reached zero
+                yield from self.ready()
+                return
+            record = self.found.get()
+            if record is not self._idle:
+                yield record
+
+    def close(self):
+        """Skip the directories still queued and stop the threads."""
+        self.stop.set()
+        for _record in self.drain():
+            pass
+        with self._lock:
+            queues = list(self._work.values())
+        for work in queues:
+            for _ in range(self.jobs):
+                work.put(None)
+
+
+def _walk_serial(roots, filters, index=None):
+    """
+    Depth-first scan on the calling thread, in os.walk order.
+
+    Directories on the device of the first root are scanned here; any
+    other root or mount point found along the way is handed to a
+    one-thread pool for its device, whose records are passed on between
+    directories of this walk and after it.
+
+    Yields: (dirpath, subdirs, matches) per directory, as returned by
+    _scan_directory; a directory always comes before its subdirectories
+    """
+    pools = _DevicePools(filters, 1, index)
+    devices = [_root_device(root) for root in roots]
+    main = devices[0]
+    stack = []
+    for root, device in reversed(list(zip(roots, devices))):
+        if device == main:
+            stack.append((root, filters.rules.context_for(root), device))
+        else:
+            pools.submit(root, filters.rules.context_for(root), device)
+
+    try:
+        while stack:
+            dirpath, context, device = stack.pop()
+            subdirs, matches = _scan_timed(dirpath, context, device, filters, index)
+            yield dirpath, subdirs, matches
+            yield from pools.ready()
+            # Visit subdirectories in listing order, like os.walk
+            for subdir in reversed(subdirs):
+                if subdir[2] == main:
+                    stack.append(subdir)
+                else:
+                    pools.submit(*subdir)
+        yield from pools.drain()
+    finally:
+        pools.close()
+
+
+def _walk_parallel(roots, filters, jobs, index=None):
+    """
+    Scan with jobs worker threads per device (see _DevicePools).
+
+    Order depends on thread scheduling, except that a directory always
+    comes before its subdirectories.
+
+    Yields: (dirpath, subdirs, matches) per directory
+    """
+    pools = _DevicePools(filters, jobs, index)
+    try:
+        for root in roots:
+            pools.submit(root, filters.rules.context_for(root), _root_device(root))
+        yield from pools.drain()
+    finally:
+        # Consumer stopped early: skip remaining directories and drain
+        # the queue so no worker stays blocked on a full result queue
+        pools.close()
+
+
+def _walk(config, filters, index=None):
+    """Run the serial or parallel scan, yielding per-directory records."""
+    if config.jobs > 1:
+        return _walk_parallel(filters.roots, filters, config.jobs, index)
+    return _walk_serial(filters.roots, filters, index)
+
+
+def iter_scan(config, index=None, stats=None, devices=None):
+    """
+    Scan filesystem, yielding matching files as they are found.
+
+    Directories are listed with os.scandir and the cached DirEntry type
+    and stat data is used directly, so each file costs at most one lstat
+    and Path objects are only built for files that pass the filters.
+    Symlinks are not followed and are not reported. A file with several
+    hard links is reported at the first matching link only, unless
+    config.count_links is set.
+
+    config.path and every path in config.extra_paths are scanned. Each
+    device (disk, network or FUSE mount) found gets its own thread pool
+    of config.jobs threads, so one slow device does not hold up the
+    others; with config.jobs == 1, directories on the device of
+    config.path are still scanned in order on the calling thread. The
+    same files are produced, but in no particular order once more than
+    one thread is involved. With config.one_file_system, directories on
+    another device than their parent are skipped.
+
+    With a scan_index.ScanIndex, directories whose mtime is unchanged
+    since the last indexed scan are answered from the index without
+    being listed or having their files stat'ed.
+
+    With a scan_stats.ScanStats, per-directory timings and counters are
+    recorded into it. A devices dict is filled with st_dev -> DeviceTotal
+    as directories are scanned.
+
+    Yields: FileEntry
+    """
+    return map(_to_entry, _iter_matches(config, _ScanFilters(config, stats, devices), index))
+
+
+def _iter_matches(config, filters, index=None, on_directory=None):
+    """Run the scan, yielding match tuples."""
+    for _dirpath, _subdirs, matches in _walk(config, filters, index):
+        if on_directory is not None:
+            on_directory(matches)
+        yield from matches
+
+
+class _PathOrder:
+    """
+    Tiebreak of a select_top key: orders matches by reverse path, so the
+    min-heap drops the greatest path among equal sizes or times and the
+    smallest paths are kept.
+    """
+
+    __slots__ = ('match',)
+
+    def __init__(self, match):
+        self.match = match
+
+    def __lt__(self, other):
+        return (self.match[0], self.match[1]) > (other.match[0], other.match[1])
+
+    def __gt__(self, other):
+        return (self.match[0], self.match[1]) < (other.match[0], other.match[1])
+
+
+def select_top(matches, limit, sort_by='size', filters=None, allocated=False):
+    """
+    Select the top matches with a bounded heap instead of a full sort.
+
+    Only limit matches are held at a time. When filters is the
+    _ScanFilters of the scan producing matches, its size or age threshold
+    is tightened as the heap fills, so files that can no longer make the
+    cut are rejected before they become match tuples.
+
+    Ties are broken by path (directory, then name), so the same files
+    are selected and ordered whatever order matches arrive in, as with
+    --jobs.
+
+    Args:
+        matches: Iterable of match tuples
+        limit: Number of matches to keep
+        sort_by: 'size' for largest first, 'modified' for oldest first
+        filters: Optional _ScanFilters to tighten while scanning
+        allocated: Rank sizes by allocated instead of apparent bytes
+
+    Returns: ResultStore, best first
+    """
+    oldest = sort_by == 'modified'
+    size_field = 5 if allocated else 2
+    heap = []
+
+    for match in matches:
+        value = -match[3] if oldest else match[size_field]
+        # Most matches fall short on the value alone, without a tiebreak
+        if len(heap) == limit and value < heap[0][0][0]:
+            continue
+        key = (value, _PathOrder(match))
+
+        if len(heap) < limit:
+            heapq.heappush(heap, (key, match))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, match))
+        else:
+            continue
+
+        if filters is not None and len(heap) == limit:
+            # Nothing past the weakest kept match can get in; a tie
+            # still can, with a smaller path
+            weakest = heap[0][0][0]
+            if oldest:
+                if filters.cutoff is None or -weakest < filters.cutoff:
+                    filters.cutoff = -weakest
+            elif weakest > filters.min_size:
+                filters.min_size = weakest
+
+    store = ResultStore()
+    store.extend(match for _key, match in sorted(heap, key=lambda item: item[0], reverse=True))
+    return store
+
+
+def scan_filesystem(config, index=None, on_directory=None, stats=None, devices=None):
+    """
+    Scan filesystem and return matching files.
+
+    Results are kept in a columnar ResultStore rather than a list of
+    FileEntry objects; iterating it yields rows with the same attributes.
+    With config.limit set, only the top config.limit files by
+    config.sort_by are kept (see select_top), in ranked order.
+
+    Args:
+        config: Config
+        index: Optional scan_index.ScanIndex
+        on_directory: Optional callable taking the list of match tuples
+            of each directory as it is scanned (live.LiveWriter.add)
+        stats: Optional scan_stats.ScanStats to record into
+        devices: Optional dict to fill with st_dev -> DeviceTotal
+
+    Returns: ResultStore
+    """
+    filters = _ScanFilters(config, stats, devices)
+    matches = _iter_matches(config, filters, index, on_directory)
+
+    if config.limit:
+        return select_top(matches, config.limit, config.sort_by, filters, config.allocated)
+
+    store = ResultStore()
+    store.extend(matches)
+    return store
+
+
+class _DirNode:
+    """Running totals of a directory whose subtree is still being scanned."""
+
+    __slots__ = ('path', 'parent', 'depth', 'size', 'files', 'pending')
+
+    def __init__(self, path, parent, depth):
+        self.path = path
+        self.parent = parent
+        self.depth = depth
+        self.size = 0
+        self.files = 0
+        self.pending = 0
+
+
+def scan_directory_sizes(config, top=50, max_depth=None, index=None, stats=None, devices=None):
+    """
+    Total size and file count of every directory subtree, in one scan.
+
+    Each directory's own matching files are summed as it is listed; when
+    its last subdirectory finishes, its totals are added to its parent
+    and it is offered to a top-N heap. Finished directories are then
+    dropped, so memory holds only unfinished directories plus top
+    entries, even on trees with millions of directories. The Config
+    filters decide which files count, and pruning works as for
+    scan_filesystem.
+
+    Args:
+        config: Config
+        top: Number of heaviest directories to return
+        max_depth: Only report directories at most this deep (roots are 0)
+        index: Optional scan_index.ScanIndex
+        stats: Optional scan_stats.ScanStats to record into
+        devices: Optional dict to fill with st_dev -> DeviceTotal
+
+    Returns: List[DirTotal], heaviest first
+    """
+    filters = _ScanFilters(config, stats, devices)
+    size_field = 5 if config.allocated else 2
+    heap = []
+    seq = 0
+    open_dirs = {}
+
+    def finish(node):
+        nonlocal seq
+        while node is not None:
+            del open_dirs[node.path]
+
+            if max_depth is None or node.depth <= max_depth:
+                item = (node.size, -seq, node)
+                seq += 1
+                if len(heap) < top:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+            parent = node.parent
+            if parent is None:
+                return
+            parent.size += node.size
+            parent.files += node.files
+            # Drop the link so finished subtrees kept only for the heap
+            # do not pin their ancestors
+            node.parent = None
+            parent.pending -= 1
+            if parent.pending:
+                return
+            node = parent
+
+    for dirpath, subdirs, matches in _walk(config, filters, index):
+        node = open_dirs.get(dirpath)
+        if node is None:
+            node = open_dirs[dirpath] = _DirNode(dirpath, None, 0)
+
+        for match in matches:
+            node.size += match[size_field]
+        node.files += len(matches)
+
+        node.pending = len(subdirs)
+        for subdir, _context, _device in subdirs:
+            open_dirs[subdir] = _DirNode(subdir, node, node.depth + 1)
+
+        if not subdirs:
+            finish(node)
+
+    return [
+        DirTotal(path=Path(node.path), size=node.size, files=node.files, depth=node.depth)
+        for _size, _seq, node in sorted(heap, reverse=True)
+    ]
@@ -8,8 +8,8 @@ setup(
     description='Filesystem analyzer with macOS GUI for file management',
     author='Jake Ferraro',
     url='https://github.com/jakeferraro/sweep-cli',
-    py_modules=['sweep', 'scanner', 'output', 'config', 'utils', 'categories', 'file_viewer'],
-    packages=find_packages(),
+    py_modules=['sweep', 'scanner', 'output', 'config', 'utils', 'categories', 'file_viewer', 'scan_index', 'watcher', 'results', 'duplicates', 'live', 'scan_stats', 'where', 'excludes'],
+    packages=find_packages(exclude=['benchmarks']),
     install_requires=[
         'PyQt6>=6.4.0',
     ],
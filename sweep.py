@@ -2,52 +2,67 @@
 Sweep - Filesystem analyzer with native macOS GUI
 """
 
+import os
 import sys
 import argparse
-import json
-import tempfile
-import subprocess
 from pathlib import Path
+from dataclasses import replace
 
-from scanner import scan_filesystem
-from output import output_summary, output_json, output_csv
+# Modules only some modes need (output writers, duplicate detection, the
+# live writer, the GUI handoff) are imported where used, for a quick start
+from scanner import scan_filesystem, iter_scan, scan_directory_sizes
 from config import Config
+from categories import load_rules, DEFAULT_RULES_PATH
+from scan_index import DEFAULT_INDEX_PATH
+from scan_stats import ScanStats, phase
 from utils import parse_size
 
 
-def serialize_file_entry(entry):
-    """Serialize FileEntry to JSON-compatible dict."""
-    return {
-        'path': str(entry.path),
-        'size': entry.size,
-        'modified': entry.modified.isoformat(),
-        'category': entry.category
-    }
+# The viewer script, installed next to this one
+VIEWER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'file_viewer.py')
+
+
+def get_writer(fmt):
+    """
+    Output function for a format, importing the output module on first use.
+
+    Args:
+        fmt: 'json', 'csv', 'ndjson' or 'summary'
+
+    Returns: output.output_<fmt>
+    """
+    import output
+    return getattr(output, f'output_{fmt}')
 
 
 def launch_gui(results):
     """
     Launch GUI with file results.
 
+    Results are handed over in the binary results file format, which
+    the viewer maps instead of parsing.
+
     Args:
-        results: List of FileEntry objects
+        results: ResultStore
     """
+    import tempfile
+    import subprocess
+    from results import RESULTS_SUFFIX
+
     try:
-        # Create temporary JSON file
+        # Create temporary results file
         temp_file = tempfile.NamedTemporaryFile(
-            mode='w',
-            suffix='.json',
+            suffix=RESULTS_SUFFIX,
             delete=False
         )
-
-        # Serialize results to JSON
-        json.dump([serialize_file_entry(r) for r in results], temp_file)
         temp_file.close()
+        results.save(temp_file.name)
 
         # Launch GUI as subprocess (non-blocking)
         subprocess.Popen([
             sys.executable,
-            'file_viewer.py',
+            VIEWER_SCRIPT,
+            '--delete-after',
             temp_file.name
         ])
 
@@ -56,6 +71,30 @@ def launch_gui(results):
         print("Results are still available via CLI output.", file=sys.stderr)
 
 
+def launch_live_gui():
+    """
+    Launch the GUI before scanning, to be fed results as they are found.
+
+    Returns: LiveWriter connected to the viewer, or None if it could not
+    be started
+    """
+    import subprocess
+    from live import LiveWriter
+
+    try:
+        viewer = subprocess.Popen([
+            sys.executable,
+            VIEWER_SCRIPT,
+            '--stream'
+        ], stdin=subprocess.PIPE)
+    except Exception as e:
+        print(f"Warning: Failed to launch GUI: {e}", file=sys.stderr)
+        print("Results are still available via CLI output.", file=sys.stderr)
+        return None
+
+    return LiveWriter(viewer.stdin)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Sweep - Filesystem analyzer with native macOS GUI',
@@ -65,57 +104,322 @@ def main():
     # File selection
     parser.add_argument('--min-size', type=str, help='Minimum file size (e.g., 100M, 1G)')
     parser.add_argument('--older-than', type=int, help='Files not modified in N days')
-    parser.add_argument('--category', choices=['archive', 'disk_image', 'video', 'cache', 'log'])
-    parser.add_argument('--path', type=str, default=str(Path.home()), help='Directory to scan')
-    parser.add_argument('--exclude', type=str, default='/System,/Library,/Applications')
+    parser.add_argument('--category', help='Only files of this category (archive, disk_image, video, cache, log, '
+                                           'other, or one defined in the category rules file)')
+    parser.add_argument('--category-rules', type=str, metavar='FILE',
+                        help=f'JSON file of extra category rules (default: {DEFAULT_RULES_PATH} if present)')
+    parser.add_argument('--where', metavar='EXPR',
+                        help='Only files matching a filter expression, e.g. '
+                             '\'size > 1G and mtime < -365d and (kind in (video, disk_image) or name ~ "*.bak")\'')
+    parser.add_argument('--path', type=str, action='append',
+                        help='Directory to scan; repeat for several (default: ~)')
+    parser.add_argument('--one-file-system', action='store_true',
+                        help='Do not descend into directories on other file systems (mount points)')
+    parser.add_argument('--exclude', type=str, default='/System,/Library,/Applications',
+                        help='Comma-separated gitignore-style patterns to skip, e.g. '
+                             '\'/System,**/target,*.photoslibrary\'; a leading / means an absolute path')
+    parser.add_argument('--exclude-from', action='append', metavar='FILE',
+                        help='Read more exclude patterns from FILE, one per line; repeat for several')
+    parser.add_argument('--no-ignore-files', action='store_true',
+                        help='Do not read .sweepignore files in scanned directories')
+    parser.add_argument('--allocated', action='store_true',
+                        help='Measure files by disk space allocated (st_blocks) instead of apparent size, '
+                             'for --min-size, ranking and totals')
+    parser.add_argument('--count-links', action='store_true',
+                        help='Count every hard link to a file instead of each file once')
+
+    # Performance
+    parser.add_argument('--jobs', type=int, default=1, help='Scan directories with N parallel threads')
+    parser.add_argument('--index', nargs='?', const=str(DEFAULT_INDEX_PATH), metavar='FILE',
+                        help='Reuse listings of unchanged directories from an on-disk index '
+                             f'(default: {DEFAULT_INDEX_PATH})')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='Discard the index and rebuild it during this scan (implies --index)')
+    parser.add_argument('--watch', action='store_true',
+                        help='After the scan, keep watching the tree and print changes, '
+                             'also shown in the viewer unless --no-gui (Linux only)')
+    parser.add_argument('--stats', action='store_true',
+                        help='Report time per phase, scan rates, stat calls, errors, the slowest '
+                             'directories and peak memory')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='Run under cProfile and write the profile to FILE (main thread only)')
 
     # Output
     parser.add_argument('--json', type=str, help='Output JSON to file')
     parser.add_argument('--csv', type=str, help='Output CSV to file')
-    parser.add_argument('--format', choices=['json', 'csv', 'summary'], default='summary')
+    parser.add_argument('--ndjson', type=str, help='Output newline-delimited JSON to file')
+    parser.add_argument('--format', choices=['json', 'csv', 'ndjson', 'summary'], default='summary')
     parser.add_argument('--quiet', action='store_true')
     parser.add_argument('--no-gui', action='store_true', help='Skip GUI and only show CLI output')
+    parser.add_argument('--live', action='store_true',
+                        help='Open the GUI right away and add files to it while the scan runs')
+    parser.add_argument('--in-process', action='store_true',
+                        help='Open the GUI in this process on the scan results instead of handing them '
+                             'to a new one; sweep exits when the window is closed')
+
+    # Directory totals
+    parser.add_argument('--by-directory', action='store_true',
+                        help='Report the heaviest directory subtrees instead of files (top 50, or --limit)')
+    parser.add_argument('--depth', type=int, help='With --by-directory, only report directories up to N levels deep')
+
+    # Duplicates
+    parser.add_argument('--duplicates', action='store_true',
+                        help='Report groups of identical files among the matches instead of the files')
 
     # Utility
     parser.add_argument('--limit', type=int, help='Process top N results')
+    parser.add_argument('--sort-by', choices=['size', 'modified'], default='size',
+                        help='Rank --limit results by largest size or oldest modification (default: size)')
 
     # General
     parser.add_argument('--version', action='version', version='sweep 1.0.0')
 
     args = parser.parse_args()
 
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.watch and not sys.platform.startswith('linux'):
+        parser.error('--watch requires Linux (inotify)')
+    if args.watch and (args.index or args.rebuild_index):
+        parser.error('--watch cannot be combined with --index')
+    if args.by_directory and args.watch:
+        parser.error('--by-directory cannot be combined with --watch')
+    if args.depth is not None and not args.by_directory:
+        parser.error('--depth requires --by-directory')
+    if args.duplicates and (args.by_directory or args.watch):
+        parser.error('--duplicates cannot be combined with --by-directory or --watch')
+    if args.live and (args.no_gui or args.limit or args.by_directory or args.duplicates):
+        parser.error('--live cannot be combined with --no-gui, --limit, --by-directory or --duplicates')
+    if args.stats and args.watch:
+        parser.error('--stats cannot be combined with --watch')
+    if args.in_process and (args.no_gui or args.live or args.watch):
+        parser.error('--in-process cannot be combined with --no-gui, --live or --watch')
+    paths = [Path(p).expanduser() for p in args.path or [str(Path.home())]]
+    if args.watch and len(paths) > 1:
+        parser.error('--watch takes a single --path')
+
+    category_rules = Path(args.category_rules).expanduser() if args.category_rules else None
+    if args.category:
+        known = load_rules(category_rules).names
+        if args.category not in known:
+            parser.error(f"unknown --category {args.category!r} (choose from {', '.join(known)})")
+    if args.where:
+        from where import compile_where
+
+        try:
+            categories = compile_where(args.where).categories
+        except ValueError as e:
+            parser.error(str(e))
+        known = load_rules(category_rules).names
+        unknown = sorted(categories - set(known))
+        if unknown:
+            parser.error(f"unknown category {unknown[0]!r} in --where (choose from {', '.join(known)})")
+
+    exclude = [os.path.expanduser(p.strip()) for p in args.exclude.split(',') if p.strip()]
+    for exclude_file in args.exclude_from or []:
+        try:
+            with open(os.path.expanduser(exclude_file), encoding='utf-8') as f:
+                exclude.extend(f.read().splitlines())
+        except OSError as e:
+            parser.error(f"cannot read --exclude-from file: {e}")
+
     # Build config
     config = Config(
-        path=Path(args.path).expanduser(),
+        path=paths[0],
+        extra_paths=paths[1:],
         min_size=parse_size(args.min_size) if args.min_size else 0,
         older_than=args.older_than,
         category_filter=args.category,
-        exclude=[Path(p.strip()) for p in args.exclude.split(',')],
+        exclude=exclude,
         limit=args.limit,
-        quiet=args.quiet
+        quiet=args.quiet,
+        jobs=args.jobs,
+        sort_by=args.sort_by,
+        category_rules=category_rules,
+        allocated=args.allocated,
+        count_links=args.count_links,
+        where=args.where,
+        ignore_files=not args.no_ignore_files,
+        one_file_system=args.one_file_system
     )
 
-    # Scan filesystem
-    if not config.quiet:
-        print(f"Scanning {config.path}...")
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(run, args, config)
+        finally:
+            profiler.dump_stats(args.profile)
+            print(f"Profile written to {args.profile} (view with: python -m pstats {args.profile})",
+                  file=sys.stderr)
+    else:
+        run(args, config)
 
-    results = scan_filesystem(config)
 
-    # Apply limit
-    if config.limit:
-        results = sorted(results, key=lambda x: x.size, reverse=True)[:config.limit]
+def run(args, config):
+    """
+    Scan and report as the command line asks.
+
+    Args:
+        args: Parsed command-line arguments
+        config: Config built from them
+    """
+    stats = ScanStats() if args.stats else None
 
-    # Output results
+    # Pick the output format
     if args.format == 'json' or args.json:
-        output_json(results, config, args.json)
+        fmt, filepath = 'json', args.json
     elif args.format == 'csv' or args.csv:
-        output_csv(results, config, args.csv)
+        fmt, filepath = 'csv', args.csv
+    elif args.format == 'ndjson' or args.ndjson:
+        fmt, filepath = 'ndjson', args.ndjson
     else:
-        output_summary(results, config)
+        fmt, filepath = 'summary', None
 
-    # Launch GUI unless --no-gui flag is set
-    if not args.no_gui and results:
-        launch_gui(results)
+    # Keep stdout clean when it carries machine-readable output
+    status_stream = sys.stderr if fmt != 'summary' and not filepath else sys.stdout
+
+    # Scan filesystem
+    if not config.quiet:
+        print(f"Scanning {', '.join(str(p) for p in [config.path, *config.extra_paths])}...", file=status_stream)
+
+    # Reuse listings of unchanged directories from the on-disk index
+    index = None
+    if args.index or args.rebuild_index:
+        from scan_index import ScanIndex
+
+        with phase(stats, 'open index'):
+            index = ScanIndex(args.index or DEFAULT_INDEX_PATH, rebuild=args.rebuild_index)
+
+    results = None
+    watcher = None
+    live = None
+    # Viewer stream kept open after the scan for --watch changes
+    watch_feed = None
+    # Per-device totals, shown by the summary only
+    devices = {} if fmt == 'summary' else None
+    # --watch always streams to the viewer, so it can show changes
+    if args.live or (args.watch and not args.no_gui):
+        with phase(stats, 'start live gui'):
+            live = launch_live_gui()
+    try:
+        if args.by_directory:
+            from output import output_directories
+
+            with phase(stats, 'scan'):
+                totals = scan_directory_sizes(
+                    config, top=config.limit or 50, max_depth=args.depth, index=index, stats=stats
+                )
+            with phase(stats, 'output'):
+                output_directories(totals, config, fmt, filepath)
+        elif args.duplicates:
+            from duplicates import find_duplicates
+            from output import output_duplicates
+
+            # --limit caps the groups reported, not the files compared
+            with phase(stats, 'scan'):
+                candidates = scan_filesystem(replace(config, limit=None), index, stats=stats)
+            hash_stats = {}
+            with phase(stats, 'hash duplicates'):
+                groups = find_duplicates(
+                    candidates, workers=config.jobs if config.jobs > 1 else None, stats=hash_stats,
+                    allocated=config.allocated
+                )
+            if not config.quiet:
+                print(
+                    f"Compared {len(candidates)} files: {hash_stats['partial_hashed']} partially hashed, "
+                    f"{hash_stats['full_hashed']} fully hashed",
+                    file=status_stream
+                )
+            with phase(stats, 'output'):
+                output_duplicates(groups[:config.limit] if config.limit else groups, config, fmt, filepath)
+        elif args.watch:
+            from watcher import Watcher
+
+            # The initial scan doubles as watch setup; the viewer is fed as
+            # it runs, or given the top files at the end with --limit
+            watcher = Watcher(config)
+            results = watcher.start(on_directory=live.add if live and not config.limit else None)
+            if config.limit and live is not None:
+                live.add(list(results.matches()))
+            if live is not None:
+                live.finish()
+                watch_feed = live
+                live = None
+        # File output formats can be written while the scan runs; the
+        # summary needs the full result list
+        elif fmt != 'summary' and not config.limit and args.no_gui:
+            with phase(stats, 'scan and output'):
+                get_writer(fmt)(iter_scan(config, index, stats), config, filepath)
+        else:
+            with phase(stats, 'scan'):
+                results = scan_filesystem(
+                    config, index, on_directory=live.add if live else None, stats=stats, devices=devices
+                )
+                if live is not None:
+                    live.close()
+                    live = None
+
+        if results is not None:
+            # Output results
+            with phase(stats, 'output'):
+                if fmt == 'summary':
+                    get_writer(fmt)(results, config, devices)
+                else:
+                    get_writer(fmt)(results, config, filepath)
+    finally:
+        if live is not None:
+            # Scan failed or was interrupted: let the viewer stop waiting
+            live.close()
+        if index is not None:
+            index.close()
+
+    if index is not None and not config.quiet:
+        print(
+            f"Index: {index.hits} directories reused, {index.misses} rescanned",
+            file=status_stream
+        )
+
+    # Launch GUI unless --no-gui flag is set; with --live or --watch it is
+    # already open
+    viewer = None
+    if not args.no_gui and not args.live and watch_feed is None and results:
+        if args.in_process:
+            with phase(stats, 'open viewer'):
+                from file_viewer import open_viewer
+
+                viewer = open_viewer(results)
+        else:
+            with phase(stats, 'gui handoff'):
+                launch_gui(results)
+
+    if stats is not None:
+        stats.report(len(results) if results is not None else None, file=status_stream)
+
+    if viewer is not None:
+        app, _window = viewer
+        app.exec()
+
+    if watcher is not None:
+        if not config.quiet:
+            message = f"Watching {watcher.watched_count} directories for changes (Ctrl+C to stop)"
+            if watcher.polled_count:
+                message += f"; {watcher.polled_count} subtrees over the inotify limit are rescanned periodically"
+            print(message, file=status_stream)
+        from output import output_changes
+
+        def on_change(updated, removed):
+            output_changes(updated, removed, config, ndjson=fmt == 'ndjson')
+            if watch_feed is not None:
+                watch_feed.changes(updated, removed)
+
+        try:
+            watcher.run(on_change)
+        finally:
+            watcher.close()
+            if watch_feed is not None:
+                watch_feed.close()
 
 
 if __name__ ==  "__main__":
@@ -124,6 +428,11 @@ if __name__ ==  "__main__":
     except KeyboardInterrupt:
         print("\nInterrupted by user", file=sys.stderr)
         sys.exit(130)
+    except BrokenPipeError:
+        # Downstream reader exited early (e.g. `| head`); silence the
+        # flush of the dead pipe at interpreter shutdown
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,594 @@
+"""Linux inotify watch mode that keeps scan results up to date."""
+
+import os
+import stat
+import errno
+import heapq
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+import time
+
+from scanner import (
+    _ScanFilters, _scan_directory, _match_file, _keep_dir, _to_entry, _allocated_size, _root_device,
+    _age_cutoff, select_top
+)
+from excludes import IGNORE_FILE
+from results import ResultStore
+
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+    IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK
+)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+# Wait this long after the last event before applying a burst
+SETTLE_DELAY = 0.25
+# ...but never hold changes back for longer than this
+MAX_DELAY = 2.0
+# Rescan interval for subtrees that could not get inotify watches
+POLL_INTERVAL = 60.0
+
+
+class InotifyError(OSError):
+    """Raised when inotify is unavailable."""
+
+
+class Inotify:
+    """Minimal ctypes binding for inotify(7)."""
+
+    def __init__(self):
+        """Create a non-blocking inotify instance."""
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise InotifyError(err, f"inotify_init1 failed: {os.strerror(err)}")
+
+    def add_watch(self, path):
+        """
+        Watch a directory.
+
+        Returns: int (watch descriptor)
+        Raises: OSError, with errno ENOSPC when the watch limit is reached
+        """
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        """Stop watching a descriptor; errors for already-gone watches are ignored."""
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """
+        Read all pending events without blocking.
+
+        Returns: List of (wd, mask, name) tuples
+        """
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(buf[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self):
+        """Close the inotify file descriptor."""
+        os.close(self.fd)
+
+
+class Watcher:
+    """
+    Keep the result set of a Config current as the scanned tree changes.
+
+    start() performs the initial scan, adding an inotify watch to every
+    directory it visits. run() then consumes events, coalescing bursts
+    (SETTLE_DELAY / MAX_DELAY) so a file written in many chunks is
+    re-stat'ed once, and reports changes through a callback.
+
+    When the kernel's watch limit is reached, the subtree that could not
+    be watched is scanned without watches and rescanned every
+    POLL_INTERVAL seconds instead. An event-queue overflow triggers a
+    full rescan.
+
+    Every link of a hard-linked file is reported, as if count_links were
+    set: which link counts first would change as links come and go.
+
+    The older_than age is judged against the time of each report rather
+    than while scanning, so a file that grows old enough without changing
+    is reported once it does. With a limit, the reported results are the
+    current top files, and changes are reported as files enter or leave
+    them.
+    """
+
+    def __init__(self, config):
+        """
+        Initialize the watcher.
+
+        Args:
+            config: Config describing the tree and filters to watch
+        """
+        self.config = config
+        self.root = str(config.path)
+        self._filters = _ScanFilters(config)
+        # Scan regardless of age; see _reconcile
+        self._filters.cutoff = None
+        # With one_file_system, only directories on this device are scanned
+        self._device = _root_device(self.root)
+        self._filters.links_pending = None
+        # Exclude state of every scanned directory, its .sweepignore
+        # included, filled in by the scanner and used to judge events
+        self._states = self._filters.excludes.listed = {}
+        self._inotify = Inotify()
+        self._stop = threading.Event()
+
+        self._wd_to_dir = {}
+        self._dir_to_wd = {}
+        self._polled = set()    # subtree roots without watches
+        self._by_dir = {}       # dirpath -> {path: match tuple}
+        self._shown = {}        # path -> match tuple, as last reported
+        # Matches too new for older_than: heap of (mtime, path), and the
+        # mtime each path was last pushed with, to skip stale entries
+        self._ripening = []
+        self._ripening_mtimes = {}
+
+        # Pending, coalesced work
+        self._dirty_files = set()
+        self._dirty_dirs = set()
+        self._removed_dirs = set()
+
+    @property
+    def results(self):
+        """ResultStore of the files currently matching the Config."""
+        if self.config.limit:
+            return select_top(
+                self._shown.values(), self.config.limit, self.config.sort_by, allocated=self.config.allocated
+            )
+        store = ResultStore()
+        store.extend(self._shown.values())
+        return store
+
+    @property
+    def watched_count(self):
+        """Number of directories with an inotify watch."""
+        return len(self._dir_to_wd)
+
+    @property
+    def polled_count(self):
+        """Number of subtrees rescanned periodically for lack of watches."""
+        return len(self._polled)
+
+    def start(self, on_directory=None):
+        """
+        Run the initial scan and set up watches.
+
+        Args:
+            on_directory: Optional callable taking the list of match
+                tuples of each directory as it is scanned
+                (live.LiveWriter.add); not used with a limit, as the top
+                files are only known once the scan ends
+
+        Returns: ResultStore
+        """
+        cutoff = _age_cutoff(self.config.older_than)
+        if on_directory is not None and cutoff is not None:
+            stream = on_directory
+
+            def on_directory(matches):
+                stream([match for match in matches if match[3] <= cutoff])
+
+        self._scan_subtree(self.root, watch=True, on_directory=on_directory)
+        self._reconcile(
+            {path: match for files in self._by_dir.values() for path, match in files.items()}, set()
+        )
+        return self.results
+
+    def stop(self):
+        """Ask run() to return; safe to call from another thread."""
+        self._stop.set()
+
+    def close(self):
+        """Release the inotify instance."""
+        self._inotify.close()
+
+    def run(self, on_change):
+        """
+        Process events until stop() is called.
+
+        Args:
+            on_change: Called as on_change(updated, removed) after each
+                coalesced burst, where updated is a list of new or changed
+                FileEntry objects and removed a list of path strings
+        """
+        fd = self._inotify.fd
+        first_event = last_event = None
+        next_poll = time.monotonic() + POLL_INTERVAL
+
+        while not self._stop.is_set():
+            readable, _, _ = select.select([fd], [], [], SETTLE_DELAY)
+
+            now = time.monotonic()
+            if readable and self._queue_events(self._inotify.read_events()):
+                last_event = now
+                if first_event is None:
+                    first_event = now
+
+            if first_event is not None and (
+                now - last_event >= SETTLE_DELAY or now - first_event >= MAX_DELAY
+            ):
+                self._report(self._apply_pending(), on_change)
+                first_event = last_event = None
+
+            if self._polled and now >= next_poll:
+                self._report(self._rescan_polled(), on_change)
+                next_poll = now + POLL_INTERVAL
+
+            if self._ripening and self._ripening[0][0] <= _age_cutoff(self.config.older_than):
+                # Files have grown old enough without changing
+                self._report(({}, set()), on_change)
+
+    def _report(self, changes, on_change):
+        """Reconcile a (updated, removed) pair and pass it to the callback if non-empty."""
+        updated, removed = self._reconcile(*changes)
+        if updated or removed:
+            on_change(updated, removed)
+
+    def _reconcile(self, updated, removed):
+        """
+        Turn changes to the matches into changes to the reported results.
+
+        Matches are reported once older than older_than, judged now, and
+        with a limit only while they are among the top files.
+
+        Args:
+            updated: {path: match tuple} of new or changed matches
+            removed: Set of paths that no longer match
+
+        Returns: (updated, removed) - list of FileEntry objects and sorted
+        list of path strings
+        """
+        cutoff = _age_cutoff(self.config.older_than)
+        current = self._ripened(cutoff)
+        gone = set(removed)
+        for path, match in updated.items():
+            if cutoff is None or match[3] <= cutoff:
+                current[path] = match
+                self._ripening_mtimes.pop(path, None)
+            else:
+                self._ripen(path, match[3])
+                gone.add(path)
+        for path in removed:
+            self._ripening_mtimes.pop(path, None)
+
+        shown = self._shown
+        if self.config.limit:
+            if not self._top_affected(current, gone):
+                return [], []
+            top = select_top(
+                (match for files in self._by_dir.values() for match in files.values()
+                 if cutoff is None or match[3] <= cutoff),
+                self.config.limit, self.config.sort_by, allocated=self.config.allocated
+            )
+            self._shown = {os.path.join(match[0], match[1]): match for match in top.matches()}
+            changed = {path: match for path, match in self._shown.items() if shown.get(path) != match}
+            dropped = set(shown) - set(self._shown)
+        else:
+            changed = {path: match for path, match in current.items() if shown.get(path) != match}
+            dropped = gone.intersection(shown)
+            shown.update(changed)
+            for path in dropped:
+                del shown[path]
+
+        return [_to_entry(match) for match in changed.values()], sorted(dropped)
+
+    def _ripen(self, path, mtime):
+        """Remember a match that is too new to report yet."""
+        self._ripening_mtimes[path] = mtime
+        heapq.heappush(self._ripening, (mtime, path))
+        if len(self._ripening) > 2 * len(self._ripening_mtimes) + 1024:
+            # Drop entries of files changed or removed since they were pushed
+            self._ripening = [(mtime, path) for path, mtime in self._ripening_mtimes.items()]
+            heapq.heapify(self._ripening)
+
+    def _ripened(self, cutoff):
+        """
+        Pop the matches that have grown older than the cutoff.
+
+        Returns: {path: match tuple}
+        """
+        ripe = {}
+        heap = self._ripening
+        while heap and heap[0][0] <= cutoff:
+            mtime, path = heapq.heappop(heap)
+            if self._ripening_mtimes.get(path) != mtime:
+                continue
+            del self._ripening_mtimes[path]
+            match = self._by_dir.get(os.path.dirname(path), {}).get(path)
+            if match is not None and match[3] == mtime:
+                ripe[path] = match
+        return ripe
+
+    def _top_affected(self, current, gone):
+        """
+        Tell whether changes can alter the top files.
+
+        Returns: bool (False when every change is to files outside the top
+        that cannot get in)
+        """
+        shown = self._shown
+        if any(path in shown for path in gone):
+            return True
+        if len(shown) < self.config.limit:
+            return bool(current)
+        oldest = self.config.sort_by == 'modified'
+        size_field = 5 if self.config.allocated else 2
+        weakest = min(-match[3] if oldest else match[size_field] for match in shown.values())
+        # A tie with the weakest can still get in, with a smaller path
+        return any(
+            path in shown or (-match[3] if oldest else match[size_field]) >= weakest
+            for path, match in current.items()
+        )
+
+    def _queue_events(self, events):
+        """
+        Translate raw events into pending work.
+
+        Returns: bool (True if anything was queued)
+        """
+        queued = False
+
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost; only a full rescan is safe
+                self._dirty_dirs.add(self.root)
+                queued = True
+                continue
+
+            dirpath = self._wd_to_dir.get(wd)
+            if dirpath is None:
+                continue
+
+            if mask & IN_IGNORED:
+                # Watch gone (directory deleted or unmounted)
+                del self._wd_to_dir[wd]
+                if self._dir_to_wd.get(dirpath) == wd:
+                    del self._dir_to_wd[dirpath]
+                continue
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                self._removed_dirs.add(dirpath)
+                queued = True
+                continue
+
+            path = os.path.join(dirpath, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._removed_dirs.add(path)
+                    queued = True
+                elif mask & (IN_CREATE | IN_MOVED_TO) and _keep_dir(
+                        name, path, self._filters.excludes.listed_state(dirpath), self._filters):
+                    self._dirty_dirs.add(path)
+                    queued = True
+            elif name == IGNORE_FILE:
+                # Exclude patterns changed: rescan the directory they apply
+                # to, which also records fresh states for its subtree
+                self._dirty_dirs.add(dirpath)
+                queued = True
+            else:
+                self._dirty_files.add(path)
+                queued = True
+
+        return queued
+
+    def _apply_pending(self):
+        """
+        Apply coalesced work to the result set.
+
+        Returns: (updated, removed) - {path: match tuple} of new or
+        changed files and a set of paths that disappeared
+        """
+        updated = {}
+        removed = set()
+
+        for dirpath in self._removed_dirs:
+            removed.update(self._drop_subtree(dirpath))
+
+        for dirpath in self._dirty_dirs:
+            if any(dirpath.startswith(d + os.sep) for d in self._dirty_dirs):
+                # Rescanned with its parent, whose new .sweepignore may
+                # have changed the state it was queued with
+                self._filters.excludes.discard(dirpath)
+                continue
+            if not any(dirpath == d or dirpath.startswith(d + os.sep) for d in self._polled):
+                subtree_updated, subtree_removed = self._rescan_subtree(dirpath, watch=True)
+                updated.update(subtree_updated)
+                removed.update(subtree_removed)
+
+        for path in self._dirty_files:
+            match = self._stat_file(path)
+            files = self._by_dir.get(os.path.dirname(path))
+            if match is not None:
+                self._by_dir.setdefault(os.path.dirname(path), {})[path] = match
+                updated[path] = match
+            elif files is not None and files.pop(path, None) is not None:
+                removed.add(path)
+
+        self._dirty_files.clear()
+        self._dirty_dirs.clear()
+        self._removed_dirs.clear()
+
+        # A path removed and recreated in the same burst is an update
+        removed.difference_update(updated)
+        return updated, removed
+
+    def _rescan_polled(self):
+        """
+        Rescan every subtree that has no watches.
+
+        Returns: (updated, removed), as _apply_pending
+        """
+        updated = {}
+        removed = set()
+        for dirpath in list(self._polled):
+            subtree_updated, subtree_removed = self._rescan_subtree(dirpath, watch=False)
+            updated.update(subtree_updated)
+            removed.update(subtree_removed)
+        return updated, removed
+
+    def _rescan_subtree(self, dirpath, watch):
+        """
+        Rescan a subtree and diff it against the current results.
+
+        Returns: (updated, removed) - {path: match tuple} of new or
+        changed files and a set of paths that disappeared
+        """
+        before = {}
+        for d in self._subtree_dirs(dirpath):
+            before.update(self._by_dir.pop(d))
+        self._forget_states(dirpath)
+
+        self._scan_subtree(dirpath, watch)
+
+        after = {}
+        for d in self._subtree_dirs(dirpath):
+            after.update(self._by_dir[d])
+
+        updated = {path: match for path, match in after.items() if before.get(path) != match}
+        removed = set(before) - set(after)
+        return updated, removed
+
+    def _scan_subtree(self, dirpath, watch, context=None, device=None, on_directory=None):
+        """
+        Scan a subtree into the result set, adding watches when asked and
+        passing each directory's matches to on_directory if given.
+        """
+        if context is None:
+            context = self._filters.rules.context_for(dirpath)
+        if device is None:
+            try:
+                device = os.stat(dirpath).st_dev
+            except OSError:
+                device = None
+            if device is None or (self._filters.one_file_system and device != self._device):
+                # Not listed, so drop the exclude state recorded for it
+                self._filters.excludes.discard(dirpath)
+                return
+        stack = [(dirpath, context, device)]
+        while stack:
+            current, context, device = stack.pop()
+
+            if watch and current not in self._dir_to_wd:
+                try:
+                    wd = self._inotify.add_watch(current)
+                except OSError as e:
+                    if e.errno == errno.ENOSPC:
+                        # Out of watches: poll this subtree instead
+                        self._polled.add(current)
+                        self._scan_subtree(
+                            current, watch=False, context=context, device=device, on_directory=on_directory
+                        )
+                        continue
+                    if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                        self._filters.excludes.discard(current)
+                        continue
+                else:
+                    self._wd_to_dir[wd] = current
+                    self._dir_to_wd[current] = wd
+
+            subdirs, matches = _scan_directory(current, context, self._filters, device=device)
+            if matches:
+                self._by_dir[current] = {os.path.join(current, match[1]): match for match in matches}
+            if on_directory is not None:
+                on_directory(matches)
+            stack.extend(subdirs)
+
+    def _drop_subtree(self, dirpath):
+        """
+        Forget a deleted or moved-away subtree.
+
+        Returns: set of removed result paths
+        """
+        removed = set()
+        for d in self._subtree_dirs(dirpath):
+            removed.update(self._by_dir.pop(d))
+        self._forget_states(dirpath)
+
+        for d in [d for d in self._dir_to_wd if d == dirpath or d.startswith(dirpath + os.sep)]:
+            wd = self._dir_to_wd.pop(d)
+            self._wd_to_dir.pop(wd, None)
+            self._inotify.rm_watch(wd)
+
+        self._polled = set(
+            d for d in self._polled if not (d == dirpath or d.startswith(dirpath + os.sep))
+        )
+        return removed
+
+    def _forget_states(self, dirpath):
+        """Drop the exclude states of a subtree about to be rescanned or gone."""
+        prefix = dirpath + os.sep
+        for d in [d for d in self._states if d == dirpath or d.startswith(prefix)]:
+            del self._states[d]
+
+    def _subtree_dirs(self, dirpath):
+        """List directories with results at or below dirpath."""
+        prefix = dirpath + os.sep
+        return [d for d in self._by_dir if d == dirpath or d.startswith(prefix)]
+
+    def _stat_file(self, path):
+        """
+        Re-evaluate a single file against the filters.
+
+        Returns: match tuple, or None if it is gone or no longer matches
+        """
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        dirpath, name = os.path.split(path)
+        excludes = self._filters.excludes
+        if excludes.file_excluded(excludes.listed_state(dirpath), name):
+            return None
+        context = self._filters.rules.context_for(dirpath)
+        return _match_file(dirpath, name, st.st_size, st.st_mtime, _allocated_size(st), context, self._filters)
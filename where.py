@@ -0,0 +1,401 @@
+"""
+Filter expressions for --where, compiled into scan predicates.
+
+An expression compares file fields with values and combines the
+comparisons with and, or, not and parentheses:
+
+    size > 1G and mtime < -365d and (category in (video, disk_image) or name ~ "*.bak")
+
+Fields:
+    size, allocated     bytes, compared with sizes like 500K, 100M, 1G
+    mtime (modified)    compared with a time relative to the scan start,
+                        like -365d, -12h, -2w, or a date like 2024-01-01
+    category (kind)     ==, != or [not] in (a, b, ...)
+    name, path          ==, != or ~ / !~ with a shell-style pattern
+
+The expression is parsed once and compiled into a single Python
+function over the raw fields, with times resolved to epoch seconds.
+Within each and/or, cheaper comparisons are tested first. A second
+function decides from the name and category alone whether a file can
+match at all, so the scanner need not stat files it rules out.
+"""
+
+import os
+import re
+import time
+import fnmatch
+from datetime import datetime
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, Optional, Tuple
+
+from utils import parse_size
+
+
+FIELD_ALIASES = {
+    'size': 'size',
+    'allocated': 'allocated',
+    'mtime': 'mtime',
+    'modified': 'mtime',
+    'category': 'category',
+    'kind': 'category',
+    'name': 'name',
+    'path': 'path',
+}
+
+# Fields that need the file to be stat'ed
+STAT_FIELDS = {'size', 'allocated', 'mtime'}
+
+# Operators each kind of field accepts
+NUMBER_OPS = {'<', '<=', '>', '>=', '==', '!='}
+CATEGORY_OPS = {'==', '!=', 'in', 'not in'}
+TEXT_OPS = {'==', '!=', '~', '!~'}
+
+# Seconds per unit of a relative time such as -30d
+TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400, 'y': 365 * 86400}
+
+# Relative cost of testing a comparison, for ordering them cheapest first
+COSTS = {
+    ('size', None): 1, ('allocated', None): 1, ('mtime', None): 1,
+    ('category', '=='): 1, ('category', '!='): 1, ('category', 'in'): 2, ('category', 'not in'): 2,
+    ('name', '=='): 1, ('name', '!='): 1, ('name', '~'): 10, ('name', '!~'): 10,
+    ('path', '=='): 5, ('path', '!='): 5, ('path', '~'): 15, ('path', '!~'): 15,
+}
+
+# Arguments of the compiled predicates
+MATCH_ARGS = 'root, name, size, mtime, allocated, category'
+NAME_ARGS = 'root, name, category'
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<punct>[(),])
+      | (?P<op><=|>=|==|!=|!~|<|>|=|~)
+      | "(?P<dq>[^"]*)"
+      | '(?P<sq>[^']*)'
+      | (?P<word>[^\s(),<>=!~"']+)
+    )''', re.VERBOSE)
+
+
+@dataclass(frozen=True)
+class Compare:
+    """One field compared with a value."""
+    field: str
+    op: str
+    value: object
+
+
+@dataclass(frozen=True)
+class And:
+    """True if every item is."""
+    items: Tuple
+
+
+@dataclass(frozen=True)
+class Or:
+    """True if any item is."""
+    items: Tuple
+
+
+@dataclass(frozen=True)
+class Not:
+    """True if item is not."""
+    item: object
+
+
+@dataclass
+class WherePredicate:
+    """A compiled --where expression."""
+    match: Callable                  # match(root, name, size, mtime, allocated, category)
+    names: Optional[Callable]        # names(root, name, category) is False if no stat can match;
+                                     # None when every name can match
+    names_use_category: bool         # names() reads category (else pass None)
+    categories: FrozenSet[str]       # category names the expression mentions
+
+
+def _tokenize(text):
+    """Split an expression into (kind, value) tokens."""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        found = _TOKEN.match(text, position)
+        if found is None:
+            raise ValueError(f"unexpected {text[position:].strip()[:10]!r} in --where expression")
+        position = found.end()
+        kind = found.lastgroup
+        value = found.group(kind)
+        if kind in ('dq', 'sq'):
+            kind = 'string'
+        elif kind == 'word' and value.lower() in ('and', 'or', 'not', 'in'):
+            kind, value = 'keyword', value.lower()
+        elif kind == 'op' and value == '=':
+            value = '=='
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser over the tokens of one expression."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def take(self, kind=None, value=None, what=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value and token[1] != value):
+            wanted = what or value or kind
+            got = repr(token[1]) if token[0] else 'end of expression'
+            raise ValueError(f"expected {wanted} but found {got} in --where expression")
+        self.position += 1
+        return token[1]
+
+    def expression(self):
+        items = [self.conjunction()]
+        while self.peek() == ('keyword', 'or'):
+            self.take()
+            items.append(self.conjunction())
+        return items[0] if len(items) == 1 else Or(tuple(items))
+
+    def conjunction(self):
+        items = [self.negation()]
+        while self.peek() == ('keyword', 'and'):
+            self.take()
+            items.append(self.negation())
+        return items[0] if len(items) == 1 else And(tuple(items))
+
+    def negation(self):
+        if self.peek() == ('keyword', 'not'):
+            self.take()
+            return Not(self.negation())
+        if self.peek() == ('punct', '('):
+            self.take()
+            node = self.expression()
+            self.take('punct', ')')
+            return node
+        return self.comparison()
+
+    def comparison(self):
+        word = self.take('word', what='a field')
+        field = FIELD_ALIASES.get(word.lower())
+        if field is None:
+            raise ValueError(f"unknown field {word!r} in --where expression "
+                             f"(choose from {', '.join(sorted(set(FIELD_ALIASES)))})")
+
+        if self.peek() == ('keyword', 'not'):
+            self.take()
+            self.take('keyword', 'in')
+            op = 'not in'
+        elif self.peek() == ('keyword', 'in'):
+            self.take()
+            op = 'in'
+        else:
+            op = self.take('op', what='an operator')
+
+        allowed = NUMBER_OPS if field in STAT_FIELDS else CATEGORY_OPS if field == 'category' else TEXT_OPS
+        if op not in allowed:
+            raise ValueError(f"{field} does not support {op!r} in --where expression "
+                             f"(use {', '.join(sorted(allowed))})")
+
+        if op in ('in', 'not in'):
+            self.take('punct', '(')
+            values = [self.value()]
+            while self.peek() == ('punct', ','):
+                self.take()
+                values.append(self.value())
+            self.take('punct', ')')
+            return Compare(field, op, frozenset(values))
+        return Compare(field, op, self.value())
+
+    def value(self):
+        kind, value = self.peek()
+        if kind not in ('word', 'string'):
+            return self.take('word', what='a value')
+        self.position += 1
+        return value
+
+
+def parse_where(text, now=None):
+    """
+    Parse a --where expression.
+
+    Args:
+        text: Expression
+        now: Epoch seconds that relative times count back from (default:
+            the current time)
+
+    Returns: expression tree of Compare, And, Or and Not nodes, with
+    sizes in bytes, times in epoch seconds and patterns compiled
+
+    Raises: ValueError with a description of the first problem found
+    """
+    parser = _Parser(_tokenize(text))
+    if not parser.tokens:
+        raise ValueError('empty --where expression')
+    node = parser.expression()
+    if parser.position < len(parser.tokens):
+        raise ValueError(f"unexpected {parser.tokens[parser.position][1]!r} in --where expression")
+    return _resolve(node, time.time() if now is None else now)
+
+
+def _parse_time(text, now):
+    """Epoch seconds of a relative time like -30d or a date like 2024-01-01."""
+    unit = TIME_UNITS.get(text[-1:].lower())
+    if unit is not None and text[:1] in '+-':
+        try:
+            return now + float(text[:-1]) * unit
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise ValueError(f"invalid time {text!r} in --where expression "
+                         f"(use e.g. -30d, -12h or 2024-01-01)") from None
+
+
+def _resolve(node, now):
+    """Tree with values converted to what they are compared with."""
+    if isinstance(node, (And, Or)):
+        return type(node)(tuple(_resolve(item, now) for item in node.items))
+    if isinstance(node, Not):
+        return Not(_resolve(node.item, now))
+
+    value = node.value
+    if node.field in ('size', 'allocated'):
+        try:
+            value = parse_size(value)
+        except ValueError:
+            raise ValueError(f"invalid size {value!r} in --where expression") from None
+    elif node.field == 'mtime':
+        value = _parse_time(value, now)
+    elif node.op in ('~', '!~'):
+        value = re.compile(fnmatch.translate(value)).match
+    return Compare(node.field, node.op, value)
+
+
+def _categories(node):
+    """Category names a tree compares with."""
+    if isinstance(node, (And, Or)):
+        return frozenset().union(*(_categories(item) for item in node.items))
+    if isinstance(node, Not):
+        return _categories(node.item)
+    if node.field != 'category':
+        return frozenset()
+    return node.value if isinstance(node.value, frozenset) else frozenset([node.value])
+
+
+def _fields(node):
+    """Fields a tree reads."""
+    if isinstance(node, (And, Or)):
+        return set().union(*(_fields(item) for item in node.items))
+    if isinstance(node, Not):
+        return _fields(node.item)
+    if isinstance(node, bool):
+        return set()
+    return {node.field}
+
+
+def _cost(node):
+    """Relative cost of evaluating a tree."""
+    if isinstance(node, (And, Or)):
+        return sum(_cost(item) for item in node.items)
+    if isinstance(node, Not):
+        return _cost(node.item)
+    if isinstance(node, bool):
+        return 0
+    return COSTS[node.field, None if node.field in STAT_FIELDS else node.op]
+
+
+def _combine(kind, items):
+    """And or Or of items, folding the constants True and False."""
+    neutral = kind is And
+    kept = []
+    for item in items:
+        if item is (not neutral):
+            return not neutral
+        if item is not neutral:
+            kept.append(item)
+    if not kept:
+        return neutral
+    if len(kept) == 1:
+        return kept[0]
+    return kind(tuple(kept))
+
+
+def _name_bounds(node):
+    """
+    (possible, certain) trees of node with the stat fields unknown.
+
+    possible is false only if node is false whatever the stat fields
+    are; certain is true only if node is true whatever they are.
+    """
+    if isinstance(node, (And, Or)):
+        bounds = [_name_bounds(item) for item in node.items]
+        kind = type(node)
+        return (_combine(kind, [b[0] for b in bounds]), _combine(kind, [b[1] for b in bounds]))
+    if isinstance(node, Not):
+        possible, certain = _name_bounds(node.item)
+        return (_negate(certain), _negate(possible))
+    if node.field in STAT_FIELDS:
+        return True, False
+    return node, node
+
+
+def _negate(node):
+    """Not node, folding constants."""
+    return (not node) if isinstance(node, bool) else Not(node)
+
+
+def _source(node, constants):
+    """Python source of a tree, cheapest operands of and/or first."""
+    if isinstance(node, bool):
+        return repr(node)
+    if isinstance(node, (And, Or)):
+        joiner = ' and ' if isinstance(node, And) else ' or '
+        items = sorted(node.items, key=_cost)
+        return '(' + joiner.join(_source(item, constants) for item in items) + ')'
+    if isinstance(node, Not):
+        return f'(not {_source(node.item, constants)})'
+
+    constant = f'_c{len(constants)}'
+    constants[constant] = node.value
+    subject = '_join(root, name)' if node.field == 'path' else node.field
+    if node.op == '~':
+        return f'({constant}({subject}) is not None)'
+    if node.op == '!~':
+        return f'({constant}({subject}) is None)'
+    return f'({subject} {node.op} {constant})'
+
+
+def _function(args, node):
+    """Compile a tree into a function of args."""
+    constants = {'_join': os.path.join}
+    body = _source(node, constants)
+    return eval(compile(f'lambda {args}: {body}', '<where>', 'eval'), {'__builtins__': {}, **constants})
+
+
+def compile_where(text, now=None):
+    """
+    Compile a --where expression.
+
+    Args:
+        text: Expression
+        now: Epoch seconds that relative times count back from (default:
+            the current time)
+
+    Returns: WherePredicate
+
+    Raises: ValueError if the expression is invalid
+    """
+    node = parse_where(text, now)
+    possible, _certain = _name_bounds(node)
+    return WherePredicate(
+        match=_function(MATCH_ARGS, node),
+        names=None if possible is True else _function(NAME_ARGS, possible),
+        names_use_category='category' in _fields(possible),
+        categories=_categories(node),
+    )